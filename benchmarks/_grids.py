@@ -0,0 +1,66 @@
+"""Synthetic grids shared by the benchmarks."""
+import numpy as np
+
+from landlab import RasterModelGrid
+from umami.utils.create_landlab_components import _create_landlab_components
+
+# Grid shapes from small test grids to large DEMs. Routing flow on the
+# largest grid takes more than a minute, such that benchmarks that use it,
+# and the setup_cache that creates it, need a longer timeout than the asv
+# default.
+SHAPES = [(100, 100), (1000, 1000), (4000, 4000)]
+TIMEOUT = 1200
+
+# The node of the single watershed outlet.
+OUTLET_ID = 1
+
+
+def synthetic_grid(shape, seed=0, route=True):
+    """Create a grid with a single watershed draining to ``OUTLET_ID``.
+
+    Elevation increases with x and y and is perturbed by less than half the
+    node spacing, such that each core node drains to its left or lower
+    neighbor but drainage areas and chi values vary as on a real landscape.
+    If *route* is True, flow is routed and chi and flow distance are
+    calculated as done by ``umami.Metric``.
+
+    Returns
+    -------
+    grid, flow_accumulator, chi_finder
+        The components are ``None`` if *route* is False.
+    """
+    np.random.seed(seed)
+    grid = RasterModelGrid(shape)
+    z = grid.add_zeros("node", "topographic__elevation")
+    z += grid.x_of_node + grid.y_of_node
+    z += 0.4 * np.random.random(grid.number_of_nodes)
+    grid.set_watershed_boundary_condition_outlet_id(OUTLET_ID, z)
+
+    if not route:
+        return grid, None, None
+
+    fa, cf = _create_landlab_components(
+        grid, chi_finder_kwds={"min_drainage_area": 1.0}
+    )
+    return grid, fa, cf
+
+
+def synthetic_grids(seeds=(0,), route=True):
+    """Create a grid of each shape in ``SHAPES`` for each seed.
+
+    This is meant to be returned by the ``setup_cache`` of a benchmark. asv
+    calls ``setup_cache`` once and passes its result to ``setup`` and each
+    benchmark, such that grids are created, and flow is routed, once rather
+    than before each benchmark.
+
+    Returns
+    -------
+    dict
+        The result of ``synthetic_grid(shape, seed, route)`` for each
+        ``(shape, seed)``.
+    """
+    return {
+        (shape, seed): synthetic_grid(shape, seed=seed, route=route)
+        for shape in SHAPES
+        for seed in seeds
+    }
@@ -0,0 +1,62 @@
+"""Benchmarks for the ``discretized_misfit`` calculation."""
+import numpy as np
+
+from landlab import RasterModelGrid
+from umami.calculations import discretized_misfit
+from umami.calculations.residual.discretized_misfit import (
+    _get_category_labels,
+)
+
+from ._grids import SHAPES, TIMEOUT
+
+_EDGES = list(np.linspace(0, 100, 11))
+
+
+def _grid(shape, seed):
+    np.random.seed(seed)
+    grid = RasterModelGrid(shape)
+    for name in ("drainage_area", "topographic__elevation"):
+        grid.add_field("node", name, np.random.random(grid.number_of_nodes))
+    return grid
+
+
+class TimeDiscretizedMisfit(object):
+    """Category labeling and per-category misfit with 10 x 10 categories."""
+
+    params = SHAPES
+    param_names = ["shape"]
+    timeout = TIMEOUT
+
+    def setup_cache(self):
+        return {
+            (shape, seed): _grid(shape, seed)
+            for shape in SHAPES
+            for seed in (0, 1)
+        }
+
+    setup_cache.timeout = TIMEOUT
+
+    def setup(self, grids, shape):
+        self.model = grids[(shape, 0)]
+        self.data = grids[(shape, 1)]
+
+    def time_category_labels(self, grids, shape):
+        _get_category_labels(
+            self.data,
+            "drainage_area",
+            "topographic__elevation",
+            _EDGES,
+            _EDGES,
+        )
+
+    def time_discretized_misfit(self, grids, shape):
+        discretized_misfit(
+            self.model,
+            self.data,
+            "da_{field_1_level}_z_{field_2_level}",
+            "topographic__elevation",
+            "drainage_area",
+            "topographic__elevation",
+            _EDGES,
+            _EDGES,
+        )
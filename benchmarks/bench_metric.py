@@ -0,0 +1,95 @@
+"""Benchmarks for ``umami.Metric``."""
+from landlab import RasterModelGrid
+from umami import Metric
+
+from ._grids import OUTLET_ID, SHAPES, TIMEOUT, synthetic_grids
+
+
+def _aggregate_metrics(n):
+    metrics = {}
+    for i in range(n):
+        metrics["max_{i}".format(i=i)] = {
+            "_func": "aggregate",
+            "method": "amax",
+            "field": "topographic__elevation",
+        }
+    return metrics
+
+
+class TimeMetricCalculateOverhead(object):
+    """Per-call overhead of ``Metric.calculate`` on a small grid.
+
+    The grid is small and the metrics are cheap, such that the time is
+    dominated by the work done by ``Metric.calculate`` for each metric rather
+    than by the calculations themselves.
+    """
+
+    params = [1, 20, 100]
+    param_names = ["number_of_metrics"]
+
+    def setup(self, number_of_metrics):
+        grid = RasterModelGrid((10, 10))
+        z = grid.add_zeros("node", "topographic__elevation")
+        z += grid.x_of_node + grid.y_of_node
+        metrics = _aggregate_metrics(number_of_metrics)
+        self.metric = Metric(grid, metrics=metrics)
+
+    def time_calculate(self, number_of_metrics):
+        self.metric.calculate()
+
+
+_METRICS = {
+    "me": {
+        "_func": "aggregate",
+        "method": "mean",
+        "field": "topographic__elevation",
+    },
+    "ep10": {
+        "_func": "aggregate",
+        "method": "percentile",
+        "field": "topographic__elevation",
+        "q": 10,
+    },
+    "sn1": {"_func": "count_equal", "field": "drainage_area", "value": 1},
+    "oid1_mean": {
+        "_func": "watershed_aggregation",
+        "field": "topographic__elevation",
+        "method": "mean",
+        "outlet_id": OUTLET_ID,
+    },
+    "hi": {"_func": "hypsometric_integral", "outlet_id": OUTLET_ID},
+    "ci": {"_func": "chi_intercept"},
+    "cg": {"_func": "chi_gradient"},
+}
+_CHI_FINDER_KWDS = {"min_drainage_area": 1.0}
+
+
+class TimeMetric(object):
+    """Creating a ``Metric``, which routes flow, and calculating it."""
+
+    params = SHAPES
+    param_names = ["shape"]
+    timeout = TIMEOUT
+
+    def setup_cache(self):
+        return synthetic_grids(route=False)
+
+    setup_cache.timeout = TIMEOUT
+
+    def setup(self, grids, shape):
+        self.grid, _, _ = grids[(shape, 0)]
+        self.metric = Metric(
+            self.grid, chi_finder_kwds=_CHI_FINDER_KWDS, metrics=_METRICS
+        )
+
+    def time_construct(self, grids, shape):
+        Metric(self.grid, chi_finder_kwds=_CHI_FINDER_KWDS, metrics=_METRICS)
+
+    def time_calculate(self, grids, shape):
+        self.metric.calculate()
+
+    def peakmem_construct_and_calculate(self, grids, shape):
+        metric = Metric(
+            self.grid, chi_finder_kwds=_CHI_FINDER_KWDS, metrics=_METRICS
+        )
+        metric.calculate()
@@ -0,0 +1,61 @@
+"""Benchmarks for the metric calculations in ``umami.calculations``."""
+from umami.calculations import (
+    aggregate,
+    chi_gradient,
+    chi_intercept,
+    count_equal,
+    hypsometric_integral,
+    mask_aggregation,
+    watershed_aggregation,
+)
+
+from ._grids import OUTLET_ID, SHAPES, TIMEOUT, synthetic_grids
+
+
+class TimeMetricCalculations(object):
+    """Each metric calculation on a routed grid with a single watershed."""
+
+    params = SHAPES
+    param_names = ["shape"]
+    timeout = TIMEOUT
+
+    def setup_cache(self):
+        grids = synthetic_grids()
+        for grid, _, _ in grids.values():
+            grid.add_field(
+                "node", "is_channel", grid.at_node["drainage_area"] > 100.0
+            )
+        return grids
+
+    setup_cache.timeout = TIMEOUT
+
+    def setup(self, grids, shape):
+        self.grid, _, self.cf = grids[(shape, 0)]
+
+    def time_aggregate_mean(self, grids, shape):
+        aggregate(self.grid, "topographic__elevation", "mean")
+
+    def time_aggregate_percentile(self, grids, shape):
+        aggregate(self.grid, "topographic__elevation", "percentile", q=10)
+
+    def time_count_equal(self, grids, shape):
+        count_equal(self.grid, "drainage_area", 1)
+
+    def time_mask_aggregation(self, grids, shape):
+        mask_aggregation(
+            self.grid, "topographic__elevation", "is_channel", "mean"
+        )
+
+    def time_watershed_aggregation(self, grids, shape):
+        watershed_aggregation(
+            self.grid, "topographic__elevation", OUTLET_ID, "mean"
+        )
+
+    def time_hypsometric_integral(self, grids, shape):
+        hypsometric_integral(self.grid, OUTLET_ID)
+
+    def time_chi_intercept(self, grids, shape):
+        chi_intercept(self.cf)
+
+    def time_chi_gradient(self, grids, shape):
+        chi_gradient(self.cf)
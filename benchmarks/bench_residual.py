@@ -0,0 +1,88 @@
+"""Benchmarks for ``umami.Residual``."""
+import numpy as np
+
+from umami import Residual
+
+from ._grids import OUTLET_ID, SHAPES, TIMEOUT, synthetic_grids
+
+_EDGES = list(np.linspace(0, 100, 11))
+_RESIDUALS = {
+    "me": {
+        "_func": "aggregate",
+        "method": "mean",
+        "field": "topographic__elevation",
+    },
+    "ep10": {
+        "_func": "aggregate",
+        "method": "percentile",
+        "field": "topographic__elevation",
+        "q": 10,
+    },
+    "hi": {"_func": "hypsometric_integral", "outlet_id": OUTLET_ID},
+    "ks": {"_func": "kstest", "field": "topographic__elevation"},
+    "ksw": {
+        "_func": "kstest_watershed",
+        "field": "topographic__elevation",
+        "outlet_id": OUTLET_ID,
+    },
+    "jdm": {
+        "_func": "joint_density_misfit",
+        "field_1": "channel__chi_index",
+        "field_2": "topographic__elevation",
+        "field_1_percentile_edges": _EDGES,
+        "field_2_percentile_edges": _EDGES,
+    },
+    "dm": {
+        "_func": "discretized_misfit",
+        "name": "chi_{field_1_level}_z_{field_2_level}",
+        "misfit_field": "topographic__elevation",
+        "field_1": "channel__chi_index",
+        "field_2": "topographic__elevation",
+        "field_1_percentile_edges": [0, 33, 66, 100],
+        "field_2_percentile_edges": [0, 33, 66, 100],
+    },
+}
+_CHI_FINDER_KWDS = {"min_drainage_area": 1.0}
+
+
+class TimeResidual(object):
+    """Creating a ``Residual``, which routes flow twice, and calculating it."""
+
+    params = SHAPES
+    param_names = ["shape"]
+    timeout = TIMEOUT
+
+    def setup_cache(self):
+        return synthetic_grids(seeds=(0, 1), route=False)
+
+    setup_cache.timeout = TIMEOUT
+
+    def setup(self, grids, shape):
+        self.model, _, _ = grids[(shape, 0)]
+        self.data, _, _ = grids[(shape, 1)]
+        self.residual = Residual(
+            self.model,
+            self.data,
+            chi_finder_kwds=_CHI_FINDER_KWDS,
+            residuals=_RESIDUALS,
+        )
+
+    def time_construct(self, grids, shape):
+        Residual(
+            self.model,
+            self.data,
+            chi_finder_kwds=_CHI_FINDER_KWDS,
+            residuals=_RESIDUALS,
+        )
+
+    def time_calculate(self, grids, shape):
+        self.residual.calculate()
+
+    def peakmem_construct_and_calculate(self, grids, shape):
+        residual = Residual(
+            self.model,
+            self.data,
+            chi_finder_kwds=_CHI_FINDER_KWDS,
+            residuals=_RESIDUALS,
+        )
+        residual.calculate()
@@ -0,0 +1,43 @@
+"""Benchmarks for the residual calculations in ``umami.calculations``."""
+import numpy as np
+
+from umami.calculations import joint_density_misfit, kstest, kstest_watershed
+
+from ._grids import OUTLET_ID, SHAPES, TIMEOUT, synthetic_grids
+
+_EDGES = list(np.linspace(0, 100, 11))
+
+
+class TimeResidualCalculations(object):
+    """Each residual calculation between two routed grids."""
+
+    params = SHAPES
+    param_names = ["shape"]
+    timeout = TIMEOUT
+
+    def setup_cache(self):
+        return synthetic_grids(seeds=(0, 1))
+
+    setup_cache.timeout = TIMEOUT
+
+    def setup(self, grids, shape):
+        self.model, _, _ = grids[(shape, 0)]
+        self.data, _, _ = grids[(shape, 1)]
+
+    def time_kstest(self, grids, shape):
+        kstest(self.model, self.data, "topographic__elevation")
+
+    def time_kstest_watershed(self, grids, shape):
+        kstest_watershed(
+            self.model, self.data, "topographic__elevation", OUTLET_ID
+        )
+
+    def time_joint_density_misfit(self, grids, shape):
+        joint_density_misfit(
+            self.model,
+            self.data,
+            "channel__chi_index",
+            "topographic__elevation",
+            _EDGES,
+            _EDGES,
+        )
@@ -0,0 +1,16 @@
+import pytest
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # multiprocessing.shared_memory is new in Python 3.8.
+    collect_ignore = ["umami/shared_grid.py"]
+
+# Doctests that use an optional dependency, by the name of the dependency.
+# They are skipped if it is not installed.
+_OPTIONAL_DOCTESTS = {"umami.metric.Metric.over_time": "xarray"}
+
+
+def pytest_runtest_setup(item):
+    if item.name in _OPTIONAL_DOCTESTS:
+        pytest.importorskip(_OPTIONAL_DOCTESTS[item.name])
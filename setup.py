@@ -27,6 +27,7 @@ setup(
     long_description=open("README.md").read(),
     long_description_content_type="text/markdown",
     zip_safe=False,
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks"]),
     install_requires=["scipy", "numpy", "landlab>=2.0.0b4"],
+    extras_require={"netcdf": ["xarray", "netcdf4"]},
 )
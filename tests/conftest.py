@@ -65,3 +65,113 @@ def category_grid():
     _ = grid.add_field("node", "f1", f1)
     _ = grid.add_field("node", "f2", f2)
     return grid
+
+
+@pytest.fixture()
+def residual_params():
+    params = {
+        "me": {
+            "_func": "aggregate",
+            "method": "mean",
+            "field": "topographic__elevation",
+        },
+        "oid1_mean": {
+            "_func": "watershed_aggregation",
+            "field": "topographic__elevation",
+            "method": "mean",
+            "outlet_id": 1,
+        },
+        "ks": {"_func": "kstest", "field": "topographic__elevation"},
+        "ksw": {
+            "_func": "kstest_watershed",
+            "field": "topographic__elevation",
+            "outlet_id": 1,
+        },
+        "jdm": {
+            "_func": "joint_density_misfit",
+            "field_1": "topographic__elevation",
+            "field_2": "drainage_area",
+            "field_1_percentile_edges": [0, 50, 100],
+            "field_2_percentile_edges": [0, 50, 100],
+        },
+        "dm": {
+            "_func": "discretized_misfit",
+            "name": "dm_{field_1_level}_{field_2_level}",
+            "misfit_field": "topographic__elevation",
+            "field_1": "drainage_area",
+            "field_2": "topographic__elevation",
+            "field_1_percentile_edges": [0, 50, 100],
+            "field_2_percentile_edges": [0, 50, 100],
+        },
+    }
+    return params
+
+
+def _ramp_grid(seed, shape=(20, 20), offset=0.0, outlet_id=None):
+    # a sloping ramp of elevation with random noise at the core nodes.
+    np.random.seed(seed)
+    grid = RasterModelGrid(shape)
+    z = grid.add_zeros("node", "topographic__elevation")
+    z += offset + grid.x_of_node + grid.y_of_node
+    z[grid.core_nodes] += np.random.random(grid.core_nodes.shape)
+    if outlet_id is not None:
+        grid.set_watershed_boundary_condition_outlet_id(outlet_id, z)
+    return grid
+
+
+@pytest.fixture()
+def make_grid():
+    """Make a grid from a random seed and a shape.
+
+    The function is defined at the top level, such that it can be pickled and
+    used as the model function of ``evaluate_many``.
+    """
+    return _ramp_grid
+
+
+@pytest.fixture()
+def metric_params(residual_params):
+    params = {key: residual_params[key] for key in ["me", "oid1_mean"]}
+    params.update(
+        {
+            "es": {
+                "_func": "aggregate",
+                "method": "std",
+                "field": "topographic__elevation",
+            },
+            "esum": {
+                "_func": "aggregate",
+                "method": "sum",
+                "field": "topographic__elevation",
+            },
+            "ep10": {
+                "_func": "aggregate",
+                "method": "percentile",
+                "field": "topographic__elevation",
+                "q": 10,
+            },
+            "ep90": {
+                "_func": "aggregate",
+                "method": "percentile",
+                "field": "topographic__elevation",
+                "q": 90,
+            },
+            "hi": {"_func": "hypsometric_integral", "outlet_id": 1},
+            "sn1": {
+                "_func": "count_equal",
+                "field": "drainage_area",
+                "value": 1,
+            },
+            "da_mean": {
+                "_func": "aggregate",
+                "method": "mean",
+                "field": "drainage_area",
+            },
+        }
+    )
+    return params
+
+
+@pytest.fixture()
+def model_and_data(make_grid):
+    return make_grid(42), make_grid(43)
@@ -1,10 +1,189 @@
 import numpy as np
 import pytest
 
+from landlab import RasterModelGrid
+from umami import Metric
+from umami.calculations import aggregate
 from umami.calculations.metric.aggregate import _aggregate
+from umami.raster import open_raster
+from umami.utils.chunked import _ChunkedStatistics
 
 
 def test_return_not_a_scalar():
     vals = np.random.randn(3, 4)
     with pytest.raises(ValueError):
         _aggregate(vals, "mean", axis=0)
+
+
+@pytest.mark.parametrize(
+    "method", ["mean", "std", "var", "amin", "max", "sum", "median"]
+)
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1000])
+def test_chunked_matches_numpy(method, chunk_size):
+    np.random.seed(0)
+    grid = RasterModelGrid((20, 30))
+    z = grid.add_zeros("node", "topographic__elevation")
+    z += 1.0e6 + np.random.random(grid.number_of_nodes)
+    expected = aggregate(grid, "topographic__elevation", method)
+    actual = aggregate(
+        grid, "topographic__elevation", method, chunk_size=chunk_size
+    )
+    tolerance = 1.0e-4 if method == "median" else 1.0e-9
+    np.testing.assert_allclose(actual, expected, rtol=tolerance)
+
+
+def test_chunked_variance_is_stable():
+    # deviations of 1e-3 about a mean of 1e8 are lost by the naive
+    # formula sum(x**2) / n - mean**2.
+    grid = RasterModelGrid((50, 50))
+    z = grid.add_zeros("node", "topographic__elevation")
+    z += 1.0e8 + 1.0e-3 * (np.arange(grid.number_of_nodes) % 2)
+    actual = aggregate(grid, "topographic__elevation", "var", chunk_size=9)
+    np.testing.assert_allclose(actual, np.var(z[grid.core_nodes]), rtol=1.0e-4)
+
+
+@pytest.mark.parametrize("q", [0, 1, 10, 33.3, 50, 90, 99, 100])
+def test_chunked_percentile_within_a_bin(q):
+    np.random.seed(1)
+    grid = RasterModelGrid((40, 40))
+    z = grid.add_zeros("node", "topographic__elevation")
+    z += np.random.lognormal(size=grid.number_of_nodes)
+    vals = z[grid.core_nodes]
+    bins = 1000
+    actual = aggregate(
+        grid,
+        "topographic__elevation",
+        "percentile",
+        chunk_size=100,
+        bins=bins,
+        q=q,
+    )
+    width = (vals.max() - vals.min()) / bins
+    assert abs(actual - np.percentile(vals, q)) <= width
+
+
+def test_chunked_count(grid):
+    grid.add_zeros("node", "topographic__elevation")
+    grid.status_at_node[12] = grid.BC_NODE_IS_CLOSED
+    count = aggregate(grid, "topographic__elevation", "count", chunk_size=3)
+    assert count == grid.number_of_core_nodes == 63
+
+
+def test_chunked_constant_field(grid):
+    grid.add_ones("node", "topographic__elevation")
+    for method in ["median", "std", "max"]:
+        assert aggregate(
+            grid, "topographic__elevation", method, chunk_size=5
+        ) == aggregate(grid, "topographic__elevation", method)
+
+
+def test_chunked_bad_arguments(grid_with_z):
+    with pytest.raises(ValueError):
+        aggregate(grid_with_z, "topographic__elevation", "ptp", chunk_size=5)
+    with pytest.raises(ValueError):
+        aggregate(grid_with_z, "topographic__elevation", "mean", chunk_size=0)
+    with pytest.raises(ValueError):
+        aggregate(grid_with_z, "topographic__elevation", "mean", bins=10)
+    with pytest.raises(ValueError):
+        aggregate(
+            grid_with_z,
+            "topographic__elevation",
+            "percentile",
+            chunk_size=5,
+            q=[10, 90],
+        )
+
+
+@pytest.mark.parametrize(
+    "method,kwds",
+    [
+        ("percentile", {"q": 10, "interpolation": "lower"}),
+        ("percentile", {}),
+        ("mean", {"ddof": 1}),
+        ("std", {"ddof": 1, "keepdims": True}),
+    ],
+)
+def test_chunked_bad_kwds(grid_with_z, method, kwds):
+    with pytest.raises(ValueError, match="chunked aggregation|requires"):
+        aggregate(
+            grid_with_z, "topographic__elevation", method, chunk_size=5, **kwds
+        )
+
+    metrics = {
+        "me": dict(
+            _func="aggregate",
+            method=method,
+            field="topographic__elevation",
+            chunk_size=5,
+            **kwds
+        ),
+    }
+    with pytest.raises(ValueError, match="chunked aggregation|requires"):
+        Metric(grid_with_z, metrics=metrics)
+
+
+def test_metric_bins_without_chunks(grid_with_z):
+    metrics = {
+        "me": {
+            "_func": "aggregate",
+            "method": "mean",
+            "field": "topographic__elevation",
+            "bins": 10,
+        },
+    }
+    with pytest.raises(ValueError, match="bins"):
+        Metric(grid_with_z, metrics=metrics)
+
+    metrics["me"]["chunk_size"] = 10
+    metric = Metric(grid_with_z, metrics=metrics)
+    metric.calculate()
+    assert metric.value("me") == aggregate(
+        grid_with_z, "topographic__elevation", "mean"
+    )
+
+
+def test_chunked_memmap(tmpdir):
+    z = np.arange(10000.0).reshape((100, 100))
+    path = str(tmpdir.join("dem.npy"))
+    np.save(path, z)
+    grid = open_raster(path)
+    assert aggregate(
+        grid, "topographic__elevation", "mean", chunk_size=512
+    ) == np.mean(z[1:-1, 1:-1])
+
+
+def test_chunked_metric_shares_statistics(grid_with_z, monkeypatch):
+    calls = []
+    original = _ChunkedStatistics.__init__
+
+    def counting(self, *args, **kwds):
+        calls.append(args)
+        original(self, *args, **kwds)
+
+    monkeypatch.setattr(_ChunkedStatistics, "__init__", counting)
+    metrics = {}
+    for method in ["mean", "std", "amax", "count"]:
+        metrics[method] = {
+            "_func": "aggregate",
+            "method": method,
+            "field": "topographic__elevation",
+            "chunk_size": 10,
+        }
+    metrics["plain"] = {
+        "_func": "aggregate",
+        "method": "mean",
+        "field": "topographic__elevation",
+    }
+    metric = Metric(grid_with_z, metrics=metrics)
+    metric.calculate()
+    assert len(calls) == 1
+    assert metric.value("mean") == metric.value("plain")
+    assert metric.value("count") == 64
+
+    # chunked statistics are only calculated again once the field changes.
+    metric.calculate()
+    assert len(calls) == 1
+    grid_with_z.at_node["topographic__elevation"] *= 2.0
+    metric.calculate()
+    assert len(calls) == 2
+    assert metric.value("amax") == 32.0
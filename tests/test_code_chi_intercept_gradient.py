@@ -1,10 +1,145 @@
+import numpy as np
 import pytest
 
+from landlab import RasterModelGrid
+from landlab.components import ChiFinder, FlowAccumulator
+from umami import Metric
+from umami.calculations import chi_gradient, chi_intercept
 from umami.calculations.metric.chi_intercept_gradient import (
     _validate_chi_finder,
 )
+from umami.utils.watershed import _get_watershed_mask
 
 
 def test_bad_input():
     with pytest.raises(ValueError):
         _validate_chi_finder("spam")
+
+
+@pytest.fixture()
+def chi_grid():
+    np.random.seed(1)
+    grid = RasterModelGrid((30, 40))
+    z = grid.add_zeros("node", "topographic__elevation")
+    z += 0.1 * grid.x_of_node ** 1.5 + 0.2 * grid.y_of_node
+    z += np.random.random(grid.number_of_nodes)
+    return grid
+
+
+def test_one_fit_per_calculate(monkeypatch, chi_grid):
+    metrics = {
+        "cg": {"_func": "chi_gradient"},
+        "ci": {"_func": "chi_intercept"},
+    }
+    metric = Metric(
+        chi_grid,
+        chi_finder_kwds={"min_drainage_area": 5.0},
+        metrics=metrics,
+    )
+
+    calls = []
+    fit = ChiFinder.best_fit_chi_elevation_gradient_and_intercept
+
+    def counting_fit(self, *args, **kwds):
+        calls.append(self)
+        return fit(self, *args, **kwds)
+
+    monkeypatch.setattr(
+        ChiFinder,
+        "best_fit_chi_elevation_gradient_and_intercept",
+        counting_fit,
+    )
+    metric.calculate()
+    assert len(calls) == 1
+
+    # nothing changed, so the fit is not repeated.
+    metric.calculate()
+    assert len(calls) == 1
+
+    chi_grid.at_node["topographic__elevation"] *= 2.0
+    metric.calculate()
+    assert len(calls) == 2
+
+    assert metric.values == [
+        chi_gradient(metric._cf),
+        chi_intercept(metric._cf),
+    ]
+
+
+def test_fit_per_watershed(chi_grid):
+    fa = FlowAccumulator(
+        chi_grid,
+        flow_director="D8",
+        depression_finder="DepressionFinderAndRouter",
+    )
+    fa.run_one_step()
+    cf = ChiFinder(chi_grid, min_drainage_area=5.0)
+    cf.calculate_chi()
+
+    # nested outlets with the largest drainage area.
+    area = chi_grid.at_node["drainage_area"]
+    outlet_ids = np.argsort(area)[::-1][:8]
+
+    gradients = chi_gradient(cf, outlet_id=outlet_ids, name="{outlet_id}")
+    intercepts = chi_intercept(cf, outlet_id=outlet_ids, name="{outlet_id}")
+    channel = np.logical_not(cf.hillslope_mask)
+    chi = chi_grid.at_node["channel__chi_index"]
+    z = chi_grid.at_node["topographic__elevation"]
+    for oid in outlet_ids:
+        nodes = channel & _get_watershed_mask(chi_grid, oid)
+        gradient, intercept = np.polyfit(chi[nodes], z[nodes], 1)
+
+        np.testing.assert_almost_equal(gradients[str(oid)], gradient)
+        np.testing.assert_almost_equal(intercepts[str(oid)], intercept)
+        np.testing.assert_almost_equal(
+            chi_gradient(cf, outlet_id=oid), gradient
+        )
+        np.testing.assert_almost_equal(
+            chi_intercept(cf, outlet_id=oid), intercept
+        )
+
+
+def test_no_channel_nodes(chi_grid):
+    fa = FlowAccumulator(chi_grid, flow_director="D8")
+    fa.run_one_step()
+    cf = ChiFinder(chi_grid, min_drainage_area=1e9)
+    cf.calculate_chi()
+
+    oid = int(np.argmax(chi_grid.at_node["drainage_area"]))
+    assert np.isnan(chi_gradient(cf, outlet_id=oid))
+    assert np.isnan(chi_intercept(cf, outlet_id=oid))
+
+    out = chi_gradient(cf, outlet_id=[oid], name="cg_{outlet_id}")
+    assert np.isnan(out["cg_{}".format(oid)])
+
+
+def test_fit_per_watershed_metric(chi_grid):
+    metrics = {
+        "cg": {
+            "_func": "chi_gradient",
+            "outlet_id": "all_outlets",
+            "name": "cg_{outlet_id}",
+        },
+        "ci": {
+            "_func": "chi_intercept",
+            "outlet_id": "all_outlets",
+            "name": "ci_{outlet_id}",
+        },
+    }
+    metric = Metric(
+        chi_grid,
+        chi_finder_kwds={"min_drainage_area": 5.0},
+        metrics=metrics,
+    )
+    metric.calculate()
+
+    n_outlets = len(metric.names) // 2
+    assert metric.names[0].startswith("cg_")
+    assert metric.names[n_outlets].startswith("ci_")
+    assert len(metric.values) == len(metric.names)
+
+
+def test_name_required(chi_grid):
+    metrics = {"cg": {"_func": "chi_gradient", "outlet_id": [1, 2]}}
+    with pytest.raises(ValueError):
+        Metric(chi_grid, metrics=metrics)
@@ -0,0 +1,80 @@
+import pickle
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_almost_equal
+
+from landlab.components import FlowAccumulator
+from umami import DataReference, Residual
+
+
+def test_same_as_residual(model_and_data, residual_params):
+    model, data = model_and_data
+
+    residual = Residual(model, data, residuals=residual_params)
+    residual.calculate()
+
+    reference = DataReference(data, residuals=residual_params)
+    from_reference = Residual(model, reference)
+    from_reference.calculate()
+
+    assert from_reference.names == residual.names
+    assert_array_almost_equal(from_reference.values, residual.values)
+    np.testing.assert_array_equal(from_reference.category, residual.category)
+    assert residual.category.dtype == int
+    assert residual.category.flags.writeable
+
+
+def test_pickle(model_and_data, residual_params):
+    model, data = model_and_data
+
+    reference = DataReference(data, residuals=residual_params)
+    residual = Residual(model, reference)
+    residual.calculate()
+
+    unpickled = pickle.loads(pickle.dumps(reference))
+    from_unpickled = Residual(model, unpickled)
+    from_unpickled.calculate()
+
+    assert_array_almost_equal(from_unpickled.values, residual.values)
+
+
+def test_only_model_routed(monkeypatch, model_and_data, residual_params):
+    model, data = model_and_data
+    reference = DataReference(data, residuals=residual_params)
+
+    calls = []
+    run_one_step = FlowAccumulator.run_one_step
+
+    def counting_run_one_step(self, *args, **kwds):
+        calls.append(self.grid)
+        return run_one_step(self, *args, **kwds)
+
+    monkeypatch.setattr(FlowAccumulator, "run_one_step", counting_run_one_step)
+
+    for _ in range(3):
+        residual = Residual(model, reference)
+        residual.calculate()
+
+    assert len(calls) == 3
+    assert all(grid is model for grid in calls)
+
+
+def test_residuals_from_reference_only(model_and_data, residual_params):
+    model, data = model_and_data
+    reference = DataReference(data, residuals=residual_params)
+
+    with pytest.raises(ValueError):
+        Residual(model, reference, residuals=residual_params)
+
+    with pytest.raises(ValueError):
+        Residual(model, reference, flow_accumulator_kwds={})
+
+    residual = Residual(model, reference)
+    with pytest.raises(ValueError):
+        residual.add_from_dict(residual_params)
+
+
+def test_no_required_field(grid):
+    with pytest.raises(ValueError):
+        DataReference(grid)
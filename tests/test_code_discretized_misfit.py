@@ -1,11 +1,16 @@
+import importlib
 from collections import OrderedDict
 
 import numpy as np
 import pytest
 
 from landlab import RasterModelGrid
+from umami import DataReference, Residual
 from umami.calculations import discretized_misfit
-from umami.calculations.residual.discretized_misfit import _get_category_labels
+from umami.calculations.residual.discretized_misfit import (
+    _get_category_labels,
+    _prepare_discretized_misfit,
+)
 
 
 def test_correct_category_labels(category_grid):
@@ -45,6 +50,30 @@ def test_no_misfit(category_grid):
         np.testing.assert_array_equal(out[key], 0.0)
 
 
+def test_category_is_writable_int(category_grid):
+    model_grid = RasterModelGrid((6, 6))
+    data_grid = category_grid
+
+    vals = np.arange(36)
+    _ = model_grid.add_field("node", "misfit_field", vals)
+    _ = data_grid.add_field("node", "misfit_field", vals)
+
+    category, _ = discretized_misfit(
+        model_grid,
+        data_grid,
+        "{field_1_level}_{field_2_level}",
+        "misfit_field",
+        "f1",
+        "f2",
+        [0, 25, 50, 75, 100],
+        [0, 25, 50, 75, 100],
+    )
+
+    assert category.dtype == int
+    assert category.flags.writeable
+    assert np.min(category - 2) == -2
+
+
 def test_known_misfit(category_grid):
     model_grid = RasterModelGrid((6, 6))
     data_grid = category_grid
@@ -69,3 +98,156 @@ def test_known_misfit(category_grid):
     assert len(out) == 16
     for ix, key in enumerate(out):
         np.testing.assert_array_equal(out[key], core_vals[ix])
+
+
+def _loop_category_labels(
+    grid, field_1, field_2, field_1_percentile_edges, field_2_percentile_edges
+):
+    # the implementation of _get_category_labels before it was vectorized.
+    f1 = grid.at_node[field_1]
+    f2 = grid.at_node[field_2]
+
+    is_core = np.zeros_like(f1, dtype=bool)
+    is_core[grid.core_nodes] = True
+
+    f1_edges = np.percentile(f1[is_core], field_1_percentile_edges)
+
+    category = np.zeros_like(f1, dtype=int)
+
+    val = 1
+    for i in range(len(f1_edges) - 1):
+        f1_min = f1_edges[i]
+        f1_max = f1_edges[i + 1]
+
+        if i != len(f1_edges) - 2:
+            f1_sel = (f1 >= f1_min) & (f1 < f1_max) & (is_core)
+        else:
+            f1_sel = (f1 >= f1_min) & (is_core)
+
+        vals_sel = f2[f1_sel]
+        f2_edges = np.percentile(vals_sel, field_2_percentile_edges)
+
+        for j in range(len(f2_edges) - 1):
+            f2_min = f2_edges[j]
+            f2_max = f2_edges[j + 1]
+
+            if j != len(f2_edges) - 2:
+                f2_sel = (f2 >= f2_min) & (f2 < f2_max) & (f1_sel)
+            else:
+                f2_sel = (f2 >= f2_min) & (f1_sel)
+
+            sel_nodes = np.nonzero(f2_sel)[0]
+
+            if len(sel_nodes) > 0:
+                category[sel_nodes] = val
+
+            val += 1
+
+    return category
+
+
+def _loop_misfit(category, difference):
+    out = []
+    for c in range(0, np.max(category)):
+        loc = category == (c + 1)
+        out.append(np.sqrt(np.mean(np.power(difference[loc], 2.0))))
+    return out
+
+
+@pytest.mark.parametrize(
+    "e1,e2",
+    [
+        ([0, 50, 100], [0, 50, 100]),
+        ([0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100], [0, 25, 50, 75, 100]),
+        ([10, 60, 90], [5, 30, 95]),
+        ([0, 33, 66, 100], [0, 100]),
+    ],
+)
+@pytest.mark.parametrize("ties", [False, True])
+def test_matches_loop(e1, e2, ties):
+    np.random.seed(3)
+    grid = RasterModelGrid((40, 50))
+    f1 = grid.add_field("node", "f1", np.random.random(grid.number_of_nodes))
+    f2 = grid.add_field("node", "f2", np.random.random(grid.number_of_nodes))
+    if ties:
+        f1[:] = np.round(f1, decimals=1)
+        f2[:] = np.round(f2, decimals=1)
+    f2[grid.core_nodes[:10]] = np.nan
+
+    category = _get_category_labels(grid, "f1", "f2", e1, e2)
+    expected = _loop_category_labels(grid, "f1", "f2", e1, e2)
+    np.testing.assert_array_equal(category, expected)
+
+    model_grid = RasterModelGrid((40, 50))
+    model_grid.add_field("node", "f1", np.random.random(grid.number_of_nodes))
+    _, out = discretized_misfit(
+        model_grid,
+        grid,
+        "{field_1_level}_{field_2_level}",
+        "f1",
+        "f1",
+        "f2",
+        e1,
+        e2,
+    )
+    np.testing.assert_array_almost_equal(
+        list(out.values()),
+        _loop_misfit(expected, model_grid.at_node["f1"] - grid.at_node["f1"]),
+    )
+
+
+def test_categories_prepared_once(
+    monkeypatch, model_and_data, residual_params
+):
+    dm = importlib.import_module(
+        "umami.calculations.residual.discretized_misfit"
+    )
+
+    calls = []
+    get_category_labels = dm._get_category_labels
+
+    def counting_get_category_labels(*args, **kwds):
+        calls.append(args)
+        return get_category_labels(*args, **kwds)
+
+    monkeypatch.setattr(
+        dm, "_get_category_labels", counting_get_category_labels
+    )
+
+    model, data = model_and_data
+    residuals = {"dm": residual_params["dm"]}
+    residual = Residual(model, data, residuals=residuals)
+    residual.calculate()
+    model.at_node["topographic__elevation"] += 1.0
+    residual.calculate()
+    assert len(calls) == 1
+
+    # a DataReference prepares the categories once for all models.
+    reference = DataReference(data, residuals=residuals)
+    assert len(calls) == 2
+    for _ in range(2):
+        Residual(model, reference).calculate()
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("n_edges,dtype", [(3, np.uint8), (20, np.uint16)])
+def test_category_groups(n_edges, dtype):
+    np.random.seed(1)
+    grid = RasterModelGrid((30, 30))
+    grid.add_field("node", "f1", np.random.random(grid.number_of_nodes))
+    grid.add_field("node", "f2", np.random.random(grid.number_of_nodes))
+
+    edges = np.linspace(0, 100, n_edges)
+    category, nodes, bounds = _prepare_discretized_misfit(
+        grid, "f1", "f2", edges, edges
+    )
+    assert category.dtype == dtype
+    np.testing.assert_array_equal(
+        category, _get_category_labels(grid, "f1", "f2", edges, edges)
+    )
+
+    assert bounds.size == np.max(category) + 1
+    for c in range(1, np.max(category) + 1):
+        np.testing.assert_array_equal(
+            nodes[bounds[c - 1] : bounds[c]], np.flatnonzero(category == c)
+        )
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_almost_equal
+from scipy.stats import ks_2samp
+
+from umami import DataReference, Residual
+from umami.calculations.residual.kstest import _ks_statistic
+
+
+@pytest.fixture()
+def ensemble_params(residual_params):
+    residual_params.pop("oid1_mean")
+    residual_params["n_one"] = {
+        "_func": "count_equal",
+        "field": "drainage_area",
+        "value": 1,
+    }
+    residual_params["ep10"] = {
+        "_func": "aggregate",
+        "method": "percentile",
+        "field": "topographic__elevation",
+        "q": 10,
+    }
+    return residual_params
+
+
+@pytest.mark.parametrize("use_reference", [False, True])
+def test_ensemble_matches_members(
+    make_grid, model_and_data, ensemble_params, use_reference
+):
+    _, data = model_and_data
+
+    # calculate each member on its own, after flow routing.
+    expected = []
+    fields = {"topographic__elevation": [], "drainage_area": []}
+    for seed in range(5):
+        member = make_grid(seed)
+        residual = Residual(member, data, residuals=ensemble_params)
+        residual.calculate()
+        expected.append(residual.values)
+        for name in fields:
+            fields[name].append(member.at_node[name].copy())
+    fields = {name: np.vstack(vals) for name, vals in fields.items()}
+
+    if use_reference:
+        data = DataReference(data, residuals=ensemble_params)
+        residual = Residual(make_grid(0), data)
+    else:
+        residual = Residual(make_grid(0), data, residuals=ensemble_params)
+    out = residual.calculate_ensemble(fields)
+
+    assert out.shape == (5, len(residual.names))
+    assert_array_almost_equal(out, expected)
+
+
+def test_ks_statistic_with_ties():
+    np.random.seed(0)
+    model = np.random.randint(0, 10, size=(20, 50)).astype(float)
+    data = np.random.randint(0, 12, size=40).astype(float)
+
+    expected = [ks_2samp(row, data)[0] for row in model]
+    assert_array_almost_equal(
+        _ks_statistic(np.sort(model, axis=1), np.sort(data)), expected
+    )
+
+
+def test_ensemble_requires_routing(model_and_data, residual_params):
+    model, data = model_and_data
+    residual = Residual(model, data, residuals=residual_params)
+    z = np.vstack([model.at_node["topographic__elevation"]] * 2)
+    with pytest.raises(ValueError):
+        residual.calculate_ensemble({"topographic__elevation": z})
+
+
+def test_ensemble_missing_field(model_and_data, ensemble_params):
+    model, data = model_and_data
+    residual = Residual(model, data, residuals=ensemble_params)
+    z = np.vstack([model.at_node["topographic__elevation"]] * 2)
+    with pytest.raises(ValueError):
+        residual.calculate_ensemble({"topographic__elevation": z})
+
+
+def test_ensemble_bad_shape(model_and_data, ensemble_params):
+    model, data = model_and_data
+    residual = Residual(model, data, residuals={"ks": ensemble_params["ks"]})
+    z = model.at_node["topographic__elevation"]
+    with pytest.raises(ValueError):
+        residual.calculate_ensemble({"topographic__elevation": z})
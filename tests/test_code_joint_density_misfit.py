@@ -3,6 +3,11 @@ import pytest
 
 from landlab import RasterModelGrid
 from umami.calculations import joint_density_misfit
+from umami.calculations.residual.joint_density_misfit import (
+    _histogram_bin,
+    _joint_density_misfits,
+    _prepare_joint_density_misfit,
+)
 
 
 def test_perfect_misfit(category_grid):
@@ -22,3 +27,95 @@ def test_perfect_misfit(category_grid):
     )
 
     np.testing.assert_array_equal(out, 1 / 16)
+
+
+def _histogram2d_misfit(f1_model, f2_model, f1_data, f2_data, e1, e2):
+    # the implementation of joint_density_misfit with np.histogram2d.
+    f1_edges = np.percentile(f1_data, e1)
+    f2_edges = np.percentile(f2_data, e2)
+    data_count, _, _ = np.histogram2d(
+        f1_data, f2_data, bins=(f1_edges, f2_edges)
+    )
+    data_density = data_count / data_count.sum()
+    model_count, _, _ = np.histogram2d(
+        f1_model, f2_model, bins=(f1_edges, f2_edges)
+    )
+    if model_count.sum() == 0:
+        model_density = model_count
+    else:
+        model_density = model_count / model_count.sum()
+    return np.sqrt(np.mean(np.power(model_density - data_density, 2.0)))
+
+
+@pytest.mark.parametrize(
+    "e1,e2",
+    [
+        ([0, 50, 100], [0, 50, 100]),
+        ([0, 25, 50, 75, 100], [0, 20, 40, 60, 80, 100]),
+        ([10, 50, 90], [0, 0, 50, 100, 100]),
+        (list(np.linspace(0, 100, 30)), [0, 50, 100]),
+    ],
+)
+@pytest.mark.parametrize("offset", [0.0, 0.3, 2.0])
+def test_matches_histogram2d(e1, e2, offset):
+    np.random.seed(5)
+    shape = (30, 40)
+    model = RasterModelGrid(shape)
+    data = RasterModelGrid(shape)
+    for grid, shift in ((model, offset), (data, 0.0)):
+        vals = np.round(np.random.random(grid.number_of_nodes), decimals=1)
+        grid.add_field("node", "f1", vals + shift)
+        grid.add_field("node", "f2", np.random.random(grid.number_of_nodes))
+
+    core = data.core_nodes
+    expected = _histogram2d_misfit(
+        model.at_node["f1"][core],
+        model.at_node["f2"][core],
+        data.at_node["f1"][core],
+        data.at_node["f2"][core],
+        e1,
+        e2,
+    )
+    out = joint_density_misfit(model, data, "f1", "f2", e1, e2)
+    np.testing.assert_almost_equal(out, expected)
+
+
+@pytest.mark.parametrize("n_edges", [3, 30])
+def test_histogram_bin_outside_edges(n_edges):
+    # counting edges (few edges) and searchsorted (many edges) agree.
+    edges = np.linspace(0.0, 1.0, n_edges)
+    vals = np.array([-1.0, 0.0, 0.5, 1.0, 2.0, np.nan])
+    index = _histogram_bin(vals, edges)
+    assert list(index[[0, 1, 3, 4, 5]]) == [0, 1, n_edges - 1] + 2 * [n_edges]
+
+
+def test_field_pairs_in_one_call(model_and_data):
+    model, data = model_and_data
+    for grid in (model, data):
+        grid.add_field("node", "f1", np.random.random(grid.number_of_nodes))
+        grid.add_field("node", "f2", np.random.random(grid.number_of_nodes))
+
+    edges = [0, 25, 50, 75, 100]
+    pairs = [
+        ("topographic__elevation", "f1"),
+        ("topographic__elevation", "f2"),
+        ("f1", "f2"),
+    ]
+    infos = [{"field_1": f1, "field_2": f2} for f1, f2 in pairs]
+    prepared = [
+        _prepare_joint_density_misfit(data, f1, f2, edges, edges)
+        for f1, f2 in pairs
+    ]
+
+    fetched = []
+
+    def core_values(field):
+        fetched.append(field)
+        return model.at_node[field][model.core_nodes]
+
+    out = _joint_density_misfits(core_values, prepared, infos)
+    assert sorted(fetched) == ["f1", "f2", "topographic__elevation"]
+    for (f1, f2), value in zip(pairs, out):
+        np.testing.assert_almost_equal(
+            value, joint_density_misfit(model, data, f1, f2, edges, edges)
+        )
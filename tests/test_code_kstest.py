@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_almost_equal
+from scipy.stats import ks_2samp
+
+from landlab.components import FlowAccumulator
+from umami import Residual
+from umami.calculations import kstest, kstest_watershed
+from umami.calculations.residual.kstest import _ks_statistic, _ks_statistics
+
+
+@pytest.mark.parametrize("n_model,n_data", [(1, 1), (5, 200), (300, 40)])
+@pytest.mark.parametrize("ties", [False, True])
+def test_ks_statistic_matches_scipy(n_model, n_data, ties):
+    np.random.seed(n_model + n_data)
+    for _ in range(20):
+        model = np.random.normal(size=n_model)
+        data = np.random.normal(0.3, size=n_data)
+        if ties:
+            model = np.round(model, decimals=1)
+            data = np.round(data, decimals=1)
+        assert_almost_equal(
+            _ks_statistic(np.sort(model), np.sort(data)),
+            ks_2samp(model, data)[0],
+        )
+
+
+def test_ks_statistics_many_samples():
+    np.random.seed(0)
+    model = [np.random.normal(size=n) for n in (10, 50, 3)]
+    data = [np.random.normal(size=n) for n in (20, 5, 30)]
+
+    out = _ks_statistics(model, [np.sort(vals) for vals in data])
+    assert_almost_equal(out, [ks_2samp(m, d)[0] for m, d in zip(model, data)])
+
+
+def test_kstest_matches_scipy(model_and_data):
+    model, data = model_and_data
+    field = "topographic__elevation"
+    expected, _ = ks_2samp(
+        model.at_node[field][model.core_nodes],
+        data.at_node[field][data.core_nodes],
+    )
+    assert_almost_equal(kstest(model, data, field), expected)
+
+
+def test_kstest_watershed_many_outlets(model_and_data):
+    model, data = model_and_data
+    # route flow on both grids.
+    for grid in (model, data):
+        FlowAccumulator(grid).run_one_step()
+    outlet_ids = data.core_nodes[::37]
+
+    out = kstest_watershed(
+        model,
+        data,
+        "topographic__elevation",
+        outlet_id=outlet_ids,
+        name="ks_{outlet_id}",
+    )
+    assert list(out) == ["ks_{oid}".format(oid=oid) for oid in outlet_ids]
+    for oid in outlet_ids:
+        assert_almost_equal(
+            out["ks_{oid}".format(oid=oid)],
+            kstest_watershed(model, data, "topographic__elevation", oid),
+        )
+
+
+def test_residual_all_outlets(model_and_data):
+    model, data = model_and_data
+    residuals = {
+        "ksw": {
+            "_func": "kstest_watershed",
+            "field": "topographic__elevation",
+            "outlet_id": "all_outlets",
+            "name": "ksw_{outlet_id}",
+        }
+    }
+    residual = Residual(model, data, residuals=residuals)
+    residual.calculate()
+    assert len(residual.names) > 1
+    assert len(residual.values) == len(residual.names)
+
+    for name, value in zip(residual.names, residual.values):
+        oid = int(name.split("_")[1])
+        assert_almost_equal(
+            value, kstest_watershed(model, data, "topographic__elevation", oid)
+        )
+
+    z = np.vstack([model.at_node["topographic__elevation"]] * 2)
+    out = residual.calculate_ensemble({"topographic__elevation": z})
+    assert_almost_equal(out, [residual.values] * 2)
+
+
+def test_name_required(model_and_data):
+    model, data = model_and_data
+    residuals = {
+        "ksw": {
+            "_func": "kstest_watershed",
+            "field": "topographic__elevation",
+            "outlet_id": [1, 2],
+        }
+    }
+    with pytest.raises(ValueError):
+        Residual(model, data, residuals=residuals)
@@ -1,6 +1,15 @@
+import numpy as np
 import pytest
 
+from landlab import RasterModelGrid
+from landlab.components import ChiFinder, FlowAccumulator
 from umami import Metric
+from umami.calculations import (
+    aggregate,
+    count_equal,
+    hypsometric_integral,
+    mask_aggregation,
+)
 
 
 def test_no_required_field(grid):
@@ -24,3 +33,380 @@ def test_bad_func_in_info(grid_with_z):
     metrics = {"ce": {"_func": "eggs"}}
     with pytest.raises(ValueError):
         Metric(grid_with_z, metrics=metrics)
+
+
+def test_precomputed_components(grid_with_z):
+    fa = FlowAccumulator(grid_with_z)
+    fa.run_one_step()
+    cf = ChiFinder(grid_with_z)
+    cf.calculate_chi()
+
+    metric = Metric(grid_with_z, flow_accumulator=fa, chi_finder=cf)
+    assert metric._fa is fa
+    assert metric._cf is cf
+
+
+def test_precomputed_components_missing_chi_finder(grid_with_z):
+    fa = FlowAccumulator(grid_with_z)
+    fa.run_one_step()
+    with pytest.raises(ValueError):
+        Metric(grid_with_z, flow_accumulator=fa)
+
+
+def test_precomputed_components_other_grid(grid_with_z):
+    other = RasterModelGrid((10, 10))
+    z = other.add_zeros("node", "topographic__elevation")
+    z += other.x_of_node + other.y_of_node
+    fa = FlowAccumulator(other)
+    fa.run_one_step()
+    cf = ChiFinder(other)
+    cf.calculate_chi()
+    with pytest.raises(ValueError):
+        Metric(grid_with_z, flow_accumulator=fa, chi_finder=cf)
+
+
+def test_plan_same_as_functions(grid_with_z):
+    z = grid_with_z.at_node["topographic__elevation"]
+    _ = grid_with_z.add_field("node", "mask", z > 11)
+    metrics = {
+        "me": {
+            "_func": "aggregate",
+            "method": "mean",
+            "field": "topographic__elevation",
+        },
+        "ep10": {
+            "_func": "aggregate",
+            "method": "percentile",
+            "field": "topographic__elevation",
+            "q": 10,
+        },
+        "mask_mean": {
+            "_func": "mask_aggregation",
+            "field": "topographic__elevation",
+            "mask": "mask",
+            "method": "mean",
+        },
+        "elev4": {
+            "_func": "count_equal",
+            "field": "topographic__elevation",
+            "value": 4,
+        },
+        "hi": {"_func": "hypsometric_integral", "outlet_id": 1},
+    }
+    metric = Metric(grid_with_z, metrics=metrics)
+    metric.calculate()
+
+    expected = [
+        aggregate(grid_with_z, "topographic__elevation", "mean"),
+        aggregate(grid_with_z, "topographic__elevation", "percentile", q=10),
+        mask_aggregation(
+            grid_with_z, "topographic__elevation", "mask", "mean"
+        ),
+        count_equal(grid_with_z, "topographic__elevation", 4),
+        hypsometric_integral(grid_with_z, 1),
+    ]
+    assert metric.values == expected
+
+
+def test_plan_uses_current_field(grid_with_z):
+    metrics = {
+        "me": {
+            "_func": "aggregate",
+            "method": "mean",
+            "field": "topographic__elevation",
+        }
+    }
+    metric = Metric(grid_with_z, metrics=metrics)
+    metric.calculate()
+    assert metric.values == [9.0]
+
+    grid_with_z.at_node["topographic__elevation"] = np.zeros(100)
+    metric.calculate()
+    assert metric.values == [0.0]
+
+
+def test_percentiles_fused(monkeypatch, grid_with_z):
+    metrics = {}
+    for q in [10, 25, 50, 75, 90]:
+        metrics["z{q}".format(q=q)] = {
+            "_func": "aggregate",
+            "method": "percentile",
+            "field": "topographic__elevation",
+            "q": q,
+        }
+    metrics["z_mean"] = {
+        "_func": "aggregate",
+        "method": "mean",
+        "field": "topographic__elevation",
+    }
+    metrics["z_lower50"] = {
+        "_func": "aggregate",
+        "method": "percentile",
+        "field": "topographic__elevation",
+        "q": 50,
+        "keepdims": False,
+    }
+    metric = Metric(grid_with_z, metrics=metrics)
+
+    calls = []
+    percentile = np.percentile
+
+    def counting_percentile(*args, **kwds):
+        calls.append(kwds)
+        return percentile(*args, **kwds)
+
+    monkeypatch.setattr(np, "percentile", counting_percentile)
+    metric.calculate()
+    monkeypatch.undo()
+
+    # one call for the default keywords, and one for keepdims=False.
+    assert len(calls) == 2
+
+    z = grid_with_z.at_node["topographic__elevation"][grid_with_z.core_nodes]
+    expected = [np.percentile(z, q) for q in [10, 25, 50, 75, 90]]
+    expected += [np.mean(z), np.percentile(z, 50, keepdims=False)]
+    assert metric.values == expected
+
+
+def test_aggregate_only_skips_routing(grid_with_z):
+    metrics = {
+        "me": {
+            "_func": "aggregate",
+            "method": "mean",
+            "field": "topographic__elevation",
+        }
+    }
+    metric = Metric(grid_with_z, metrics=metrics)
+    metric.calculate()
+    assert metric._fa is None
+    assert metric._cf is None
+    assert "drainage_area" not in grid_with_z.at_node
+    assert metric.values == [9.0]
+
+
+def test_routing_without_chi(grid_with_z):
+    metrics = {
+        "sn1": {"_func": "count_equal", "field": "drainage_area", "value": 1}
+    }
+    metric = Metric(grid_with_z, metrics=metrics)
+    assert isinstance(metric._fa, FlowAccumulator)
+    assert metric._cf is None
+    assert "channel__chi_index" not in grid_with_z.at_node
+    assert "flow__distance" not in grid_with_z.at_node
+    metric.calculate()
+    assert metric.values == [8]
+
+
+@pytest.mark.parametrize(
+    "info,fields",
+    [
+        ({"_func": "chi_gradient"}, ["channel__chi_index"]),
+        (
+            {
+                "_func": "aggregate",
+                "method": "amax",
+                "field": "flow__distance",
+            },
+            ["flow__distance"],
+        ),
+        ({"_func": "hypsometric_integral", "outlet_id": 1}, []),
+    ],
+)
+def test_components_run_for_metric(grid_with_z, info, fields):
+    metric = Metric(
+        grid_with_z,
+        chi_finder_kwds={"min_drainage_area": 1.0},
+        metrics={"m": info},
+    )
+    assert "drainage_area" in grid_with_z.at_node
+    for field in fields:
+        assert field in grid_with_z.at_node
+    metric.calculate()
+
+
+def test_components_run_when_metrics_are_added(grid_with_z):
+    metric = Metric(grid_with_z)
+    assert metric._fa is None
+
+    metric.add_from_dict(
+        {
+            "fd": {
+                "_func": "aggregate",
+                "method": "amax",
+                "field": "flow__distance",
+            }
+        }
+    )
+    assert metric._fa is not None
+    metric.calculate()
+    assert metric.values == [
+        np.amax(grid_with_z.at_node["flow__distance"][grid_with_z.core_nodes])
+    ]
+
+
+def test_produced_field_missing_after_routing(grid_with_z):
+    # the default flow director does not write receiver proportions.
+    metrics = {
+        "rp": {
+            "_func": "aggregate",
+            "method": "mean",
+            "field": "flow__receiver_proportions",
+        }
+    }
+    with pytest.raises(ValueError):
+        Metric(grid_with_z, metrics=metrics)
+
+
+def _counting(monkeypatch, cls, name, calls):
+    original = getattr(cls, name)
+
+    def counting(self, *args, **kwds):
+        calls[name] = calls.get(name, 0) + 1
+        return original(self, *args, **kwds)
+
+    monkeypatch.setattr(cls, name, counting)
+
+
+def test_incremental_calculate(monkeypatch, grid_with_z):
+    grid_with_z.add_ones("node", "uplift_rate")
+    metrics = {
+        "ur": {"_func": "aggregate", "method": "mean", "field": "uplift_rate"},
+        "oid1_mean": {
+            "_func": "watershed_aggregation",
+            "field": "topographic__elevation",
+            "method": "mean",
+            "outlet_id": 1,
+        },
+        "sn1": {"_func": "count_equal", "field": "drainage_area", "value": 1},
+    }
+    metric = Metric(grid_with_z, metrics=metrics, profile=True)
+
+    calls = {}
+    _counting(monkeypatch, FlowAccumulator, "run_one_step", calls)
+    metric.calculate()
+    assert calls == {}
+
+    # only the metric that uses uplift_rate is calculated again.
+    grid_with_z.at_node["uplift_rate"][:] = 2.0
+    metric.calculate()
+    assert calls == {}
+    assert [record["calls"] for record in metric.profile[1:]] == [2, 1, 1]
+
+    # a change in elevation routes flow again.
+    z = grid_with_z.at_node["topographic__elevation"]
+    core_nodes = grid_with_z.core_nodes
+    z[core_nodes] += np.random.random(core_nodes.size)
+    metric.calculate()
+    assert calls == {"run_one_step": 1}
+
+    expected = Metric(grid_with_z, metrics=metrics)
+    expected.calculate()
+    assert metric.values == expected.values
+
+
+def test_incremental_calculate_replaced_field(grid_with_z):
+    grid_with_z.add_ones("node", "uplift_rate")
+    metrics = {
+        "ur": {"_func": "aggregate", "method": "mean", "field": "uplift_rate"}
+    }
+    metric = Metric(grid_with_z, metrics=metrics)
+    metric.calculate()
+    assert metric.values == [1.0]
+
+    grid_with_z.at_node["uplift_rate"] = np.full(
+        grid_with_z.number_of_nodes, 3
+    )
+    metric.calculate()
+    assert metric.values == [3.0]
+
+
+def test_incremental_calculate_compares_values(grid_with_z):
+    grid_with_z.add_ones("node", "uplift_rate")
+    metrics = {
+        "ur": {"_func": "aggregate", "method": "mean", "field": "uplift_rate"}
+    }
+    metric = Metric(grid_with_z, metrics=metrics, profile=True)
+    metric.calculate()
+
+    # a new array with the same values is not a change, any other value is.
+    uplift_rate = grid_with_z.at_node["uplift_rate"].copy()
+    grid_with_z.at_node["uplift_rate"] = uplift_rate
+    metric.calculate()
+    assert metric.profile[-1]["calls"] == 1
+
+    uplift_rate[-1] = 1.0 + 1e-12
+    metric.calculate()
+    assert metric.profile[-1]["calls"] == 2
+
+
+def test_incremental_calculate_replaced_metric(grid_with_z):
+    metric = Metric(
+        grid_with_z,
+        metrics={
+            "z": {
+                "_func": "aggregate",
+                "method": "mean",
+                "field": "topographic__elevation",
+            }
+        },
+    )
+    metric.calculate()
+    metric.add_from_dict(
+        {
+            "z": {
+                "_func": "aggregate",
+                "method": "amax",
+                "field": "topographic__elevation",
+            }
+        }
+    )
+    metric.calculate()
+    assert metric.values == [16.0]
+
+
+def test_update_reuses_components(grid_with_z):
+    metrics = {
+        "fd": {
+            "_func": "aggregate",
+            "method": "amax",
+            "field": "flow__distance",
+        },
+        "cg": {"_func": "chi_gradient"},
+    }
+    kwds = {"min_drainage_area": 1.0}
+    metric = Metric(grid_with_z, chi_finder_kwds=kwds, metrics=metrics)
+    metric.calculate()
+
+    fa, cf = metric._fa, metric._cf
+    distance = grid_with_z.at_node["flow__distance"]
+    z = grid_with_z.at_node["topographic__elevation"]
+    grid_with_z.set_watershed_boundary_condition_outlet_id(1, z)
+
+    metric.update()
+    assert metric._fa is fa
+    assert metric._cf is cf
+    assert grid_with_z.at_node["flow__distance"] is distance
+    metric.calculate()
+
+    other = RasterModelGrid((10, 10))
+    other.add_field("topographic__elevation", z.copy(), at="node")
+    other.status_at_node = grid_with_z.status_at_node
+    expected = Metric(other, chi_finder_kwds=kwds, metrics=metrics)
+    expected.calculate()
+    assert metric.values == expected.values
+
+
+def test_update_without_components(grid_with_z):
+    metric = Metric(
+        grid_with_z,
+        metrics={
+            "me": {
+                "_func": "aggregate",
+                "method": "mean",
+                "field": "topographic__elevation",
+            }
+        },
+    )
+    metric.update()
+    assert metric._fa is None
+    assert "drainage_area" not in grid_with_z.at_node
@@ -0,0 +1,178 @@
+from io import StringIO
+
+import numpy as np
+import pytest
+
+from landlab import RasterModelGrid
+from landlab.io.netcdf import write_raster_netcdf
+from umami import Metric
+
+xr = pytest.importorskip("xarray")
+
+METRICS = {
+    "me": {
+        "_func": "aggregate",
+        "method": "mean",
+        "field": "topographic__elevation",
+    },
+    "hi": {"_func": "hypsometric_integral", "outlet_id": 1},
+    "sn1": {"_func": "count_equal", "field": "drainage_area", "value": 1},
+    "ur": {"_func": "aggregate", "method": "mean", "field": "uplift_rate"},
+}
+SHAPE = (10, 12)
+
+
+def _snapshots(n_times):
+    np.random.seed(42)
+    grid = RasterModelGrid(SHAPE)
+    base = grid.x_of_node + grid.y_of_node
+    snapshots = []
+    for t in range(n_times):
+        z = base * (t + 1) + np.random.random(grid.number_of_nodes)
+        snapshots.append((z, np.full(grid.number_of_nodes, float(t))))
+    return snapshots
+
+
+def _grid(z, uplift_rate):
+    grid = RasterModelGrid(SHAPE)
+    grid.add_field("topographic__elevation", z.copy(), at="node")
+    grid.add_field("uplift_rate", uplift_rate.copy(), at="node")
+    return grid
+
+
+def _expected(snapshots):
+    expected = []
+    for z, uplift_rate in snapshots:
+        metric = Metric(_grid(z, uplift_rate), metrics=METRICS)
+        metric.calculate()
+        expected.append(metric.values)
+    return expected
+
+
+def _dataset(snapshots, times):
+    z = np.array([z for z, _ in snapshots]).reshape((-1,) + SHAPE)
+    ur = np.array([ur for _, ur in snapshots]).reshape((-1,) + SHAPE)
+    return xr.Dataset(
+        {
+            "topographic__elevation": (("time", "nj", "ni"), z),
+            "uplift_rate": (("time", "nj", "ni"), ur),
+        },
+        coords={"time": times},
+    )
+
+
+def test_over_time_dataset():
+    snapshots = _snapshots(4)
+    metric = Metric(_grid(*snapshots[0]), metrics=METRICS)
+    dataset = _dataset(snapshots, [0.0, 10.0, 20.0, 30.0])
+
+    results = list(
+        metric.over_time(
+            dataset, fields=["topographic__elevation", "uplift_rate"]
+        )
+    )
+    assert [time for time, _ in results] == [0.0, 10.0, 20.0, 30.0]
+    np.testing.assert_array_almost_equal(
+        [values for _, values in results], _expected(snapshots)
+    )
+
+
+def test_over_time_netcdf_files(tmp_path):
+    snapshots = _snapshots(3)
+    paths = []
+    for i, (z, uplift_rate) in enumerate(snapshots):
+        path = str(tmp_path / "output_{i}.nc".format(i=i))
+        write_raster_netcdf(
+            path,
+            _grid(z, uplift_rate),
+            names=["topographic__elevation", "uplift_rate"],
+            format="NETCDF4",
+        )
+        paths.append(path)
+
+    metric = Metric(_grid(*snapshots[0]), metrics=METRICS)
+    results = list(
+        metric.over_time(
+            paths, fields=["topographic__elevation", "uplift_rate"]
+        )
+    )
+    np.testing.assert_array_almost_equal(
+        [values for _, values in results], _expected(snapshots)
+    )
+
+
+def test_over_time_netcdf_stack(tmp_path):
+    snapshots = _snapshots(3)
+    path = str(tmp_path / "stack.nc")
+    for i, (z, uplift_rate) in enumerate(snapshots):
+        write_raster_netcdf(
+            path,
+            _grid(z, uplift_rate),
+            names=["topographic__elevation", "uplift_rate"],
+            format="NETCDF4",
+            append=i > 0,
+            time=float(i),
+        )
+
+    metric = Metric(_grid(*snapshots[0]), metrics=METRICS)
+    results = list(
+        metric.over_time(
+            path, fields=["topographic__elevation", "uplift_rate"]
+        )
+    )
+    assert len(results) == 3
+    np.testing.assert_array_almost_equal(
+        [values for _, values in results], _expected(snapshots)
+    )
+
+
+def test_over_time_writes_incrementally():
+    snapshots = _snapshots(3)
+    metric = Metric(_grid(*snapshots[0]), metrics=METRICS)
+    dataset = _dataset(snapshots, [0.0, 1.0, 2.0])
+
+    out = StringIO()
+    results = metric.over_time(
+        dataset, fields=["topographic__elevation", "uplift_rate"], out=out
+    )
+    next(results)
+    lines = out.getvalue().splitlines()
+    assert lines[0] == "time,me,hi,sn1,ur"
+    assert len(lines) == 2
+
+    list(results)
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 4
+    assert lines[-1].startswith("2.0,")
+
+
+def test_over_time_reuses_grid():
+    snapshots = _snapshots(2)
+    grid = _grid(*snapshots[0])
+    z = grid.at_node["topographic__elevation"]
+    metric = Metric(grid, metrics=METRICS)
+    fa = metric._fa
+
+    list(metric.over_time(_dataset(snapshots, [0.0, 1.0])))
+    assert grid.at_node["topographic__elevation"] is z
+    assert metric._fa is fa
+    np.testing.assert_array_equal(z, snapshots[-1][0])
+
+
+def test_over_time_wrong_size():
+    snapshots = _snapshots(2)
+    metric = Metric(_grid(*snapshots[0]), metrics=METRICS)
+    dataset = xr.Dataset(
+        {"topographic__elevation": (("time", "nj", "ni"), np.ones((2, 3, 3)))}
+    )
+    with pytest.raises(ValueError):
+        list(metric.over_time(dataset))
+
+
+def test_over_time_missing_field():
+    snapshots = _snapshots(2)
+    metric = Metric(_grid(*snapshots[0]), metrics=METRICS)
+    with pytest.raises(ValueError):
+        list(
+            metric.over_time(_dataset(snapshots, [0.0, 1.0]), fields=["spam"])
+        )
@@ -0,0 +1,173 @@
+from io import StringIO
+
+import numpy as np
+import pytest
+import yaml
+
+from umami import Metric, Residual
+
+METRICS = {
+    "me": {
+        "_func": "aggregate",
+        "method": "mean",
+        "field": "topographic__elevation",
+    },
+    "ep10": {
+        "_func": "aggregate",
+        "method": "percentile",
+        "field": "topographic__elevation",
+        "q": 10,
+    },
+    "ep90": {
+        "_func": "aggregate",
+        "method": "percentile",
+        "field": "topographic__elevation",
+        "q": 90,
+    },
+}
+
+
+@pytest.fixture()
+def data_grid(make_grid):
+    return make_grid(42, shape=(10, 10))
+
+
+def test_profile_disabled(grid_with_z):
+    metric = Metric(grid_with_z, metrics=METRICS)
+    metric.calculate()
+    assert metric.profile is None
+    with pytest.raises(ValueError):
+        metric.write_profile_to_file(StringIO())
+
+
+def test_metric_profile_records(grid_with_z):
+    metric = Metric(grid_with_z, metrics=METRICS, profile=True)
+    metric.calculate()
+    grid_with_z.at_node["topographic__elevation"] += 1.0
+    metric.calculate()
+
+    # metrics are only calculated again once their fields change.
+    metric.calculate()
+
+    records = {record["name"]: record for record in metric.profile}
+    assert sorted(records) == sorted(METRICS)
+    for name in METRICS:
+        assert records[name]["kind"] == "metric"
+        assert records[name]["calls"] == 2
+        assert records[name]["time"] >= 0.0
+        assert records[name]["peak_memory"] >= 0
+
+    # percentiles are calculated together and share their time.
+    assert records["ep10"]["time"] == records["ep90"]["time"]
+
+
+def test_metric_profile_components(grid_with_z):
+    metrics = {
+        "cg": {"_func": "chi_gradient"},
+        "fd": {
+            "_func": "aggregate",
+            "method": "mean",
+            "field": "flow__distance",
+        },
+    }
+    metric = Metric(
+        grid_with_z,
+        metrics=metrics,
+        chi_finder_kwds={"min_drainage_area": 1.0},
+        profile=True,
+    )
+    metric.calculate()
+
+    records = {record["name"]: record for record in metric.profile}
+    assert list(records) == [
+        "FlowAccumulator",
+        "ChiFinder",
+        "flow__distance",
+        "cg",
+        "fd",
+    ]
+    for name in ["FlowAccumulator", "ChiFinder", "flow__distance"]:
+        assert records[name]["kind"] == "component"
+        assert records[name]["calls"] == 1
+
+
+def test_profile_does_not_change_values(grid_with_z):
+    plain = Metric(grid_with_z, metrics=METRICS)
+    plain.calculate()
+    profiled = Metric(grid_with_z, metrics=METRICS, profile=True)
+    profiled.calculate()
+    np.testing.assert_array_equal(plain.values, profiled.values)
+
+
+def test_write_profile_yaml(grid_with_z):
+    metric = Metric(grid_with_z, metrics=METRICS, profile=True)
+    metric.calculate()
+
+    out = StringIO()
+    metric.write_profile_to_file(out, style="yaml")
+    records = yaml.safe_load(out.getvalue())
+    assert [record["name"] for record in records] == [
+        record["name"] for record in metric.profile
+    ]
+    assert records[-1]["calls"] == 1
+
+
+def test_write_profile_csv(grid_with_z):
+    metric = Metric(grid_with_z, metrics=METRICS, profile=True)
+    metric.calculate()
+
+    out = StringIO()
+    metric.write_profile_to_file(out, style="csv")
+    lines = out.getvalue().splitlines()
+    assert lines[0] == "name,kind,calls,time,peak_memory"
+    assert len(lines) == len(metric.profile) + 1
+    assert lines[1].startswith("ep10,metric,1,")
+
+
+def test_write_profile_bad_style(grid_with_z):
+    metric = Metric(grid_with_z, metrics=METRICS, profile=True)
+    metric.calculate()
+    with pytest.raises(ValueError):
+        metric.write_profile_to_file(StringIO(), style="spam")
+
+
+def test_residual_profile(grid_with_z, data_grid):
+    residuals = dict(METRICS)
+    residuals["ks"] = {"_func": "kstest", "field": "topographic__elevation"}
+    residuals["jdm"] = {
+        "_func": "joint_density_misfit",
+        "field_1": "topographic__elevation",
+        "field_2": "drainage_area",
+        "field_1_percentile_edges": [0, 50, 100],
+        "field_2_percentile_edges": [0, 50, 100],
+    }
+    residual = Residual(
+        grid_with_z, data_grid, residuals=residuals, profile=True
+    )
+    residual.calculate()
+
+    records = {record["name"]: record for record in residual.profile}
+    for prefix in ["model/", "data/"]:
+        assert records[prefix + "FlowAccumulator"]["kind"] == "component"
+        for name in METRICS:
+            assert records[prefix + name]["kind"] == "metric"
+    for name in residuals:
+        assert records[name]["kind"] == "residual"
+        assert records[name]["calls"] == 1
+
+    grid_with_z.at_node["topographic__elevation"] += 1.0
+    residual.calculate()
+    records = {record["name"]: record for record in residual.profile}
+    assert records["jdm"]["calls"] == 2
+    assert records["model/me"]["calls"] == 2
+    assert records["model/FlowAccumulator"]["calls"] == 2
+    assert records["data/me"]["calls"] == 1
+    assert records["data/FlowAccumulator"]["calls"] == 1
+
+
+def test_residual_profile_disabled(grid_with_z, data_grid):
+    residual = Residual(grid_with_z, data_grid, residuals=METRICS)
+    residual.calculate()
+    assert residual.profile is None
+    with pytest.raises(ValueError):
+        residual.write_profile_to_file(StringIO())
@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+from umami import Metric, Residual
+from umami.raster import open_raster
+
+METRICS = {
+    "me": {
+        "_func": "aggregate",
+        "method": "mean",
+        "field": "topographic__elevation",
+    },
+    "ep10": {
+        "_func": "aggregate",
+        "method": "percentile",
+        "field": "topographic__elevation",
+        "q": 10,
+    },
+}
+
+
+@pytest.fixture()
+def dem():
+    np.random.seed(3)
+    return np.random.random((20, 30)) + np.arange(30.0)
+
+
+def test_npy_is_not_copied(tmp_path, dem):
+    path = str(tmp_path / "dem.npy")
+    np.save(path, dem)
+
+    grid = open_raster(path, xy_spacing=5.0, xy_of_lower_left=(10.0, 20.0))
+    assert grid.shape == dem.shape
+    assert grid.dx == 5.0
+    assert grid.x_of_node[0] == 10.0
+
+    z = grid.at_node["topographic__elevation"]
+    assert not z.flags.owndata
+    assert not z.flags.writeable
+    np.testing.assert_array_equal(z, dem.reshape(-1))
+
+
+def test_raw_file(tmp_path, dem):
+    path = str(tmp_path / "dem.bin")
+    header = b"x" * 16
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(dem.astype(">f4").tobytes())
+
+    grid = open_raster(path, shape=dem.shape, dtype=">f4", offset=16)
+    np.testing.assert_array_almost_equal(
+        grid.at_node["topographic__elevation"], dem.reshape(-1), decimal=5
+    )
+
+
+def test_raw_file_requires_shape_and_dtype(tmp_path, dem):
+    path = str(tmp_path / "dem.bin")
+    dem.tofile(path)
+    with pytest.raises(ValueError):
+        open_raster(path, dtype="<f8")
+    with pytest.raises(ValueError):
+        open_raster(path, shape=dem.shape)
+
+
+def test_npy_mismatch(tmp_path, dem):
+    path = str(tmp_path / "dem.npy")
+    np.save(path, dem)
+    with pytest.raises(ValueError):
+        open_raster(path, shape=(30, 20))
+    with pytest.raises(ValueError):
+        open_raster(path, dtype="float32")
+
+
+def test_upper_origin(tmp_path, dem):
+    path = str(tmp_path / "dem.npy")
+    np.save(path, dem[::-1])
+    grid = open_raster(path, origin="upper")
+    np.testing.assert_array_equal(
+        grid.at_node["topographic__elevation"], dem.reshape(-1)
+    )
+    with pytest.raises(ValueError):
+        open_raster(path, origin="spam")
+
+
+def test_nodata_closed(tmp_path, dem):
+    dem[5, 5] = -9999.0
+    path = str(tmp_path / "dem.npy")
+    np.save(path, dem)
+    grid = open_raster(path, nodata_value=-9999.0)
+    assert grid.status_at_node[5 * 30 + 5] == grid.BC_NODE_IS_CLOSED
+
+
+def test_metric_on_mapped_grid(tmp_path, dem):
+    path = str(tmp_path / "dem.npy")
+    np.save(path, dem)
+    grid = open_raster(path)
+    metric = Metric(grid, metrics=METRICS)
+    metric.calculate()
+
+    core = dem.reshape(-1)[grid.core_nodes]
+    np.testing.assert_array_almost_equal(
+        metric.values, [np.mean(core), np.percentile(core, 10)]
+    )
+
+    # flow is routed on the mapped elevation if a metric needs it.
+    metric.add_from_dict(
+        {"hi": {"_func": "hypsometric_integral", "outlet_id": 30}}
+    )
+    metric.calculate()
+    assert "drainage_area" in grid.at_node
+
+
+def test_from_dict_raster(tmp_path, dem):
+    path = str(tmp_path / "dem.npy")
+    np.save(path, dem)
+    metric = Metric.from_dict(
+        {
+            "grid": {"raster": {"path": path, "xy_spacing": [2.0, 2.0]}},
+            "metrics": METRICS,
+        }
+    )
+    assert metric._grid.dx == 2.0
+    metric.calculate()
+
+    residual = Residual.from_dict(
+        {
+            "model": {"raster": {"path": path}},
+            "data": {"raster": {"path": path}},
+            "residuals": METRICS,
+        }
+    )
+    residual.calculate()
+    assert residual.values == [0.0, 0.0]
@@ -1,8 +1,71 @@
+from io import StringIO
+
 import pytest
+from numpy.testing import assert_array_equal
 
+from landlab import RasterModelGrid
+from landlab.components import ChiFinder, FlowAccumulator
 from umami import Residual
 
 
 def test_no_required_field(grid):
     with pytest.raises(ValueError):
         Residual(grid, grid)
+
+
+def test_components_run_once_per_grid(monkeypatch, grid_with_z, input_yaml):
+    calls = {"fa": 0, "cf": 0}
+
+    fa_run_one_step = FlowAccumulator.run_one_step
+    cf_calculate_chi = ChiFinder.calculate_chi
+
+    def counting_run_one_step(self, *args, **kwds):
+        calls["fa"] += 1
+        return fa_run_one_step(self, *args, **kwds)
+
+    def counting_calculate_chi(self, *args, **kwds):
+        calls["cf"] += 1
+        return cf_calculate_chi(self, *args, **kwds)
+
+    monkeypatch.setattr(FlowAccumulator, "run_one_step", counting_run_one_step)
+    monkeypatch.setattr(ChiFinder, "calculate_chi", counting_calculate_chi)
+
+    data = RasterModelGrid((10, 10))
+    z = data.add_zeros("node", "topographic__elevation")
+    z += data.x_of_node + data.y_of_node
+
+    residual = Residual(grid_with_z, data)
+    residual.add_from_file(StringIO(input_yaml))
+    residual.calculate()
+
+    # none of the residuals use chi.
+    assert calls == {"fa": 2, "cf": 0}
+    assert_array_equal(residual.values, [0.0, 0.0, 0.0, 0])
+
+
+def test_aggregate_only_skips_routing(grid_with_z):
+    data = RasterModelGrid((10, 10))
+    z = data.add_zeros("node", "topographic__elevation")
+    z += data.x_of_node + 2.0 * data.y_of_node
+
+    residuals = {
+        "me": {
+            "_func": "aggregate",
+            "method": "mean",
+            "field": "topographic__elevation",
+        },
+        "ks": {"_func": "kstest", "field": "topographic__elevation"},
+    }
+    residual = Residual(grid_with_z, data, residuals=residuals)
+    residual.calculate()
+    for grid in (grid_with_z, data):
+        assert "drainage_area" not in grid.at_node
+
+    residual.add_from_dict(
+        {"ksa": {"_func": "kstest", "field": "drainage_area"}}
+    )
+    for grid in (grid_with_z, data):
+        assert "drainage_area" in grid.at_node
+        assert "channel__chi_index" not in grid.at_node
+    residual.calculate()
+    assert residual.names == ["me", "ks", "ksa"]
@@ -0,0 +1,146 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from umami import Metric, Residual
+from umami.calculations.metric.hypsometric_integral import (
+    _hypsometric_integral,
+)
+from umami.utils.scratch import _Scratch, _take
+
+
+@pytest.fixture()
+def large_grid(make_grid):
+    def _large_grid(seed):
+        return make_grid(seed, shape=(200, 200), outlet_id=1)
+
+    return _large_grid
+
+
+@pytest.fixture()
+def scratch_metrics(metric_params):
+    # metrics that are calculated without flow routing.
+    return {key: metric_params[key] for key in ["me", "oid1_mean", "hi"]}
+
+
+def _peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_scratch_grows():
+    scratch = _Scratch()
+    small = scratch.empty("vals", 5, float)
+    large = scratch.empty("vals", 10, float)
+    assert small.base is not large.base
+    assert scratch.empty("vals", 7, float).base is large.base
+    assert scratch.empty("vals", 7, np.float32).base is not large.base
+    assert scratch.nbytes == 80 + 28
+
+
+@pytest.mark.parametrize("dtype", [None, np.float32])
+def test_take(dtype):
+    values = np.arange(10.0)
+    nodes = np.array([2, 5, 7])
+    nodes.flags.writeable = False
+    mask = np.zeros(10, dtype=bool)
+    mask[nodes] = True
+
+    scratch = _Scratch()
+    for selection in (nodes, mask):
+        for trusted in (False, True):
+            out = _take(
+                values,
+                selection,
+                scratch,
+                "vals",
+                dtype=dtype,
+                trusted=trusted,
+            )
+            np.testing.assert_array_equal(out, values[nodes])
+            assert out.dtype == (dtype or values.dtype)
+    np.testing.assert_array_equal(
+        _take(np.arange(10), nodes, scratch, "ints", dtype=np.float64),
+        [2.0, 5.0, 7.0],
+    )
+
+
+def test_take_indexes_untrusted_nodes():
+    values = np.arange(10.0)
+    scratch = _Scratch()
+    np.testing.assert_array_equal(
+        _take(values, np.array([-1, 2]), scratch, "vals"), [9.0, 2.0]
+    )
+    with pytest.raises(IndexError):
+        _take(values, np.array([2, 10]), scratch, "vals")
+
+
+def test_metric_integer_mask_field(grid_with_z):
+    # an integer mask field is used as node ids, as with indexing.
+    ids = grid_with_z.add_zeros("node", "ids", dtype=int)
+    ids[:2] = [-1, 11]
+    metrics = {
+        "ma": {
+            "_func": "mask_aggregation",
+            "field": "topographic__elevation",
+            "mask": "ids",
+            "method": "sum",
+        },
+    }
+    metric = Metric(grid_with_z, metrics=metrics)
+    metric.calculate()
+    z = grid_with_z.at_node["topographic__elevation"]
+    assert metric.value("ma") == np.sum(z[ids])
+
+
+def test_hypsometric_integral_without_temporary():
+    vals = np.random.RandomState(0).random_sample(1000)
+    expected = np.mean(vals - vals.min()) / (vals.max() - vals.min())
+    np.testing.assert_allclose(_hypsometric_integral(vals), expected)
+
+
+def test_metric_reuses_buffers(large_grid, scratch_metrics):
+    grid = large_grid(0)
+    metric = Metric(grid, metrics=scratch_metrics)
+    metric.calculate()
+    nbytes = metric._scratch.nbytes
+    first = metric._gather("topographic__elevation", None, {})
+
+    grid.at_node["topographic__elevation"] *= 2.0
+    metric.calculate()
+    assert metric._scratch.nbytes == nbytes
+    assert (
+        metric._gather("topographic__elevation", None, {}).base is first.base
+    )
+
+
+def test_metric_steady_state_allocation(large_grid, scratch_metrics):
+    grid = large_grid(0)
+    metric = Metric(grid, metrics=scratch_metrics)
+    metric.calculate()
+    values = metric.values
+
+    # clear the cache, such that all metrics are calculated again.
+    metric._cache.clear()
+    peak = _peak_memory(metric.calculate)
+    assert metric.values == values
+    assert peak < grid.number_of_nodes
+
+
+def test_discretized_misfit_steady_state_allocation(
+    large_grid, residual_params
+):
+    model = large_grid(0)
+    data = large_grid(1)
+    residual = Residual(model, data, residuals={"dm": residual_params["dm"]})
+    residual.calculate()
+    values = residual.values
+
+    peak = _peak_memory(residual.calculate)
+    np.testing.assert_array_equal(residual.values, values)
+    assert peak < model.number_of_nodes
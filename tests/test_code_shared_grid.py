@@ -0,0 +1,103 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from landlab import HexModelGrid, RasterModelGrid
+from umami import DataReference, Metric, Residual, evaluate_many
+
+pytest.importorskip("multiprocessing.shared_memory")
+
+from umami.shared_grid import SharedGrid  # noqa: E402
+
+
+@pytest.fixture()
+def data_grid(model_and_data):
+    _, data = model_and_data
+    data.status_at_node[data.nodes_at_left_edge] = data.BC_NODE_IS_CLOSED
+    data.add_ones("node", "uplift_rate")
+    return data
+
+
+def test_view_matches_grid(data_grid):
+    with SharedGrid(data_grid) as shared:
+        attached = pickle.loads(pickle.dumps(shared))
+        view = attached.grid
+
+        np.testing.assert_array_equal(view.x_of_node, data_grid.x_of_node)
+        np.testing.assert_array_equal(view.y_of_node, data_grid.y_of_node)
+        np.testing.assert_array_equal(view.core_nodes, data_grid.core_nodes)
+        assert sorted(view.at_node) == sorted(data_grid.at_node)
+        for name in data_grid.at_node:
+            np.testing.assert_array_equal(
+                view.at_node[name], data_grid.at_node[name]
+            )
+            assert not view.at_node[name].flags.writeable
+        attached.close()
+
+
+def test_fields_subset(data_grid):
+    with SharedGrid(data_grid, fields=["topographic__elevation"]) as shared:
+        view = pickle.loads(pickle.dumps(shared)).grid
+        assert list(view.at_node) == ["topographic__elevation"]
+
+
+def test_residual_with_shared_data(model_and_data, data_grid, residual_params):
+    model, _ = model_and_data
+    residual = Residual(model, data_grid, residuals=residual_params)
+    residual.calculate()
+
+    # only the input of flow routing is shared, as the data grid is routed.
+    with SharedGrid(data_grid, fields=["topographic__elevation"]) as shared:
+        view = pickle.loads(pickle.dumps(shared)).grid
+        shared_residual = Residual(model, view, residuals=residual_params)
+        shared_residual.calculate()
+
+    np.testing.assert_array_equal(shared_residual.values, residual.values)
+
+
+def test_evaluate_many_with_shared_data(
+    model_and_data, data_grid, residual_params
+):
+    model, _ = model_and_data
+    reference = DataReference(data_grid, residuals=residual_params)
+    residual = Residual(model, reference)
+    residual.calculate()
+
+    out = list(
+        evaluate_many(
+            [model, model, model], reference, max_workers=2, share_data=True
+        )
+    )
+    np.testing.assert_array_equal(out, [residual.values] * 3)
+
+
+def test_metric_with_shared_data(data_grid):
+    metrics = {
+        "ur_max": {
+            "_func": "aggregate",
+            "method": "amax",
+            "field": "uplift_rate",
+        }
+    }
+    with SharedGrid(data_grid, fields=["topographic__elevation"]) as shared:
+        view = pickle.loads(pickle.dumps(shared)).grid
+        Metric(
+            view,
+            metrics={
+                "sn1": {
+                    "_func": "count_equal",
+                    "field": "drainage_area",
+                    "value": 1,
+                }
+            },
+        )
+        assert "drainage_area" in view.at_node
+        assert "drainage_area" not in shared.grid.at_node
+    with pytest.raises(ValueError):
+        Metric(view, metrics=metrics)
+
+
+def test_raster_only():
+    with pytest.raises(ValueError):
+        SharedGrid(HexModelGrid((3, 3)))
@@ -0,0 +1,127 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from umami import Metric
+from umami.calculations import aggregate
+from umami.utils.sketch import _QuantileSketch
+
+Q = np.arange(0.0, 100.5, 0.5)
+
+
+def _rank_errors(values, estimates):
+    values = np.sort(values)
+    lower = np.searchsorted(values, estimates, side="left") / values.size
+    upper = np.searchsorted(values, estimates, side="right") / values.size
+    target = Q / 100.0
+    return np.maximum(np.maximum(lower - target, target - upper), 0.0)
+
+
+@pytest.mark.parametrize("rank_error", [0.01, 0.001])
+@pytest.mark.parametrize("n_chunks", [1, 10, 1000])
+def test_rank_error(rank_error, n_chunks):
+    values = np.random.RandomState(1).lognormal(size=200000)
+    sketch = _QuantileSketch(rank_error=rank_error)
+    for chunk in np.array_split(values, n_chunks):
+        sketch.update(chunk)
+    assert sketch.count == values.size
+    assert sketch.size < 4 * sketch.k
+    assert np.all(_rank_errors(values, sketch.percentiles(Q)) <= rank_error)
+
+
+def test_extremes_are_exact():
+    values = np.random.RandomState(2).normal(size=100000)
+    sketch = _QuantileSketch(rank_error=0.01)
+    sketch.update(values)
+    assert sketch.percentiles(0) == values.min()
+    assert sketch.percentiles(100) == values.max()
+
+
+def test_exact_without_compaction():
+    values = np.random.RandomState(3).random_sample(500)
+    sketch = _QuantileSketch(rank_error=0.001)
+    sketch.update(values)
+    np.testing.assert_allclose(
+        sketch.percentiles(Q), np.percentile(values, Q), rtol=1e-12
+    )
+
+
+def test_merge_across_processes():
+    values = np.random.RandomState(4).normal(size=300000)
+    parts = []
+    for part in np.array_split(values, 3):
+        sketch = _QuantileSketch(rank_error=0.005, seed=len(parts))
+        sketch.update(part)
+        # sketches are sent between processes by pickling.
+        parts.append(pickle.loads(pickle.dumps(sketch)))
+
+    merged = parts[0].merge(parts[1]).merge(parts[2])
+    assert merged.count == values.size
+    assert merged.min == values.min()
+    assert merged.max == values.max()
+    assert np.all(_rank_errors(values, merged.percentiles(Q)) <= 0.005)
+
+
+def test_merge_different_error():
+    with pytest.raises(ValueError):
+        _QuantileSketch(0.01).merge(_QuantileSketch(0.001))
+
+
+def test_bad_arguments():
+    with pytest.raises(ValueError):
+        _QuantileSketch(rank_error=0.0)
+    with pytest.raises(ValueError):
+        _QuantileSketch().percentiles(50)
+    sketch = _QuantileSketch()
+    sketch.update(np.arange(10.0))
+    with pytest.raises(ValueError):
+        sketch.percentiles(101)
+
+
+def test_nan():
+    sketch = _QuantileSketch()
+    sketch.update(np.array([1.0, np.nan, 2.0]))
+    assert np.all(np.isnan(sketch.percentiles([10, 90])))
+
+
+def test_aggregate_approximate_percentile(grid):
+    np.random.seed(5)
+    z = grid.add_zeros("node", "topographic__elevation")
+    z += np.random.random(grid.number_of_nodes)
+    vals = z[grid.core_nodes]
+    for q in [5, 50, 95]:
+        actual = aggregate(
+            grid, "topographic__elevation", "percentile", rank_error=0.01, q=q
+        )
+        np.testing.assert_allclose(actual, np.percentile(vals, q))
+
+
+def test_metric_shares_one_sketch(grid_with_z, monkeypatch):
+    calls = []
+    original = _QuantileSketch.percentiles
+
+    def counting(self, q):
+        calls.append(self)
+        return original(self, q)
+
+    monkeypatch.setattr(_QuantileSketch, "percentiles", counting)
+    metrics = {}
+    for q in range(5, 100, 5):
+        metrics["ep{q}".format(q=q)] = {
+            "_func": "aggregate",
+            "method": "percentile",
+            "field": "topographic__elevation",
+            "q": q,
+            "rank_error": 0.001,
+        }
+    metric = Metric(grid_with_z, metrics=metrics)
+    metric.calculate()
+
+    assert len(set(calls)) == 1
+    vals = grid_with_z.at_node["topographic__elevation"][
+        grid_with_z.core_nodes
+    ]
+    np.testing.assert_allclose(
+        metric.values, np.percentile(vals, range(5, 100, 5))
+    )
@@ -0,0 +1,115 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+from umami import DataReference, Residual, evaluate_many, sweep
+
+
+def _failing_model(seed, make_grid):
+    if seed == 2:
+        raise RuntimeError("model run failed")
+    return make_grid(seed)
+
+
+def test_evaluate_many_matches_serial(
+    make_grid, model_and_data, residual_params
+):
+    _, data = model_and_data
+    models = [make_grid(seed) for seed in range(6)]
+
+    expected = []
+    for model in models:
+        residual = Residual(model, data, residuals=residual_params)
+        residual.calculate()
+        expected.append(residual.values)
+
+    out = list(
+        evaluate_many(models, data, residuals=residual_params, max_workers=2)
+    )
+    np.testing.assert_array_almost_equal(out, expected)
+
+
+def test_evaluate_many_model_function(
+    make_grid, model_and_data, residual_params
+):
+    _, data = model_and_data
+    reference = DataReference(data, residuals=residual_params)
+
+    done = []
+    out = list(
+        evaluate_many(
+            range(5),
+            reference,
+            model_function=make_grid,
+            max_workers=2,
+            progress=done.append,
+        )
+    )
+    assert sorted(done) == [1, 2, 3, 4, 5]
+
+    for seed, values in enumerate(out):
+        residual = Residual(make_grid(seed), reference)
+        residual.calculate()
+        np.testing.assert_array_almost_equal(values, residual.values)
+
+
+def test_evaluate_many_without_initializer(
+    monkeypatch, make_grid, model_and_data, residual_params
+):
+    _, data = model_and_data
+    reference = DataReference(data, residuals=residual_params)
+    expected = list(
+        evaluate_many(range(3), reference, model_function=make_grid)
+    )
+
+    monkeypatch.setattr(sweep, "_HAS_INITIALIZER", False)
+    out = list(
+        evaluate_many(
+            range(3), reference, model_function=make_grid, max_workers=2
+        )
+    )
+    np.testing.assert_array_almost_equal(out, expected)
+
+
+def test_evaluate_many_return_errors(
+    make_grid, model_and_data, residual_params
+):
+    _, data = model_and_data
+    out = list(
+        evaluate_many(
+            range(5),
+            data,
+            residuals=residual_params,
+            model_function=partial(_failing_model, make_grid=make_grid),
+            max_workers=2,
+            errors="return",
+        )
+    )
+    assert len(out) == 5
+    assert isinstance(out[2], RuntimeError)
+    for seed in (0, 1, 3, 4):
+        assert len(out[seed]) == len(residual_params) + 3
+
+
+def test_evaluate_many_raise_errors(
+    make_grid, model_and_data, residual_params
+):
+    _, data = model_and_data
+    out = evaluate_many(
+        range(5),
+        data,
+        residuals=residual_params,
+        model_function=partial(_failing_model, make_grid=make_grid),
+        max_workers=2,
+    )
+    assert len(next(out)) == len(residual_params) + 3
+    assert len(next(out)) == len(residual_params) + 3
+    with pytest.raises(RuntimeError):
+        next(out)
+
+
+def test_evaluate_many_bad_errors(model_and_data):
+    _, data = model_and_data
+    with pytest.raises(ValueError):
+        list(evaluate_many([], data, errors="ignore"))
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+import umami.utils.watershed as watershed
+from landlab.components import FlowAccumulator
+from umami import Metric
+from umami.calculations import watershed_aggregation
+from umami.utils.watershed import _get_watershed_mask
+
+
+@pytest.fixture()
+def counted_masks(monkeypatch):
+    calls = []
+    get_watershed_mask = watershed.get_watershed_mask
+
+    def counting_get_watershed_mask(grid, outlet_id):
+        calls.append(outlet_id)
+        return get_watershed_mask(grid, outlet_id)
+
+    monkeypatch.setattr(
+        watershed, "get_watershed_mask", counting_get_watershed_mask
+    )
+    return calls
+
+
+def test_mask_reused(counted_masks, grid_with_z):
+    fa = FlowAccumulator(grid_with_z)
+    fa.run_one_step()
+
+    first = _get_watershed_mask(grid_with_z, 1)
+    second = _get_watershed_mask(grid_with_z, 1)
+    assert second is first
+    assert counted_masks == [1]
+
+    _get_watershed_mask(grid_with_z, 2)
+    assert counted_masks == [1, 2]
+
+
+def test_mask_read_only(grid_with_z):
+    fa = FlowAccumulator(grid_with_z)
+    fa.run_one_step()
+
+    mask = _get_watershed_mask(grid_with_z, 1)
+    with pytest.raises(ValueError):
+        mask[0] = True
+
+
+def test_mask_invalidated(counted_masks, grid_with_z):
+    fa = FlowAccumulator(grid_with_z)
+    fa.run_one_step()
+    first = _get_watershed_mask(grid_with_z, 1)
+
+    # flip the slope so that everything drains to the opposite corner.
+    z = grid_with_z.at_node["topographic__elevation"]
+    z *= -1.0
+    fa.run_one_step()
+
+    second = _get_watershed_mask(grid_with_z, 1)
+    assert counted_masks == [1, 1]
+    assert not np.array_equal(first, second)
+
+
+def test_mask_invalidated_in_place(counted_masks, grid_with_z):
+    fa = FlowAccumulator(grid_with_z)
+    fa.run_one_step()
+    _get_watershed_mask(grid_with_z, 1)
+
+    # the receivers are compared exactly, such that any change is noticed.
+    receivers = grid_with_z.at_node["flow__receiver_node"]
+    receivers[-1] = receivers[-2]
+    _get_watershed_mask(grid_with_z, 1)
+    assert counted_masks == [1, 1]
+
+
+def test_one_mask_per_metric_outlet(counted_masks, grid_with_z):
+    metrics = {
+        "oid1_mean": {
+            "_func": "watershed_aggregation",
+            "field": "topographic__elevation",
+            "method": "mean",
+            "outlet_id": 1,
+        },
+        "oid1_max": {
+            "_func": "watershed_aggregation",
+            "field": "topographic__elevation",
+            "method": "max",
+            "outlet_id": 1,
+        },
+        "hi": {"_func": "hypsometric_integral", "outlet_id": 1},
+    }
+    metric = Metric(grid_with_z, metrics=metrics)
+    metric.calculate()
+    metric.calculate()
+    assert counted_masks == [1]
+
+
+@pytest.mark.parametrize("outlet_id", [1, [1, 2], "all_outlets"])
+def test_multiple_flow_directions(grid_with_z, outlet_id):
+    fa = FlowAccumulator(grid_with_z, flow_director="MFD")
+    fa.run_one_step()
+    assert grid_with_z.at_node["flow__receiver_node"].ndim == 2
+
+    with pytest.raises(ValueError, match="single flow direction"):
+        watershed_aggregation(
+            grid_with_z,
+            "topographic__elevation",
+            outlet_id,
+            "mean",
+            name="oid{outlet_id}_mean",
+        )
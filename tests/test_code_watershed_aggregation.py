@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_almost_equal
+
+from landlab import RasterModelGrid
+from landlab.components import FlowAccumulator
+from umami import DataReference, Metric, Residual
+from umami.calculations import watershed_aggregation
+
+
+@pytest.fixture()
+def routed_grid():
+    np.random.seed(42)
+    grid = RasterModelGrid((20, 30))
+    z = grid.add_zeros("node", "topographic__elevation")
+    z += 0.1 * grid.x_of_node + 0.2 * grid.y_of_node
+    z += np.random.random(grid.number_of_nodes)
+    fa = FlowAccumulator(
+        grid, flow_director="D8", depression_finder="DepressionFinderAndRouter"
+    )
+    fa.run_one_step()
+    return grid
+
+
+@pytest.mark.parametrize(
+    "method,kwds",
+    [
+        ("mean", {}),
+        ("sum", {}),
+        ("amax", {}),
+        ("min", {}),
+        ("std", {}),
+        ("percentile", {"q": 30}),
+    ],
+)
+def test_same_as_single_outlet(routed_grid, method, kwds):
+    # include nested outlets by taking the nodes with the largest area.
+    area = routed_grid.at_node["drainage_area"]
+    outlet_ids = np.argsort(area)[::-1][:10]
+
+    out = watershed_aggregation(
+        routed_grid,
+        "topographic__elevation",
+        outlet_ids,
+        method,
+        name="{outlet_id}",
+        **kwds
+    )
+
+    assert list(out.keys()) == [str(oid) for oid in outlet_ids]
+    for oid in outlet_ids:
+        single = watershed_aggregation(
+            routed_grid, "topographic__elevation", oid, method, **kwds
+        )
+        np.testing.assert_almost_equal(out[str(oid)], single)
+
+
+def test_all_outlets(routed_grid):
+    out = watershed_aggregation(
+        routed_grid,
+        "topographic__elevation",
+        "all_outlets",
+        "size",
+        name="{outlet_id}",
+    )
+
+    # every core node is in exactly one watershed, with its outlet.
+    outlet_ids = [int(oid) for oid in out.keys()]
+    assert np.all(routed_grid.status_at_node[outlet_ids] != 0)
+    assert sum(out.values()) == (
+        routed_grid.number_of_core_nodes + len(outlet_ids)
+    )
+
+
+def test_name_required(routed_grid):
+    with pytest.raises(ValueError):
+        watershed_aggregation(
+            routed_grid, "topographic__elevation", [1, 2], "mean"
+        )
+
+
+def test_bad_outlet_string(routed_grid):
+    with pytest.raises(ValueError):
+        watershed_aggregation(
+            routed_grid, "topographic__elevation", "spam", "mean", name="{}"
+        )
+
+
+def test_duplicate_outlets(routed_grid):
+    with pytest.raises(ValueError):
+        watershed_aggregation(
+            routed_grid,
+            "topographic__elevation",
+            [1, 1],
+            "mean",
+            name="{outlet_id}",
+        )
+
+
+def test_metric_validation(grid_with_z):
+    no_name = {
+        "ws": {
+            "_func": "watershed_aggregation",
+            "field": "topographic__elevation",
+            "method": "mean",
+            "outlet_id": [1, 2],
+        }
+    }
+    with pytest.raises(ValueError):
+        Metric(grid_with_z, metrics=no_name)
+
+    not_supported = {
+        "hi": {
+            "_func": "hypsometric_integral",
+            "outlet_id": [1, 2],
+            "name": "hi_{outlet_id}",
+        }
+    }
+    with pytest.raises(ValueError):
+        Metric(grid_with_z, metrics=not_supported)
+
+
+def test_residual_all_outlets(model_and_data):
+    model, data = model_and_data
+    residuals = {
+        "ws": {
+            "_func": "watershed_aggregation",
+            "field": "topographic__elevation",
+            "method": "mean",
+            "outlet_id": "all_outlets",
+            "name": "ws_{outlet_id}",
+        }
+    }
+    residual = Residual(model, data, residuals=residuals)
+    residual.calculate()
+
+    data_metric = Metric(data, metrics=residuals)
+    data_metric.calculate()
+
+    assert residual.names == data_metric.names
+    assert len(residual.values) == len(residual.names)
+
+    reference = DataReference(data, residuals=residuals)
+    from_reference = Residual(model, reference)
+    from_reference.calculate()
+    assert from_reference.names == residual.names
+    assert_array_almost_equal(from_reference.values, residual.values)
@@ -1,8 +1,9 @@
 from ._version import get_versions
 from .metric import Metric
-from .residual import Residual
+from .residual import DataReference, Residual
+from .sweep import evaluate_many
 
-__all__ = ["Metric", "Residual"]
+__all__ = ["DataReference", "Metric", "Residual", "evaluate_many"]
 
 __version__ = get_versions()["version"]
 del get_versions
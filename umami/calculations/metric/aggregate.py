@@ -1,9 +1,45 @@
 import numpy as np
 
+from umami.utils.chunked import (
+    _DEFAULT_BINS,
+    _DEFAULT_CHUNK_SIZE,
+    _ChunkedStatistics,
+)
+
+
+# numpy methods that accumulate a sum, and take the type of the sum.
+_ACCUMULATING_METHODS = frozenset(
+    [
+        "mean",
+        "nanmean",
+        "nanstd",
+        "nansum",
+        "nanvar",
+        "std",
+        "sum",
+        "var",
+    ]
+)
+
+
+def _accumulator_kwds(vals, method, kwds):
+    # sums of values in less than double precision are accumulated in double
+    # precision, unless another type is given.
+    vals_dtype = np.asarray(vals).dtype
+    if (
+        (method in _ACCUMULATING_METHODS)
+        and ("dtype" not in kwds)
+        and (vals_dtype.kind == "f")
+        and (vals_dtype.itemsize < 8)
+    ):
+        return dict(kwds, dtype=np.float64)
+    return kwds
+
 
 def _aggregate(vals, method, **kwds):
     # inspect numpy namespace:
     function = np.__dict__[method]
+    kwds = _accumulator_kwds(vals, method, kwds)
 
     # calc value
     out = function(vals, **kwds)
@@ -14,13 +50,47 @@ def _aggregate(vals, method, **kwds):
         raise ValueError(msg)
 
 
-def aggregate(grid, field, method, **kwds):
+def _aggregate_ensemble(vals, method, **kwds):
+    # vals has one row for each ensemble member. Reduce along the rows if the
+    # numpy method supports it and otherwise aggregate each row in turn.
+    function = np.__dict__[method]
+    kwds = _accumulator_kwds(vals, method, kwds)
+    try:
+        out = np.asarray(function(vals, axis=1, **kwds))
+    except TypeError:
+        out = None
+
+    if (out is None) or (out.shape != vals.shape[:1]):
+        out = np.array([_aggregate(row, method, **kwds) for row in vals])
+    return out
+
+
+def aggregate(
+    grid, field, method, chunk_size=None, bins=None, rank_error=None, **kwds
+):
     """Calculate an aggreggate value on a Landlab grid field.
 
     ``aggregate`` calculates aggregate values on the core nodes of the model
     grid. It supports all methods in the `numpy`_ namespace that reduce an
     array to a scalar.
 
+    If *chunk_size* is provided, the values are instead read in chunks of
+    *chunk_size* nodes and the statistics of the chunks are merged, such that
+    fields of grids that do not fit in memory, e.g. those created with
+    ``umami.raster.open_raster``, can be aggregated with bounded memory. The
+    chunked methods are mean, std, var, min, max, sum, count, median and
+    percentile. Percentiles are interpolated in a histogram with *bins* bins
+    and are accurate to the width of a bin.
+
+    If *rank_error* is provided, percentiles are instead estimated from a
+    quantile (KLL) sketch of the values, which is built in chunks in a
+    single pass and holds a few thousand values however large the grid. The
+    rank of an estimated percentile is within about *rank_error* of the
+    rank of the exact percentile, e.g. an estimated 90th percentile lies
+    between the exact 89.9th and 90.1th percentiles if *rank_error* is
+    0.001. As they are chunked, the other methods are then also calculated
+    in chunks.
+
     .. _numpy: https://numpy.org
 
     Parameters
@@ -30,6 +100,15 @@ def aggregate(grid, field, method, **kwds):
         An at-node Landlab grid field that is present on the model grid.
     method : str
         The name of a numpy namespace method.
+    chunk_size : int, optional
+        Number of nodes per chunk. By default, all values are aggregated at
+        once.
+    bins : int, optional
+        Number of histogram bins used by chunked percentiles. Defaults to
+        65536.
+    rank_error : float, optional
+        Rank error of approximate percentiles, between 0 and 1. By default,
+        percentiles are not approximate.
     **kwds
         Any additional keyword arguments needed by the method.
 
@@ -83,6 +162,43 @@ def aggregate(grid, field, method, **kwds):
     >>> metric.calculate()
     >>> metric.values
     [9.0, 5.0]
+
+    The same metrics can be calculated in chunks of nodes.
+
+    >>> aggregate(grid, "topographic__elevation", "mean", chunk_size=30)
+    9.0
+    >>> round(
+    ...     aggregate(
+    ...         grid,
+    ...         "topographic__elevation",
+    ...         "percentile",
+    ...         chunk_size=30,
+    ...         q=10,
+    ...     ),
+    ...     3,
+    ... )
+    5.0
+    >>> aggregate(
+    ...     grid,
+    ...     "topographic__elevation",
+    ...     "percentile",
+    ...     rank_error=0.001,
+    ...     q=10,
+    ... )
+    5.0
     """
+    if (chunk_size is not None) or (rank_error is not None):
+        stats = _ChunkedStatistics(
+            grid,
+            field,
+            _DEFAULT_CHUNK_SIZE if chunk_size is None else chunk_size,
+            bins=bins or _DEFAULT_BINS,
+            rank_error=rank_error,
+        )
+        return stats.aggregate(method, **kwds)
+    elif bins is not None:
+        msg = "umami: bins is only used by chunked aggregation."
+        raise ValueError(msg)
+
     vals = grid.at_node[field][grid.core_nodes]
     return _aggregate(vals, method, **kwds)
@@ -1,6 +1,15 @@
 """
 """
+from collections import OrderedDict
+
+import numpy as np
+
 from landlab.components import ChiFinder
+from umami.utils.watershed import (
+    _get_outlet_ids,
+    _get_watershed_nodes,
+    _is_multiple_outlets,
+)
 
 
 def _validate_chi_finder(chi_finder):
@@ -9,7 +18,7 @@ def _validate_chi_finder(chi_finder):
         raise ValueError(msg)
 
 
-def chi_intercept(chi_finder):
+def chi_intercept(chi_finder, outlet_id=None, name=None):
     r"""Return the intercept to a linear fit through a :math:`\chi`-z plot.
 
     This is a loose wrapper around the Landlab function
@@ -17,9 +26,20 @@ def chi_intercept(chi_finder):
 
     .. _ChiFinder.best_fit_chi_elevation_gradient_and_intercept: https://landlab.readthedocs.io/en/master/reference/components/index.html#landlab.components.ChiFinder.best_fit_chi_elevation_gradient_and_intercept
 
+    If *outlet_id* is provided, the fit is done only with the channel nodes
+    in the watershed of *outlet_id*. If *outlet_id* is a list of outlet ids,
+    or the string ``all_outlets``, one fit is done for each watershed and a
+    ``name`` must be provided. This is a string that will be formatted with
+    the value for ``{outlet_id}``. All watersheds are fit together in a
+    single vectorized least-squares calculation.
+
     Parameters
     ----------
     chi_finder : an instance of a `ChiFinder`_
+    outlet_id : int, list of int, or "all_outlets", optional
+        Outlet id of the watershed.
+    name : str, optional
+        Required if more than one outlet is specified.
 
 
     .. _ChiFinder: https://landlab.readthedocs.io/en/master/reference/components/chi_index.html
@@ -27,8 +47,9 @@ def chi_intercept(chi_finder):
 
     Returns
     -------
-    out : float
-        The intercept value.
+    out : float or OrderedDict
+        The intercept value, or an ordered dictionary of the intercept value
+        for each outlet.
 
     Examples
     --------
@@ -68,11 +89,11 @@ def chi_intercept(chi_finder):
     array([-4.])
     """
     _validate_chi_finder(chi_finder)
-    slp, incp = chi_finder.best_fit_chi_elevation_gradient_and_intercept()
-    return incp
+    fit = _chi_fit(chi_finder, outlet_id)
+    return _chi_select(fit, 1, chi_finder, outlet_id, name)
 
 
-def chi_gradient(chi_finder):
+def chi_gradient(chi_finder, outlet_id=None, name=None):
     r"""Return the slope to a linear fit through a :math:`\chi`-z plot.
 
     This is a loose wrapper around the Landlab function
@@ -80,9 +101,20 @@ def chi_gradient(chi_finder):
 
     .. _ChiFinder.best_fit_chi_elevation_gradient_and_intercept: https://landlab.readthedocs.io/en/master/reference/components/index.html#landlab.components.ChiFinder.best_fit_chi_elevation_gradient_and_intercept
 
+    If *outlet_id* is provided, the fit is done only with the channel nodes
+    in the watershed of *outlet_id*. If *outlet_id* is a list of outlet ids,
+    or the string ``all_outlets``, one fit is done for each watershed and a
+    ``name`` must be provided. This is a string that will be formatted with
+    the value for ``{outlet_id}``. All watersheds are fit together in a
+    single vectorized least-squares calculation.
+
     Parameters
     ----------
     chi_finder : an instance of a `ChiFinder`_
+    outlet_id : int, list of int, or "all_outlets", optional
+        Outlet id of the watershed.
+    name : str, optional
+        Required if more than one outlet is specified.
 
 
     .. _ChiFinder: https://landlab.readthedocs.io/en/master/reference/components/chi_index.html
@@ -90,8 +122,9 @@ def chi_gradient(chi_finder):
 
     Returns
     -------
-    out : float
-        The slope value.
+    out : float or OrderedDict
+        The slope value, or an ordered dictionary of the slope value for each
+        outlet.
 
     Examples
     --------
@@ -111,6 +144,17 @@ def chi_gradient(chi_finder):
     >>> np.round(chi_gradient(cf), decimals=0)
     23.0
 
+    The fit can also be limited to the watershed of one or more outlets. If
+    a watershed has fewer than two channel nodes, the value is ``nan``.
+
+    >>> np.round(chi_gradient(cf, outlet_id=1), decimals=0)
+    23.0
+    >>> out = chi_gradient(cf, outlet_id=[1, 2], name="cg_{outlet_id}")
+    >>> for key, value in out.items():
+    ...     print(key, np.round(value, decimals=0))
+    cg_1 23.0
+    cg_2 nan
+
     Next, the same calculations are shown as part of an umami ``Metric``.
 
     >>> from io import StringIO
@@ -131,5 +175,77 @@ def chi_gradient(chi_finder):
     array([ 23.])
     """
     _validate_chi_finder(chi_finder)
-    slp, incp = chi_finder.best_fit_chi_elevation_gradient_and_intercept()
-    return slp
+    fit = _chi_fit(chi_finder, outlet_id)
+    return _chi_select(fit, 0, chi_finder, outlet_id, name)
+
+
+def _chi_fit(chi_finder, outlet_id=None):
+    """Fit a line through the chi-z values of the channel nodes.
+
+    Returns
+    -------
+    (gradient, intercept)
+        Floats, or arrays with one value per outlet if *outlet_id* specifies
+        more than one outlet.
+    """
+    if outlet_id is None:
+        fit = chi_finder.best_fit_chi_elevation_gradient_and_intercept
+        gradient, intercept = fit()
+        return gradient, intercept
+
+    if not _is_multiple_outlets(outlet_id):
+        # fit as a single watershed, such that a watershed with less than
+        # two channel nodes gives nan as it does with more than one outlet.
+        gradient, intercept = _chi_fit(chi_finder, [outlet_id])
+        return gradient[0], intercept[0]
+
+    grid = chi_finder.grid
+    channel = np.logical_not(chi_finder.hillslope_mask)
+    chi = grid.at_node["channel__chi_index"]
+    z = grid.at_node["topographic__elevation"]
+
+    outlet_ids = _get_outlet_ids(grid, outlet_id)
+    nodes, start, stop, _ = _get_watershed_nodes(grid, outlet_ids)
+
+    # The sums needed for a least-squares fit of each watershed are
+    # differences of cumulative sums over the sorted nodes, since each
+    # watershed is contiguous. Values are shifted by the mean of the channel
+    # nodes to reduce cancellation.
+    w = channel[nodes].astype(float)
+    x = chi[nodes]
+    y = z[nodes]
+    x0 = np.mean(x[w > 0]) if np.any(w) else 0.0
+    y0 = np.mean(y[w > 0]) if np.any(w) else 0.0
+    x = x - x0
+    y = y - y0
+
+    sums = []
+    for vals in (w, w * x, w * y, w * x * x, w * x * y):
+        cumulative = np.concatenate(([0.0], np.cumsum(vals)))
+        sums.append(cumulative[stop] - cumulative[start])
+    n, sx, sy, sxx, sxy = sums
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gradient = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        intercept = (sy - gradient * sx) / n + y0 - gradient * x0
+
+    return gradient, intercept
+
+
+def _chi_select(fit, index, chi_finder, outlet_id=None, name=None):
+    # return the gradient (index 0) or intercept (index 1) of a fit.
+    if not _is_multiple_outlets(outlet_id):
+        return fit[index]
+
+    if name is None:
+        msg = (
+            "umami: A name is required when a chi calculation is used with "
+            "more than one outlet."
+        )
+        raise ValueError(msg)
+
+    outlet_ids = _get_outlet_ids(chi_finder.grid, outlet_id)
+    out = OrderedDict()
+    for oid, value in zip(outlet_ids, fit[index]):
+        out[name.format(outlet_id=oid)] = value
+    return out
@@ -60,4 +60,9 @@ def count_equal(grid, field, value):
     [3, 8]
     """
     vals = grid.at_node[field][grid.core_nodes]
-    return np.sum(vals == value)
+    return _count_equal(vals, value)
+
+
+def _count_equal(vals, value):
+    # vals may have one row for each member of an ensemble.
+    return np.sum(vals == value, axis=-1)
@@ -1,6 +1,6 @@
 import numpy as np
 
-from landlab.utils import get_watershed_mask
+from umami.utils.watershed import _get_watershed_mask
 
 
 def hypsometric_integral(grid, outlet_id):
@@ -61,12 +61,16 @@ def hypsometric_integral(grid, outlet_id):
     [0.5]
     """
     # Get just those elevation values that are within the watershed
-    mask = get_watershed_mask(grid, outlet_id)
+    mask = _get_watershed_mask(grid, outlet_id)
     vals = grid.at_node["topographic__elevation"][mask]
+    return _hypsometric_integral(vals)
 
+
+def _hypsometric_integral(vals):
     # Get min and max
     min_val = np.amin(vals)
     max_val = np.amax(vals)
 
-    # Calc and return the hypsometric_integral
-    return np.mean(vals - min_val) / (max_val - min_val)
+    # the mean of vals - min_val, without a temporary array.
+    mean_val = np.mean(vals, dtype=np.float64)
+    return (mean_val - min_val) / (max_val - min_val)
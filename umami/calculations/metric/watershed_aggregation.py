@@ -1,11 +1,27 @@
+from collections import OrderedDict
+
 import numpy as np
 
-from landlab.utils import get_watershed_mask
+from umami.utils.watershed import (
+    _get_outlet_ids,
+    _get_watershed_mask,
+    _get_watershed_nodes,
+    _is_multiple_outlets,
+)
 
 from .aggregate import _aggregate
 
+# numpy methods that are reduced for all watersheds at once.
+_GROUPED_METHODS = {
+    "sum": np.add,
+    "amin": np.minimum,
+    "min": np.minimum,
+    "amax": np.maximum,
+    "max": np.maximum,
+}
+
 
-def watershed_aggregation(grid, field, outlet_id, method, **kwds):
+def watershed_aggregation(grid, field, outlet_id, method, name=None, **kwds):
     """Aggregate a field value over a watershed.
 
     ``watershed_aggregation`` calculates aggregate values on the nodes in a
@@ -14,22 +30,37 @@ def watershed_aggregation(grid, field, outlet_id, method, **kwds):
 
     .. _numpy: https://numpy.org
 
+    If *outlet_id* is a list of outlet ids, or the string ``all_outlets``,
+    one value is calculated for each outlet. In this case all watersheds are
+    identified together in a single pass over the grid, and a ``name`` must
+    be provided. This is a string that will be formatted with the value for
+    ``{outlet_id}``. The output is an ordered dictionary with ``name`` as the
+    keys and the aggregate values as the values. Outlets may be nested, in
+    which case the watershed of the downstream outlet includes the watershed
+    of the upstream outlet.
+
+    The outlets identified by ``all_outlets`` are all nodes at which the flow
+    from one or more core nodes terminates.
+
     Parameters
     ----------
     grid : Landlab model grid
     field : str
         An at-node Landlab grid field that is present on the model grid.
-    outlet_id : int
+    outlet_id : int, list of int, or "all_outlets"
         Outlet id of the watershed.
     method : str
         The name of a numpy namespace method.
+    name : str, optional
+        Required if more than one outlet is specified.
     **kwds
         Any additional keyword arguments needed by the method.
 
     Returns
     -------
-    out : float
-        The aggregate value.
+    out : float or OrderedDict
+        The aggregate value, or an ordered dictionary of the aggregate value
+        for each outlet.
 
     Examples
     --------
@@ -87,7 +118,74 @@ def watershed_aggregation(grid, field, outlet_id, method, **kwds):
     >>> metric.calculate()
     >>> metric.values
     [5.0, 1.8]
+
+    Finally, the mean elevation of the watersheds of several outlets can be
+    calculated at once.
+
+    >>> out = watershed_aggregation(
+    ...     grid,
+    ...     "topographic__elevation",
+    ...     [1, 2, 3],
+    ...     "mean",
+    ...     name="oid{outlet_id}_mean")
+    >>> for key, value in out.items():
+    ...     print(key, value)
+    oid1_mean 5.0
+    oid2_mean 6.0
+    oid3_mean 7.0
+
+    The same can be done for all outlets as part of an umami ``Metric``.
+
+    >>> file_like=StringIO('''
+    ... max_elev:
+    ...     _func: watershed_aggregation
+    ...     outlet_id: all_outlets
+    ...     method: max
+    ...     field: topographic__elevation
+    ...     name: oid{outlet_id}_max
+    ... ''')
+    >>> metric = Metric(grid)
+    >>> metric.add_from_file(file_like)
+    >>> metric.names[:3]
+    ['oid1_max', 'oid2_max', 'oid3_max']
+    >>> metric.calculate()
+    >>> metric.values[:3]
+    [9.0, 10.0, 11.0]
     """
-    mask = get_watershed_mask(grid, outlet_id)
-    vals = grid.at_node[field][mask]
-    return _aggregate(vals, method, **kwds)
+    if not _is_multiple_outlets(outlet_id):
+        mask = _get_watershed_mask(grid, outlet_id)
+        vals = grid.at_node[field][mask]
+        return _aggregate(vals, method, **kwds)
+
+    if name is None:
+        msg = (
+            "umami: A name is required when watershed_aggregation is used "
+            "with more than one outlet."
+        )
+        raise ValueError(msg)
+
+    outlet_ids = _get_outlet_ids(grid, outlet_id)
+    nodes, start, stop, nested = _get_watershed_nodes(grid, outlet_ids)
+
+    # gather the values once, such that each watershed is contiguous.
+    vals = grid.at_node[field][nodes]
+
+    if (not nested) and (not kwds) and (method in _GROUPED_METHODS):
+        order = np.argsort(start)
+        reduced = np.empty(outlet_ids.size, dtype=vals.dtype)
+        reduced[order] = _GROUPED_METHODS[method].reduceat(vals, start[order])
+        values = reduced
+    elif (not nested) and (not kwds) and (method == "mean"):
+        order = np.argsort(start)
+        sums = np.empty(outlet_ids.size, dtype=float)
+        sums[order] = np.add.reduceat(vals, start[order], dtype=float)
+        values = sums / (stop - start)
+    else:
+        values = [
+            _aggregate(vals[b:e], method, **kwds) for b, e in zip(start, stop)
+        ]
+
+    out = OrderedDict()
+    for oid, value in zip(outlet_ids, values):
+        out[name.format(outlet_id=oid)] = value
+    return out
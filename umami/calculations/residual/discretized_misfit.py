@@ -2,6 +2,8 @@ from collections import OrderedDict
 
 import numpy as np
 
+from umami.utils.scratch import _take
+
 
 def discretized_misfit(
     model_grid,
@@ -26,7 +28,11 @@ def discretized_misfit(
     percentile edges for each (using the data grid). This results in a set of
     categories, which may or may not be congiguous in space. This category
     field is then stored as a property of the ``Residual`` called
-    ``Residual.category``.
+    ``Residual.category``. It uses the smallest unsigned integer type that
+    holds all categories. Because the categories depend only on the data
+    grid, they are calculated once for each data grid and set of arguments
+    and reused until *field_1*, *field_2*, or the core nodes of the data grid
+    change.
 
     For each category, the sum of squared residuals is calculated based on the
     ``misfit_field``.
@@ -162,6 +168,39 @@ def discretized_misfit(
     >>> residual.category[:5]
     array([0, 0, 0, 0, 0])
     """
+    prepared = _prepare_discretized_misfit(
+        data_grid,
+        field_1,
+        field_2,
+        field_1_percentile_edges,
+        field_2_percentile_edges,
+    )
+    category, out = _discretized_misfit(
+        model_grid,
+        data_grid,
+        prepared,
+        name,
+        misfit_field,
+        field_1,
+        field_2,
+        field_1_percentile_edges,
+        field_2_percentile_edges,
+    )
+    # the prepared categories are read only and of the smallest type that
+    # fits.
+    return category.astype(int), out
+
+
+def _prepare_discretized_misfit(
+    data_grid,
+    field_1,
+    field_2,
+    field_1_percentile_edges,
+    field_2_percentile_edges,
+    **kwds
+):
+    # the categories depend only on the data grid, such that a Residual or
+    # DataReference prepares them once and reuses them for each model.
     category = _get_category_labels(
         data_grid,
         field_1,
@@ -169,74 +208,165 @@ def discretized_misfit(
         field_1_percentile_edges,
         field_2_percentile_edges,
     )
+    return _group_categories(category)
 
-    difference = (
-        model_grid.at_node[misfit_field] - data_grid.at_node[misfit_field]
+
+def _group_categories(category):
+    # Store the categories in the smallest type that fits, with the nodes of
+    # each category: nodes[bounds[c - 1]:bounds[c]] are in category c.
+    n_categories = int(np.max(category))
+    category = category.astype(np.min_scalar_type(n_categories))
+
+    order = np.argsort(category, kind="stable")
+    bounds = np.searchsorted(
+        category[order], np.arange(1, n_categories + 2), side="left"
     )
+    nodes = order[bounds[0] :]
+    bounds = bounds - bounds[0]
+
+    for array in (category, nodes, bounds):
+        array.flags.writeable = False
+    return category, nodes, bounds
+
 
+def _discretized_misfit(
+    model_grid,
+    data_grid,
+    prepared,
+    name,
+    misfit_field,
+    field_1,
+    field_2,
+    field_1_percentile_edges,
+    field_2_percentile_edges,
+    dtype=None,
+    scratch=None,
+):
+    # the difference is only taken at the nodes of the categories, in order
+    # of category, in buffers of scratch if it is provided.
+    category, nodes, bounds = prepared
+    model = model_grid.at_node[misfit_field]
+    data = data_grid.at_node[misfit_field]
+    if dtype is None:
+        dtype = np.result_type(model, data)
+
+    difference = _take(
+        model, nodes, scratch, "model", dtype=dtype, trusted=True
+    )
+    np.subtract(
+        difference,
+        _take(data, nodes, scratch, "data", dtype=dtype, trusted=True),
+        out=difference,
+    )
+
+    misfit = _grouped_rms(bounds, difference)
+    return category, _category_names(
+        misfit, name, field_1_percentile_edges, field_2_percentile_edges
+    )
+
+
+def _discretized_misfit_ensemble(
+    fields,
+    data_grid,
+    prepared,
+    name,
+    misfit_field,
+    field_1,
+    field_2,
+    field_1_percentile_edges,
+    field_2_percentile_edges,
+):
+    # the difference of each member is only taken at the nodes of the
+    # categories, in the copy made by selecting them if the values are
+    # floating point.
+    category, nodes, bounds = prepared
+    model = fields[misfit_field][..., nodes]
+    difference = np.subtract(
+        model,
+        data_grid.at_node[misfit_field][nodes],
+        out=model if model.dtype.kind == "f" else None,
+    )
+
+    misfit = _grouped_rms(bounds, difference)
+    return category, _category_names(
+        misfit, name, field_1_percentile_edges, field_2_percentile_edges
+    )
+
+
+def _category_names(
+    misfit, name, field_1_percentile_edges, field_2_percentile_edges
+):
     n_f1_levels = np.size(field_1_percentile_edges) - 1
     n_f2_levels = np.size(field_2_percentile_edges) - 1
 
     out = OrderedDict()
-    for c in range(0, np.max(category)):
+    for c in range(misfit.shape[-1]):
         f1l, f2l = np.unravel_index(c, (n_f1_levels, n_f2_levels))
         n = name.format(field_1_level=f1l, field_2_level=f2l)
+        out[n] = misfit[..., c]
+    return out
+
 
-        loc = category == (c + 1)
-        sq_resids = np.power(difference[loc], 2.0)
-        misfit = np.sqrt(np.mean(sq_resids))
-        out[n] = misfit
-    return category, out
+def _grouped_rms(bounds, difference):
+    # root mean square in each category with one grouped sum, which is
+    # accumulated in double precision. difference is ordered by category,
+    # such that difference[..., bounds[c]:bounds[c + 1]] is in category
+    # c + 1, and is squared in place. difference may have one row for each
+    # member of an ensemble. Empty categories are nan.
+    count = np.diff(bounds)
+    filled = count > 0
+
+    misfit = np.full(difference.shape[:-1] + count.shape, np.nan)
+    if np.any(filled):
+        np.square(difference, out=difference)
+        sum_sq = np.add.reduceat(
+            difference, bounds[:-1][filled], axis=-1, dtype=np.float64
+        )
+        misfit[..., filled] = np.sqrt(sum_sq / count[filled])
+    return misfit
 
 
 def _get_category_labels(
     grid, field_1, field_2, field_1_percentile_edges, field_2_percentile_edges
 ):
-
+    # Nodes are labeled by field_1 bin and, within each field_1 bin, by
+    # field_2 bin. Bins are [e_i, e_i+1) except for the last bin, which is
+    # unbounded above. Nodes below the first edge are not labeled.
     f1 = grid.at_node[field_1]
     f2 = grid.at_node[field_2]
-
-    # first bin by field 1, then within field_1, bin by field_2
-    is_core = np.zeros_like(f1, dtype=bool)
-    is_core[grid.core_nodes] = True
+    core_nodes = grid.core_nodes
 
     # calc the percentiles of the field 1 distribution
-    f1_edges = np.percentile(f1[is_core], field_1_percentile_edges)
-
-    # work through each bin and label them.
-    category = np.zeros_like(f1, dtype=np.int)
+    f1_edges = np.percentile(f1[core_nodes], field_1_percentile_edges)
+    n_f1_bins = len(f1_edges) - 1
+    n_f2_bins = np.size(field_2_percentile_edges) - 1
+
+    # bin the core nodes by field 1 and sort them by bin.
+    f1_core = f1[core_nodes]
+    f1_bin = np.searchsorted(f1_edges[:-1], f1_core, side="right") - 1
+    f1_bin[~(f1_core >= f1_edges[0])] = -1
+
+    # a small integer type makes the stable (radix) sort fast.
+    f1_bin = f1_bin.astype(
+        np.promote_types(np.int8, np.min_scalar_type(n_f1_bins))
+    )
+    order = np.argsort(f1_bin, kind="stable")
+    bounds = np.searchsorted(f1_bin[order], np.arange(n_f1_bins + 1))
 
-    val = 1
-    for i in range(len(f1_edges) - 1):
+    category = np.zeros_like(f1, dtype=int)
+    for i in range(n_f1_bins):
 
         # selected nodes
-        f1_min = f1_edges[i]
-        f1_max = f1_edges[i + 1]
-
-        if i != len(f1_edges) - 2:
-            f1_sel = (f1 >= f1_min) & (f1 < f1_max) & (is_core)
-        else:
-            f1_sel = (f1 >= f1_min) & (is_core)
+        sel_nodes = core_nodes[order[bounds[i] : bounds[i + 1]]]
 
         # get the f2 edges for this particular part of f1-space.
-        vals_sel = f2[f1_sel]
+        vals_sel = f2[sel_nodes]
         f2_edges = np.percentile(vals_sel, field_2_percentile_edges)
 
-        for j in range(len(f2_edges) - 1):
-
-            f2_min = f2_edges[j]
-            f2_max = f2_edges[j + 1]
-
-            if j != len(f2_edges) - 2:
-                f2_sel = (f2 >= f2_min) & (f2 < f2_max) & (f1_sel)
-            else:
-                f2_sel = (f2 >= f2_min) & (f1_sel)
-
-            sel_nodes = np.nonzero(f2_sel)[0]
-
-            if len(sel_nodes) > 0:
-                category[sel_nodes] = val
+        f2_bin = np.searchsorted(f2_edges[:-1], vals_sel, side="right") - 1
+        labeled = vals_sel >= f2_edges[0]
 
-            val += 1  # increment no matter what for consistency of naming.
+        # categories are numbered from one, by field 1 and then field 2 bin.
+        category[sel_nodes[labeled]] = i * n_f2_bins + f2_bin[labeled] + 1
 
     return category
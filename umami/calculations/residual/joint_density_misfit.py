@@ -98,33 +98,145 @@ def joint_density_misfit(
     array([ 0.057])
     """
 
+    prepared = _prepare_joint_density_misfit(
+        data_grid,
+        field_1,
+        field_2,
+        field_1_percentile_edges,
+        field_2_percentile_edges,
+    )
+    return _joint_density_misfit(
+        model_grid,
+        data_grid,
+        prepared,
+        field_1,
+        field_2,
+        field_1_percentile_edges,
+        field_2_percentile_edges,
+    )
+
+
+def _prepare_joint_density_misfit(
+    data_grid,
+    field_1,
+    field_2,
+    field_1_percentile_edges,
+    field_2_percentile_edges,
+    dtype=None,
+    **kwds
+):
     f1_data = data_grid.at_node[field_1][data_grid.core_nodes]
     f2_data = data_grid.at_node[field_2][data_grid.core_nodes]
-
-    f1_model = model_grid.at_node[field_1][model_grid.core_nodes]
-    f2_model = model_grid.at_node[field_2][model_grid.core_nodes]
+    if dtype is not None:
+        # the data are binned in the same precision as the model values.
+        f1_data = f1_data.astype(dtype, copy=False)
+        f2_data = f2_data.astype(dtype, copy=False)
 
     # calc the percentiles of each_distribution.
     f1_edges = np.percentile(f1_data, field_1_percentile_edges)
     f2_edges = np.percentile(f2_data, field_2_percentile_edges)
 
-    # calculate the densities for model and data
-    data_count, _, _ = np.histogram2d(
-        f1_data, f2_data, bins=(f1_edges, f2_edges), density=False
+    # calculate the density for the data
+    data_count = _joint_count(
+        _histogram_bin(f1_data, f1_edges),
+        _histogram_bin(f2_data, f2_edges),
+        (f1_edges.size - 1, f2_edges.size - 1),
     )
-
-    model_count, _, _ = np.histogram2d(
-        f1_model, f2_model, bins=(f1_edges, f2_edges), density=False
-    )
-
     data_density = data_count / data_count.sum()
 
-    if model_count.sum() == 0:
-        model_density = model_count
-    else:
-        model_density = model_count / model_count.sum()
+    return f1_edges, f2_edges, data_density
 
-    sq_resid = np.power(model_density - data_density, 2.0)
-    misfit = np.sqrt(np.mean(sq_resid))
 
-    return misfit
+def _joint_density_misfit(
+    model_grid,
+    data_grid,
+    prepared,
+    field_1,
+    field_2,
+    field_1_percentile_edges,
+    field_2_percentile_edges,
+    dtype=None,
+):
+    def core_values(field):
+        vals = model_grid.at_node[field][model_grid.core_nodes]
+        return vals if dtype is None else vals.astype(dtype, copy=False)
+
+    info = {"field_1": field_1, "field_2": field_2}
+    return _joint_density_misfits(core_values, [prepared], [info])[0]
+
+
+def _joint_density_misfits(core_values, prepared, infos):
+    # The joint-density misfit of several field pairs in one call. Model
+    # values are taken once for each field from core_values(field), which
+    # returns the values at core nodes with an optional leading axis of
+    # ensemble members, and binned once for each field and set of edges.
+    values = {}
+    bins = {}
+
+    def _bin(field, edges):
+        key = (field, edges.tobytes())
+        if key not in bins:
+            if field not in values:
+                values[field] = core_values(field)
+            bins[key] = _histogram_bin(values[field], edges)
+        return bins[key]
+
+    out = []
+    for (f1_edges, f2_edges, data_density), info in zip(prepared, infos):
+        model_count = _joint_count(
+            _bin(info["field_1"], f1_edges),
+            _bin(info["field_2"], f2_edges),
+            data_density.shape,
+        )
+
+        # calculate the density for the model
+        total = model_count.sum(axis=(-2, -1), keepdims=True)
+        model_density = model_count / np.where(total == 0, 1, total)
+
+        sq_resid = np.power(model_density - data_density, 2.0)
+        out.append(np.sqrt(np.mean(sq_resid, axis=(-2, -1))))
+    return out
+
+
+def _histogram_bin(vals, edges):
+    # one plus the bin index as in np.histogram2d: bins are half open except
+    # the last, which includes the last edge. Values below the edges are 0,
+    # and values above the edges (or nan) are len(edges).
+    # values in less than double precision are binned with edges in their
+    # precision, such that a value equal to an edge stays in its bin.
+    vals_dtype = np.asarray(vals).dtype
+    if (vals_dtype.kind == "f") and (vals_dtype.itemsize < 8):
+        edges = edges.astype(vals_dtype)
+    else:
+        edges = edges.astype(float)
+    edges[-1] = np.nextafter(edges[-1], np.inf)
+    if edges.size > 24:
+        return np.searchsorted(edges, vals, side="right")
+
+    # with few edges, counting the edges at or below each value is faster
+    # than a binary search. Edges above each value are counted instead, such
+    # that nan, which is not below any edge, is len(edges) as well.
+    index = np.full(np.shape(vals), edges.size, dtype=np.uint8)
+    below = np.empty(np.shape(vals), dtype=bool)
+    for edge in edges:
+        np.less(vals, edge, out=below)
+        index -= below
+    return index
+
+
+def _joint_count(f1_bin, f2_bin, shape):
+    # counts of (f1 bin, f2 bin) pairs, as np.histogram2d, with one bincount
+    # over a flattened index that includes the bins outside the edges. The
+    # bins may have a leading axis of ensemble members, in which case there
+    # is one count for each member.
+    n_f1, n_f2 = shape[0] + 2, shape[1] + 2
+    lead = f1_bin.shape[:-1]
+    n_members = int(np.prod(lead))
+
+    flat = f1_bin.astype(np.intp)
+    if n_members > 1:
+        flat += np.arange(0, n_members * n_f1, n_f1).reshape(lead + (1,))
+    flat *= n_f2
+    flat += f2_bin
+    count = np.bincount(flat.ravel(), minlength=n_members * n_f1 * n_f2)
+    return count.reshape(lead + (n_f1, n_f2))[..., 1:-1, 1:-1]
@@ -1,14 +1,22 @@
+from collections import OrderedDict
+
 import numpy as np
-from scipy.stats import ks_2samp
 
-from landlab.utils import get_watershed_mask
+from umami.utils.scratch import _take
+from umami.utils.watershed import (
+    _get_outlet_ids,
+    _get_watershed_mask,
+    _get_watershed_nodes,
+    _is_multiple_outlets,
+)
 
 
 def kstest(model_grid, data_grid, field):
     """Calculate an Kolmogorov-Smirnov test for a Landlab grid field.
 
-    ``kstest`` calculates the Kolmogorov-Smirnov test for goodness of fit
-    using the function ``ks_2samp`` from ``scipy.stats``.
+    ``kstest`` calculates the two sample Kolmogorov-Smirnov test statistic,
+    which is the same as that of ``ks_2samp`` from ``scipy.stats``. Within a
+    ``Residual`` the data values are sorted only once.
 
     Parameters
     ----------
@@ -57,18 +65,16 @@ def kstest(model_grid, data_grid, field):
     >>> residual.values
     [0.125]
     """
-    model_vals = model_grid.at_node[field][model_grid.core_nodes]
-    data_vals = data_grid.at_node[field][data_grid.core_nodes]
-
-    d, _ = ks_2samp(model_vals, data_vals)
-    return d
+    data_vals = _prepare_kstest(data_grid, field)
+    return _kstest(model_grid, data_grid, data_vals, field)
 
 
-def kstest_watershed(model_grid, data_grid, field, outlet_id):
+def kstest_watershed(model_grid, data_grid, field, outlet_id, name=None):
     """Calculate an Kolmogorov-Smirnov test for a watershed.
 
-    ``kstest_watershed`` calculates the Kolmogorov-Smirnov test for
-    goodness of fit using the function ``ks_2samp`` from ``scipy.stats``.
+    ``kstest_watershed`` calculates the two sample Kolmogorov-Smirnov test
+    statistic, which is the same as that of ``ks_2samp`` from
+    ``scipy.stats``.
 
     Given an *outlet_id* it identifes a watershed mask for the *data_grid*. It
     then uses that mask on both the *data_grid* and the *model_grid*.
@@ -76,18 +82,26 @@ def kstest_watershed(model_grid, data_grid, field, outlet_id):
     If the field is "flow__distance", then this performs a KS test of the width
     function.
 
+    If *outlet_id* is a list of outlets or "all_outlets", the statistic is
+    calculated for the watershed of each outlet in one call. The watersheds
+    of "all_outlets" are identified on the *data_grid*.
+
     Parameters
     ----------
     model_grid : Landlab model grid
     data_grid : Landlab model grid
     field : str
         An at-node Landlab grid field that is present on both grids.
-    outlet_id : int
+    outlet_id : int, list of int, or "all_outlets"
+    name : str, optional
+        Required if more than one outlet is used. It is formatted with the
+        value of ``{outlet_id}`` for each outlet.
 
     Returns
     -------
-    out : float
-        The KS test statistic
+    out : float or OrderedDict
+        The KS test statistic, or an ordered dictionary with one statistic
+        for each outlet if more than one outlet is used.
 
     Examples
     --------
@@ -135,10 +149,162 @@ def kstest_watershed(model_grid, data_grid, field, outlet_id):
     >>> residual.calculate()
     >>> np.round(residual.values, decimals=3)
     array([ 0.5])
+
+    The statistic can be calculated for the watersheds of many outlets at
+    once.
+
+    >>> out = kstest_watershed(
+    ...     model,
+    ...     data,
+    ...     "topographic__elevation",
+    ...     outlet_id=[1, 2],
+    ...     name="ks_{outlet_id}")
+    >>> for key, value in out.items():
+    ...     print(key, np.round(value, decimals=3))
+    ks_1 0.5
+    ks_2 0.5
     """
-    mask = get_watershed_mask(data_grid, outlet_id)
-    model_vals = model_grid.at_node[field][mask]
-    data_vals = data_grid.at_node[field][mask]
+    prepared = _prepare_kstest_watershed(data_grid, field, outlet_id)
+    return _kstest_watershed(
+        model_grid, data_grid, prepared, field, outlet_id, name=name
+    )
+
+
+def _ks_statistic(model_sorted, data_sorted):
+    # The two sample KS statistic for sorted samples. model_sorted may have
+    # one row for each member of an ensemble. Between two model values both
+    # distribution functions are steps, such that the largest difference is
+    # found either at or just below a model value. Only the data need to be
+    # searched, and no p-value is calculated.
+    n_model = model_sorted.shape[-1]
+    n_data = data_sorted.size
+    if (
+        (model_sorted.dtype.kind == "f")
+        and (data_sorted.dtype.kind == "f")
+        and (model_sorted.dtype.itemsize < data_sorted.dtype.itemsize)
+    ):
+        # compare in the precision of the model values, such that values
+        # that are equal in that precision are tied.
+        data_sorted = data_sorted.astype(model_sorted.dtype)
+
+    # number of model values below and up to each model value.
+    position = np.arange(n_model)
+    first = np.ones(model_sorted.shape, dtype=bool)
+    first[..., 1:] = model_sorted[..., 1:] != model_sorted[..., :-1]
+    if first.all():
+        model_below = position
+        model_upto = position + 1
+    else:
+        last = np.ones(model_sorted.shape, dtype=bool)
+        last[..., :-1] = first[..., 1:]
+
+        model_below = np.maximum.accumulate(
+            np.where(first, position, 0), axis=-1
+        )
+        model_upto = np.flip(
+            np.minimum.accumulate(
+                np.flip(np.where(last, position + 1, n_model), axis=-1),
+                axis=-1,
+            ),
+            axis=-1,
+        )
+
+    # number of data values below and up to each model value.
+    data_below = np.searchsorted(data_sorted, model_sorted, side="left")
+    data_upto = np.searchsorted(data_sorted, model_sorted, side="right")
+
+    d = np.maximum(
+        np.abs(model_below / n_model - data_below / n_data),
+        np.abs(model_upto / n_model - data_upto / n_data),
+    )
+    return np.max(d, axis=-1)
+
+
+def _ks_statistics(model_samples, data_sorted):
+    # KS statistics of many samples, e.g. of many fields or watersheds, each
+    # compared with its own sorted data sample. Only the model samples are
+    # sorted.
+    return np.array(
+        [
+            _ks_statistic(np.sort(model_vals), data_vals)
+            for model_vals, data_vals in zip(model_samples, data_sorted)
+        ]
+    )
+
+
+def _prepare_kstest(data_grid, field, **kwds):
+    return np.sort(data_grid.at_node[field][data_grid.core_nodes])
+
+
+def _kstest(
+    model_grid, data_grid, data_sorted, field, dtype=None, scratch=None
+):
+    # the model values are sorted in place in a buffer of scratch.
+    model_sorted = _take(
+        model_grid.at_node[field],
+        model_grid.core_nodes,
+        scratch,
+        "model",
+        dtype=dtype,
+        trusted=True,
+    )
+    model_sorted.sort()
+    return _ks_statistic(model_sorted, data_sorted)
+
+
+def _prepare_kstest_watershed(data_grid, field, outlet_id, **kwds):
+    # watersheds are identified on the data grid only.
+    if _is_multiple_outlets(outlet_id):
+        outlet_ids = _get_outlet_ids(data_grid, outlet_id)
+        nodes, start, stop, _ = _get_watershed_nodes(data_grid, outlet_ids)
+        selections = [nodes[i:j] for i, j in zip(start, stop)]
+    else:
+        outlet_ids = [outlet_id]
+        selections = [_get_watershed_mask(data_grid, outlet_id)]
+
+    data_vals = data_grid.at_node[field]
+    data_sorted = [np.sort(data_vals[nodes]) for nodes in selections]
+    return outlet_ids, selections, data_sorted
+
+
+def _kstest_watershed(
+    model_grid, data_grid, prepared, field, outlet_id, name=None, dtype=None
+):
+    outlet_ids, selections, data_sorted = prepared
+    model_vals = model_grid.at_node[field]
+
+    model_samples = [model_vals[nodes] for nodes in selections]
+    if dtype is not None:
+        model_samples = [
+            vals.astype(dtype, copy=False) for vals in model_samples
+        ]
+    d = _ks_statistics(model_samples, data_sorted)
+    return _outlet_values(d, outlet_ids, outlet_id, name)
+
+
+def _outlet_values(values, outlet_ids, outlet_id, name):
+    if not _is_multiple_outlets(outlet_id):
+        return values[0]
+
+    out = OrderedDict()
+    for oid, value in zip(outlet_ids, values):
+        out[name.format(outlet_id=oid)] = value
+    return out
+
+
+def _kstest_ensemble(fields, data_grid, data_sorted, field):
+    model_vals = fields[field][:, data_grid.core_nodes]
+    return _ks_statistic(np.sort(model_vals, axis=1), data_sorted)
+
+
+def _kstest_watershed_ensemble(
+    fields, data_grid, prepared, field, outlet_id, name=None
+):
+    outlet_ids, selections, data_sorted = prepared
+    model_vals = fields[field]
 
-    d, _ = ks_2samp(model_vals, data_vals)
-    return d
+    d = [
+        _ks_statistic(np.sort(model_vals[:, nodes], axis=1), data_vals)
+        for nodes, data_vals in zip(selections, data_sorted)
+    ]
+    return _outlet_values(d, outlet_ids, outlet_id, name)
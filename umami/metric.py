@@ -1,18 +1,84 @@
 """The ``umami.Metric`` class calculates metrics on a Landlab model grid."""
 from collections import OrderedDict
 from copy import deepcopy
+from functools import partial
 
 import numpy as np
 import yaml
 
 import umami.calculations.metric as calcs
-from landlab import RasterModelGrid, create_grid
-from umami.utils.create_landlab_components import _create_landlab_components
-from umami.utils.io import _read_input, _write_output
-from umami.utils.validate import _validate_fields, _validate_func
+from landlab import RasterModelGrid
+from umami.calculations.metric.aggregate import _aggregate
+from umami.calculations.metric.chi_intercept_gradient import (
+    _chi_fit,
+    _chi_select,
+)
+from umami.calculations.metric.count_equal import _count_equal
+from umami.calculations.metric.hypsometric_integral import (
+    _hypsometric_integral,
+)
+from umami.raster import _create_grid
+from umami.utils.chunked import (
+    _DEFAULT_BINS,
+    _DEFAULT_CHUNK_SIZE,
+    _chunked_aggregate,
+    _ChunkedStatistics,
+    _Chunks,
+)
+from umami.utils.create_landlab_components import (
+    _PRODUCED_FIELDS,
+    _LandlabComponents,
+)
+from umami.utils.io import (
+    _open_output,
+    _read_input,
+    _time_slices,
+    _write_output,
+)
+from umami.utils.profile import _format_profile, _measure, _Profiler
+from umami.utils.scratch import _Scratch, _take
+from umami.utils.validate import (
+    _validate_chunks,
+    _validate_dtype,
+    _validate_fields,
+    _validate_func,
+    _validate_outlets,
+)
+from umami.utils.watershed import (
+    _get_outlet_ids,
+    _get_watershed_node_ids,
+    _is_multiple_outlets,
+)
 
 _VALID_FUNCS = calcs.__dict__
 
+# placeholder for the field of plan steps that use the chi fit.
+_CHI_FIT = object()
+
+
+def _metric_names(grid, key, info):
+    # a metric calculated for more than one outlet has one name per outlet.
+    if _is_multiple_outlets(info.get("outlet_id", 0)):
+        outlet_ids = _get_outlet_ids(grid, info["outlet_id"])
+        return [info["name"].format(outlet_id=oid) for oid in outlet_ids]
+    else:
+        return [key]
+
+
+def _step_inputs(step, info):
+    # the fields used by a plan step, and whether it uses the flow routing.
+    field, where, _ = step
+    if field is _CHI_FIT:
+        return (), True
+    elif field is None:
+        return ((info["field"],) if "field" in info else ()), True
+    elif isinstance(where, _Chunks):
+        return (field,), False
+    elif isinstance(where, str):
+        return (field, where), False
+    else:
+        return (field,), where is not None
+
 
 class Metric(object):
     """Create a ``Metric`` class based on a Landlab model grid."""
@@ -25,6 +91,10 @@ class Metric(object):
         flow_accumulator_kwds=None,
         chi_finder_kwds=None,
         metrics=None,
+        flow_accumulator=None,
+        chi_finder=None,
+        profile=False,
+        dtype=None,
     ):
         """
         Parameters
@@ -39,6 +109,31 @@ class Metric(object):
         metrics : dict
             A dictionary of desired metrics to calculate. See examples for
             required format.
+        flow_accumulator : Landlab ``FlowAccumulator``, optional
+            A ``FlowAccumulator`` that has already been run on *grid*. Must be
+            provided together with *chi_finder*. When both are provided, no new
+            components are created and flow routing is not repeated.
+            Otherwise, flow is routed, and chi and flow distance are
+            calculated, only once a metric needs them.
+        chi_finder : Landlab ``ChiFinder``, optional
+            A ``ChiFinder`` that has already calculated chi on *grid*. Must be
+            provided together with *flow_accumulator*.
+        profile : bool, optional
+            If True, record the wall time, number of calls, and peak memory
+            allocation of the component setup and of each metric. See
+            ``Metric.profile``.
+        dtype : str or numpy.dtype, optional
+            Floating point type of the calculations, e.g. "float32". The
+            values of each field are cast to *dtype* once, as they are taken
+            from the grid, and sums are still accumulated in double
+            precision. In single precision, memory traffic is halved and
+            metrics that aggregate values agree with double precision to a
+            relative error of about 1e-6. Metrics that count values, e.g.
+            ``count_equal``, can instead change by whole counts, as values
+            that differ by less than the rounding error of float32 compare
+            differently. By default, calculations use the type of the
+            fields. Flow routing, chi, and chunked aggregations are not
+            affected.
 
         Examples
         --------
@@ -78,6 +173,29 @@ class Metric(object):
         >>> metric.values
         [9.0, 5.0, 5.0, 8]
         """
+        # FlowAccumulator and ChiFinder, unless they were provided, are run
+        # once the metrics need them.
+        profiler = _Profiler() if profile else None
+        components = _LandlabComponents(
+            grid,
+            flow_accumulator_kwds=flow_accumulator_kwds,
+            chi_finder_kwds=chi_finder_kwds,
+            flow_accumulator=flow_accumulator,
+            chi_finder=chi_finder,
+            profiler=profiler,
+        )
+        self._initialize(grid, components, metrics, dtype)
+
+    @classmethod
+    def _from_components(cls, grid, components, metrics=None, dtype=None):
+        # a Metric that uses, and profiles with, Landlab components that are
+        # shared with another calculation, e.g. a Residual, such that flow is
+        # routed only once per grid.
+        metric = cls.__new__(cls)
+        metric._initialize(grid, components, metrics, dtype)
+        return metric
+
+    def _initialize(self, grid, components, metrics, dtype):
         # verify that apppropriate fields are present.
         for field in self._required_fields:
             if field not in grid.at_node:
@@ -88,22 +206,38 @@ class Metric(object):
 
         # save a reference to the grid.
         self._grid = grid
-
-        # run FlowAccumulator and ChiFinder
-        self._fa, self._cf = _create_landlab_components(
-            self._grid,
-            chi_finder_kwds=chi_finder_kwds,
-            flow_accumulator_kwds=flow_accumulator_kwds,
-        )
+        self._dtype = _validate_dtype(dtype)
+        self._scratch = _Scratch()
+        self._components = components
+        self._profiler = components.profiler
 
         # determine which metrics are desired.
         self._metrics = OrderedDict(metrics or {})
         self._validate_metrics(self._metrics)
+        self._components.require(self._metrics.values())
+
+        # compile the calculation plan for the metrics. The inputs of each
+        # step are recorded such that a value is only calculated again once
+        # its inputs change.
+        self._plan = OrderedDict()
+        self._inputs = {}
+        self._cache = {}
+        self._compile_metrics(self._metrics)
+
+    @property
+    def _fa(self):
+        return self._components.flow_accumulator
+
+    @property
+    def _cf(self):
+        return self._components.chi_finder
 
     @property
     def names(self):
         """Names of metrics in metric order."""
-        self._names = [key for key in self._metrics]
+        self._names = []
+        for key, info in self._metrics.items():
+            self._names.extend(_metric_names(self._grid, key, info))
         return self._names
 
     def value(self, name):
@@ -119,7 +253,7 @@ class Metric(object):
     @property
     def values(self):
         """Metric values in metric order."""
-        return [self._values[key] for key in self._metrics.keys()]
+        return [self._values[key] for key in self.names]
 
     def add_from_file(self, file):
         """Add metrics to an ``umami.Metric`` from a file.
@@ -148,26 +282,248 @@ class Metric(object):
         """
         new_metrics = OrderedDict(params)
         self._validate_metrics(new_metrics)
+        self._components.require(new_metrics.values())
         for key in new_metrics:
             self._metrics[key] = new_metrics[key]
+        self._compile_metrics(new_metrics)
 
     def calculate(self):
         """Calculate metric values.
 
         Calculated metric values are stored in the attribute
         ``Metric.values``.
+
+        A copy of each field used by the metrics, and of the node status,
+        is kept and compared exactly with the field on each call, such that
+        only metrics whose fields, core nodes, or flow routing changed since
+        the last call are calculated again. Flow routing, chi, and flow
+        distance are calculated again if *topographic__elevation* changed.
+        Changes are never missed, at the cost of one copy of each field in
+        memory and one read of it per call.
         """
         self._values = OrderedDict()
 
-        for key in self._metrics.keys():
-            info = deepcopy(self._metrics[key])
-            _func = info.pop("_func")
-            function = calcs.__dict__[_func]
+        # fields are compared once per call. If the elevation changed, the
+        # components are run again and the routing version changes.
+        versions = {}
+        self._components.update(
+            self._field_version("topographic__elevation", versions)
+        )
 
-            if _func in ("chi_gradient", "chi_intercept"):
-                self._values[key] = function(self._cf)
+        # values of each field, and each chi fit, are gathered once and
+        # shared by all metrics that use them.
+        gathered = {}
+
+        # all percentiles of the same values are calculated together. When
+        # profiling, their time is split evenly between them.
+        fused = {}
+        for (field, where, kwds), (keys, q) in self._fused.items():
+            signature = self._signature(keys[0], versions)
+            if all(self._is_cached(key, signature) for key in keys):
+                continue
+
+            with _measure(self._profiler, keys, "metric"):
+                vals = self._gather(field, where, gathered)
+                fused.update(zip(keys, np.percentile(vals, q, **dict(kwds))))
+            for key in keys:
+                self._cache[key] = (signature, fused[key])
+
+        for key, (field, where, kernel) in self._plan.items():
+            signature = self._signature(key, versions)
+            if self._is_cached(key, signature):
+                value = self._cache[key][1]
+            elif self._profiler is None:
+                value = self._evaluate(field, where, kernel, gathered)
             else:
-                self._values[key] = function(self._grid, **info)
+                with self._profiler.measure(key, "metric"):
+                    value = self._evaluate(field, where, kernel, gathered)
+            self._cache[key] = (signature, value)
+
+            if isinstance(value, OrderedDict):
+                self._values.update(value)
+            else:
+                self._values[key] = value
+
+    def update(self):
+        """Route flow, and calculate chi and flow distance, again.
+
+        The ``FlowAccumulator`` and ``ChiFinder`` of the ``Metric`` are run
+        again in place, and *flow__distance* is overwritten in place, such
+        that one ``Metric`` can be used for the whole run of a model whose
+        grid evolves. Only the components that the metrics use are run.
+
+        ``Metric.calculate`` already does this if *topographic__elevation*
+        changed. Use ``update`` if flow routing should change for another
+        reason, for example a change in boundary conditions.
+
+        Examples
+        --------
+        >>> from landlab import RasterModelGrid
+        >>> from umami import Metric
+        >>> grid = RasterModelGrid((10, 10))
+        >>> z = grid.add_zeros("node", "topographic__elevation")
+        >>> z += grid.x_of_node + grid.y_of_node
+        >>> metrics = {
+        ...     "da_max": {
+        ...         "_func": "aggregate",
+        ...         "method": "amax",
+        ...         "field": "drainage_area",
+        ...     },
+        ... }
+        >>> metric = Metric(grid, metrics=metrics)
+        >>> metric.calculate()
+        >>> metric.values
+        [8.0]
+
+        Once all boundaries but one are closed, all flow leaves the grid
+        through that outlet.
+
+        >>> grid.set_watershed_boundary_condition_outlet_id(1, z)
+        >>> metric.update()
+        >>> metric.calculate()
+        >>> metric.values
+        [64.0]
+        """
+        self._components.update(force=True)
+
+    def over_time(
+        self, source, fields=None, time_dim=None, out=None, decimals=3
+    ):
+        """Calculate metrics for each time slice of model output.
+
+        The values of *fields* in each time slice are copied into the grid
+        of the ``Metric``, which must have one node per value, and the
+        metrics are calculated. The same grid and components are used for
+        all slices, and only one slice is read into memory at a time, such
+        that output that does not fit in memory can be processed. As with
+        ``Metric.calculate``, flow is only routed again if the elevation
+        changed, and only metrics whose inputs changed are calculated again.
+
+        Reading NetCDF files requires `xarray`_, which is installed with
+        ``pip install umami[netcdf]``.
+
+        .. _xarray: https://xarray.dev
+
+        Parameters
+        ----------
+        source : xarray.Dataset, str, or list of str
+            A dataset, or the path of a NetCDF file, or a list of paths of
+            NetCDF files (e.g. one per output time) that are read in order.
+            Each field is a variable with a time dimension and one value per
+            node, such as the output of Landlab's ``write_raster_netcdf``.
+        fields : list of str, optional
+            Names of the fields to read from each slice. Defaults to
+            *topographic__elevation*.
+        time_dim : str, optional
+            Name of the time dimension. By default "time" or "nt", or else
+            the first dimension of three-dimensional variables.
+        out : file path or file-like, optional
+            If provided, the metrics of each slice are written to *out* as a
+            row of comma separated values, with a header of "time" and the
+            metric names, as soon as they are calculated.
+        decimals: int
+            Number of decimals to round written output to.
+
+        Yields
+        ------
+        time, values
+            The time of the slice, or its index if the dataset has no time
+            variable, and the metric values in metric order. Collect them to
+            get a table of n_times by n_metrics.
+
+        Examples
+        --------
+        >>> from io import StringIO
+        >>> import numpy as np
+        >>> import xarray as xr
+        >>> from landlab import RasterModelGrid
+        >>> from umami import Metric
+        >>> grid = RasterModelGrid((10, 10))
+        >>> z = grid.add_zeros("node", "topographic__elevation")
+        >>> metrics = {
+        ...     "me": {
+        ...         "_func": "aggregate",
+        ...         "method": "mean",
+        ...         "field": "topographic__elevation",
+        ...     },
+        ...     "oid1_mean": {
+        ...         "_func": "watershed_aggregation",
+        ...         "field": "topographic__elevation",
+        ...         "method": "mean",
+        ...         "outlet_id": 1,
+        ...     },
+        ... }
+        >>> metric = Metric(grid, metrics=metrics)
+        >>> stack = np.array(
+        ...     [t * (grid.x_of_node + grid.y_of_node) for t in (1, 2, 3)]
+        ... )
+        >>> dataset = xr.Dataset(
+        ...     {
+        ...         "topographic__elevation": (
+        ...             ("time", "nj", "ni"),
+        ...             stack.reshape((3, 10, 10)),
+        ...         )
+        ...     },
+        ...     coords={"time": [100.0, 200.0, 300.0]},
+        ... )
+        >>> out = StringIO()
+        >>> table = [
+        ...     values for time, values in metric.over_time(dataset, out=out)
+        ... ]
+        >>> np.array(table)
+        array([[  9.,   5.],
+               [ 18.,  10.],
+               [ 27.,  15.]])
+        >>> print(out.getvalue().strip())
+        time,me,oid1_mean
+        100.0,9.0,5.0
+        200.0,18.0,10.0
+        300.0,27.0,15.0
+        """
+        fields = fields or ["topographic__elevation"]
+        if out is None:
+            yield from self._over_time(
+                source, fields, time_dim, None, decimals
+            )
+        else:
+            with _open_output(out) as f:
+                yield from self._over_time(
+                    source, fields, time_dim, f, decimals
+                )
+
+    def _over_time(self, source, fields, time_dim, f, decimals):
+        header = None
+        for time, values in _time_slices(source, fields, time_dim):
+            for field, vals in values.items():
+                if vals.size != self._grid.number_of_nodes:
+                    msg = (
+                        "umami: Each time slice of {field} must have one "
+                        "value per node of the grid."
+                    ).format(field=field)
+                    raise ValueError(msg)
+                if field in self._grid.at_node:
+                    self._grid.at_node[field][:] = vals
+                else:
+                    self._grid.add_field(field, vals.copy(), at="node")
+
+            self.calculate()
+            names, metric_values = self.names, self.values
+
+            if f is not None:
+                if header is None:
+                    header = names
+                    f.write(",".join(["time"] + names) + "\n")
+                elif names != header:
+                    msg = "umami: The metric names changed between slices."
+                    raise ValueError(msg)
+                row = [str(time)] + [
+                    str(np.round(val, decimals=decimals))
+                    for val in metric_values
+                ]
+                f.write(",".join(row) + "\n")
+                f.flush()
+
+            yield time, metric_values
 
     def write_metrics_to_file(self, path, style, decimals=3):
         """Write metrics to a file.
@@ -255,6 +611,86 @@ class Metric(object):
 
         _write_output(path, stream)
 
+    @property
+    def profile(self):
+        """Profile of the component setup and of each metric.
+
+        Profiling is enabled with ``profile=True`` when the ``Metric`` is
+        created. Each record is a dictionary with the *name* of the step, its
+        *kind* ("component" or "metric"), the number of *calls*, the total
+        wall *time* in seconds, and the largest *peak_memory* allocated in
+        bytes, as measured by ``tracemalloc``, in any one call. Percentiles
+        of the same values are calculated together and share their time
+        equally.
+
+        The first metric to use a field also includes the time taken to get
+        the values of the field. Measuring memory with ``tracemalloc`` slows
+        the calculations down, such that times are best compared with each
+        other rather than with an unprofiled run.
+
+        Returns
+        -------
+        list of dict or None
+            The records in the order in which the steps were first run, or
+            ``None`` if profiling is not enabled. The list can be passed
+            directly to ``pandas.DataFrame``.
+
+        Examples
+        --------
+        >>> from landlab import RasterModelGrid
+        >>> from umami import Metric
+        >>> grid = RasterModelGrid((10, 10))
+        >>> z = grid.add_zeros("node", "topographic__elevation")
+        >>> z += grid.x_of_node + grid.y_of_node
+        >>> metrics = {
+        ...     "me": {
+        ...         "_func": "aggregate",
+        ...         "method": "mean",
+        ...         "field": "topographic__elevation",
+        ...     },
+        ...     "sn1": {
+        ...         "_func": "count_equal",
+        ...         "field": "drainage_area",
+        ...         "value": 1,
+        ...     },
+        ... }
+        >>> metric = Metric(grid, metrics=metrics, profile=True)
+        >>> metric.calculate()
+        >>> z += 1.0
+        >>> metric.calculate()
+
+        Only flow routing is needed for these metrics, such that chi and flow
+        distance are not calculated. Flow is routed again once the elevation
+        changes, but the drainage area is the same, such that *sn1* is not
+        calculated again.
+
+        >>> for record in metric.profile:
+        ...     print(record["name"], record["kind"], record["calls"])
+        FlowAccumulator component 2
+        me metric 2
+        sn1 metric 1
+        >>> sorted(metric.profile[-1])
+        ['calls', 'kind', 'name', 'peak_memory', 'time']
+        """
+        if self._profiler is None:
+            return None
+        return self._profiler.report
+
+    def write_profile_to_file(self, path, style="yaml"):
+        """Write the profile to a file.
+
+        Parameters
+        ----------
+        path :
+        style : str
+            yaml, csv
+        """
+        if self._profiler is None:
+            msg = "umami: Profiling was not enabled for this Metric."
+            raise ValueError(msg)
+
+        _write_output(path, _format_profile(self.profile, style))
+
     @classmethod
     def from_dict(cls, params):
         """Create an umami ``Metric`` from a dictionary.
@@ -264,8 +700,10 @@ class Metric(object):
         params : dict or OrderedDict
             This dict must contain a key *grid*, the values of which will be
             passed to the `Landlab` function ``create_grid`` to create the
-            model grid. It will be convereted to an OrderedDict before metrics
-            are added so as to preserve metric order.
+            model grid. If the values contain a key *raster*, its values are
+            instead passed to ``umami.raster.open_raster``. It will be
+            convereted to an OrderedDict before metrics are added so as to
+            preserve metric order.
 
         Examples
         --------
@@ -324,7 +762,7 @@ class Metric(object):
         [9.0, 5.0, 5.0, 8]
         """
         # create grid
-        grid = create_grid(params.pop("grid"))
+        grid = _create_grid(params.pop("grid"))
         return cls(grid, **params)
 
     @classmethod
@@ -387,9 +825,179 @@ class Metric(object):
         params = _read_input(file_like)
         return cls.from_dict(params)
 
+    def _compile_metrics(self, metrics):
+        # Resolve the function and bind the arguments of each metric once
+        # such that ``calculate`` does no copying or dispatch by name. Each
+        # step of the plan is (field, where, kernel). If field is None, the
+        # kernel is called without arguments. Otherwise it is called with the
+        # values of the field where the nodes are selected by where: None for
+        # the core nodes, a str for a boolean mask field, and an int for the
+        # watershed of an outlet. If field is _CHI_FIT, the kernel is called
+        # with the chi fit for the outlets given by where.
+        for key in metrics:
+            info = deepcopy(metrics[key])
+            _func = info.pop("_func")
+            function = _VALID_FUNCS[_func]
+
+            if _func in ("chi_gradient", "chi_intercept"):
+                # chi_gradient and chi_intercept share one fit per outlet_id.
+                outlet_id = info.pop("outlet_id", None)
+                if _is_multiple_outlets(outlet_id) and not isinstance(
+                    outlet_id, str
+                ):
+                    outlet_id = tuple(outlet_id)
+                kernel = partial(
+                    _chi_select,
+                    index=0 if _func == "chi_gradient" else 1,
+                    chi_finder=self._cf,
+                    outlet_id=outlet_id,
+                    **info
+                )
+                step = (_CHI_FIT, outlet_id, kernel)
+            elif (_func == "aggregate") and (
+                (info.get("chunk_size") is not None)
+                or (info.get("rank_error") is not None)
+            ):
+                # chunked aggregations of a field with the same options
+                # share their statistics and quantile sketch, such that
+                # all percentiles are estimated from one sketch.
+                field = info.pop("field")
+                chunk_size = info.pop("chunk_size", None)
+                rank_error = info.pop("rank_error", None)
+                chunks = _Chunks(
+                    _DEFAULT_CHUNK_SIZE if chunk_size is None else chunk_size,
+                    int(info.pop("bins", None) or _DEFAULT_BINS),
+                    None if rank_error is None else float(rank_error),
+                )
+                step = (field, chunks, partial(_chunked_aggregate, **info))
+            elif _func == "aggregate":
+                field = info.pop("field")
+                step = (field, None, partial(_aggregate, **info))
+            elif _func == "count_equal":
+                field = info.pop("field")
+                step = (field, None, partial(_count_equal, **info))
+            elif _func == "mask_aggregation":
+                field = info.pop("field")
+                mask = info.pop("mask")
+                step = (field, mask, partial(_aggregate, **info))
+            elif (_func == "watershed_aggregation") and (
+                not _is_multiple_outlets(info["outlet_id"])
+            ):
+                field = info.pop("field")
+                outlet_id = int(info.pop("outlet_id"))
+                step = (field, outlet_id, partial(_aggregate, **info))
+            elif _func == "hypsometric_integral":
+                outlet_id = int(info.pop("outlet_id"))
+                step = (
+                    "topographic__elevation",
+                    outlet_id,
+                    partial(_hypsometric_integral, **info),
+                )
+            else:
+                step = (None, None, partial(function, self._grid, **info))
+
+            self._plan[key] = step
+            self._inputs[key] = _step_inputs(step, metrics[key])
+            self._cache.pop(key, None)
+
+        self._fuse_percentiles()
+
+    def _fuse_percentiles(self):
+        # Group the percentile aggregations of the same values and with the
+        # same keyword arguments, such that each group is calculated with a
+        # single call to np.percentile with a vector of q values.
+        self._fused = OrderedDict()
+        for key, (field, where, kernel) in self._plan.items():
+            if (field is None) or (kernel.func is not _aggregate):
+                continue
+
+            kwds = dict(kernel.keywords)
+            if (kwds.pop("method") != "percentile") or (
+                not np.isscalar(kwds.get("q"))
+            ):
+                continue
+
+            q = kwds.pop("q")
+            group = (field, where, tuple(sorted(kwds.items())))
+            try:
+                keys, qs = self._fused.setdefault(group, ([], []))
+            except TypeError:
+                # keyword arguments that can not be hashed are not fused.
+                continue
+            keys.append(key)
+            qs.append(q)
+
+    def _field_version(self, field, versions):
+        if field not in versions:
+            versions[field] = self._components.versions.version(
+                field, self._grid.at_node[field]
+            )
+        return versions[field]
+
+    def _signature(self, key, versions):
+        # the state of the inputs of a plan step: the fields it uses, the
+        # core nodes, and, if it uses watersheds or chi, the flow routing.
+        fields, routed = self._inputs[key]
+        if "status_at_node" not in versions:
+            # the grid returns a new view of the status with each access.
+            versions["status_at_node"] = self._components.versions.version(
+                "status_at_node", self._grid.status_at_node
+            )
+        return (
+            versions["status_at_node"],
+            tuple(self._field_version(f, versions) for f in fields),
+            self._components.version if routed else None,
+        )
+
+    def _is_cached(self, key, signature):
+        return (key in self._cache) and (self._cache[key][0] == signature)
+
+    def _evaluate(self, field, where, kernel, gathered):
+        if field is None:
+            return kernel()
+        else:
+            return kernel(self._gather(field, where, gathered))
+
+    def _gather(self, field, where, gathered):
+        # get the values of field at the nodes selected by where.
+        if (field, where) not in gathered:
+            if field is _CHI_FIT:
+                gathered[(field, where)] = _chi_fit(self._cf, where)
+                return gathered[(field, where)]
+
+            if isinstance(where, _Chunks):
+                gathered[(field, where)] = _ChunkedStatistics(
+                    self._grid,
+                    field,
+                    where.size,
+                    bins=where.bins,
+                    rank_error=where.rank_error,
+                )
+                return gathered[(field, where)]
+
+            if where is None:
+                nodes = self._grid.core_nodes
+            elif isinstance(where, str):
+                nodes = self._grid.at_node[where]
+            else:
+                nodes = _get_watershed_node_ids(self._grid, where)
+            # values are copied into buffers that are reused by each call.
+            # A mask field is given by the user and is indexed as it is.
+            gathered[(field, where)] = _take(
+                self._grid.at_node[field],
+                nodes,
+                self._scratch,
+                (field, where),
+                dtype=self._dtype,
+                trusted=not isinstance(where, str),
+            )
+        return gathered[(field, where)]
+
     def _validate_metrics(self, metrics):
         # look at all _funcs, ensure that they are valid
         for key in metrics:
             info = metrics[key]
             _validate_func(key, info, _VALID_FUNCS)
-            _validate_fields(self._grid, info)
+            _validate_fields(self._grid, info, _PRODUCED_FIELDS)
+            _validate_outlets(key, info)
+            _validate_chunks(key, info)
@@ -0,0 +1,142 @@
+"""Create Landlab grids from large rasters without reading them into memory."""
+import numpy as np
+
+from landlab import RasterModelGrid, create_grid
+
+
+def open_raster(
+    path,
+    shape=None,
+    dtype=None,
+    xy_spacing=1.0,
+    xy_of_lower_left=(0.0, 0.0),
+    offset=0,
+    origin="lower",
+    nodata_value=None,
+    mode="r",
+):
+    """Create a grid whose elevation is a memory-mapped raster file.
+
+    The elevation values are mapped into memory with ``np.load`` (for
+    ``.npy`` files) or ``np.memmap`` (for raw binary files, such as the band
+    of a GeoTIFF-like file at a known *offset*) and attached to a
+    ``RasterModelGrid`` as the *topographic__elevation* field without being
+    copied. Pages of the file are only read once they are used, such that
+    metrics that do not route flow, e.g. ``aggregate`` on
+    *topographic__elevation*, run directly off the mapped file.
+
+    Parameters
+    ----------
+    path : str
+        Path of a ``.npy`` file, or of a raw binary file.
+    shape : tuple of int, optional
+        Number of rows and columns. Required for raw files.
+    dtype : str or numpy.dtype, optional
+        Type of the values, including their byte order. Required for raw
+        files.
+    xy_spacing : float or tuple of float, optional
+        Spacing of the nodes.
+    xy_of_lower_left : tuple of float, optional
+        Coordinates of the lower left node.
+    offset : int, optional
+        Offset, in bytes, of the values in a raw file.
+    origin : str, optional
+        "lower" if the first row of the raster is the lowest row of the grid,
+        as in a grid field saved with ``np.save``, or "upper" if the first row
+        is the highest (north-up). Only "lower" rasters are mapped without a
+        copy, as the rows of an "upper" raster must be reordered.
+    nodata_value : float, optional
+        Nodes with this elevation are closed.
+    mode : str, optional
+        The mode of the memory map: "r" for read-only, "r+" to write changes
+        to the file, or "c" to keep changes in memory only.
+
+    Returns
+    -------
+    RasterModelGrid
+
+    Examples
+    --------
+    >>> import os
+    >>> import tempfile
+    >>> import numpy as np
+    >>> from umami import Metric
+    >>> from umami.raster import open_raster
+    >>> path = os.path.join(tempfile.mkdtemp(), "dem.npy")
+    >>> z = np.arange(20.0).reshape((4, 5))
+    >>> z[0, 0] = -9999.0
+    >>> np.save(path, z)
+    >>> grid = open_raster(path, xy_spacing=10.0, nodata_value=-9999.0)
+    >>> grid.shape
+    (4, 5)
+    >>> elevation = grid.at_node["topographic__elevation"]
+    >>> elevation.flags.writeable
+    False
+
+    Metrics that only use the elevation run without routing flow.
+
+    >>> metric = Metric(
+    ...     grid,
+    ...     metrics={
+    ...         "ep50": {
+    ...             "_func": "aggregate",
+    ...             "method": "percentile",
+    ...             "field": "topographic__elevation",
+    ...             "q": 50,
+    ...         },
+    ...     },
+    ... )
+    >>> metric.calculate()
+    >>> metric.values
+    [9.5]
+    >>> "drainage_area" in grid.at_node
+    False
+    """
+    if origin not in ("lower", "upper"):
+        msg = "umami: origin must be one of lower or upper."
+        raise ValueError(msg)
+
+    if str(path).endswith(".npy"):
+        values = np.load(path, mmap_mode=mode)
+        if ((shape is not None) and (tuple(shape) != values.shape)) or (
+            (dtype is not None) and (np.dtype(dtype) != values.dtype)
+        ):
+            msg = "umami: The shape or dtype does not match the .npy file."
+            raise ValueError(msg)
+    else:
+        if (shape is None) or (dtype is None):
+            msg = "umami: The shape and dtype of a raw file are required."
+            raise ValueError(msg)
+        values = np.memmap(
+            path, dtype=dtype, mode=mode, offset=offset, shape=tuple(shape)
+        )
+
+    if values.ndim != 2:
+        msg = "umami: The raster must have two dimensions."
+        raise ValueError(msg)
+
+    if origin == "upper":
+        values = np.ascontiguousarray(values[::-1])
+
+    grid = RasterModelGrid(
+        values.shape, xy_spacing=xy_spacing, xy_of_lower_left=xy_of_lower_left
+    )
+    elevation = np.asarray(values).reshape(-1)
+    grid.add_field("topographic__elevation", elevation, at="node", copy=False)
+
+    if nodata_value is not None:
+        grid.set_nodata_nodes_to_closed(elevation, nodata_value)
+
+    return grid
+
+
+def _create_grid(params):
+    # create a grid from the arguments of open_raster, given as the value of
+    # a key "raster", or else with the Landlab function create_grid.
+    if "raster" in params:
+        kwds = dict(params["raster"])
+        for key in ("shape", "xy_spacing", "xy_of_lower_left"):
+            if isinstance(kwds.get(key), list):
+                kwds[key] = tuple(kwds[key])
+        return open_raster(**kwds)
+    return create_grid(params)
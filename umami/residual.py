@@ -1,4 +1,4 @@
-""""""
+"""The ``umami.Residual`` class calculates residuals between model and data."""
 from collections import OrderedDict
 from copy import deepcopy
 
@@ -8,16 +8,97 @@ from numpy.testing import assert_array_equal
 
 import umami.calculations.metric as metric_calcs
 import umami.calculations.residual as residual_calcs
-from landlab import RasterModelGrid, create_grid
-from umami.metric import Metric
-from umami.utils.create_landlab_components import _create_landlab_components
+from landlab import RasterModelGrid
+from umami.calculations.metric.aggregate import _aggregate_ensemble
+from umami.calculations.metric.count_equal import _count_equal
+from umami.metric import Metric, _metric_names
+from umami.raster import _create_grid
+from umami.utils.create_landlab_components import (
+    _PRODUCED_FIELDS,
+    _LandlabComponents,
+)
 from umami.utils.io import _read_input, _write_output
-from umami.utils.validate import _validate_fields, _validate_func
+from umami.utils.profile import _format_profile, _measure, _Profiler
+from umami.utils.scratch import _Scratch, _take
+from umami.calculations.residual.discretized_misfit import (
+    _discretized_misfit,
+    _discretized_misfit_ensemble,
+    _prepare_discretized_misfit,
+)
+from umami.calculations.residual.joint_density_misfit import (
+    _joint_density_misfit,
+    _joint_density_misfits,
+    _prepare_joint_density_misfit,
+)
+from umami.calculations.residual.kstest import (
+    _kstest,
+    _kstest_ensemble,
+    _kstest_watershed,
+    _kstest_watershed_ensemble,
+    _prepare_kstest,
+    _prepare_kstest_watershed,
+)
+from umami.utils.validate import (
+    _validate_dtype,
+    _validate_ensemble,
+    _validate_fields,
+    _validate_func,
+    _validate_outlets,
+)
+from umami.utils.watershed import _get_outlet_ids
 
 _VALID_FUNCS = {}
 _VALID_FUNCS.update(residual_calcs.__dict__)
 _VALID_FUNCS.update(metric_calcs.__dict__)
 
+# Each residual-only calculation is split into a part that depends only on
+# the data grid and a part that uses the prepared data with the model grid.
+_PREPARED_FUNCS = {
+    "discretized_misfit": (_prepare_discretized_misfit, _discretized_misfit),
+    "joint_density_misfit": (
+        _prepare_joint_density_misfit,
+        _joint_density_misfit,
+    ),
+    "kstest": (_prepare_kstest, _kstest),
+    "kstest_watershed": (_prepare_kstest_watershed, _kstest_watershed),
+}
+
+# Residual-only calculations that reuse the buffers of the Residual.
+_SCRATCH_FUNCS = ("discretized_misfit", "kstest")
+
+# Residual-only calculations for many model realizations at once. These use
+# the same prepared data as the calculations above. All joint_density_misfit
+# residuals are calculated together by Residual._joint_density_values.
+_ENSEMBLE_FUNCS = {
+    "discretized_misfit": _discretized_misfit_ensemble,
+    "kstest": _kstest_ensemble,
+    "kstest_watershed": _kstest_watershed_ensemble,
+}
+
+
+def _metrics_in(residuals, data_grid):
+    metrics = OrderedDict()
+    for key, info in residuals.items():
+        func = info["_func"]
+        if func in metric_calcs.__dict__:
+            # outlets identified by all_outlets are found on the data grid
+            # such that model and data use the same outlets.
+            if info.get("outlet_id") == "all_outlets":
+                outlet_ids = _get_outlet_ids(data_grid, "all_outlets")
+                info = dict(info, outlet_id=outlet_ids.tolist())
+            metrics[key] = info
+    return metrics
+
+
+def _validate_required_fields(required_fields, *grids):
+    for field in required_fields:
+        for grid in grids:
+            if field not in grid.at_node:
+                msg = "umami: Required field: {field} is missing.".format(
+                    field=field
+                )
+                raise ValueError(msg)
+
 
 class Residual(object):
     """Create a ``Residual`` class based on a model and data Landlab grid."""
@@ -31,12 +112,17 @@ class Residual(object):
         flow_accumulator_kwds=None,
         chi_finder_kwds=None,
         residuals=None,
+        profile=False,
+        dtype=None,
     ):
         """
         Parameters
         ----------
         model : Landlab model grid
-        data : Landlab model grid
+        data : Landlab model grid or umami.DataReference
+            If a ``DataReference`` is provided, the data side of all residuals
+            is taken from it and *flow_accumulator_kwds*, *chi_finder_kwds*,
+            and *residuals* must not be provided.
         flow_accumulator_kwds : dict
             Parameters to pass to the Landlab ``FlowAccumulator`` to specify
             flow direction and accumulation.
@@ -46,6 +132,26 @@ class Residual(object):
         residuals : dict
             A dictionary of desired residuals to calculate. See examples for
             required format.
+        profile : bool, optional
+            If True, record the wall time, number of calls, and peak memory
+            allocation of the component setup, the metrics on each grid, and
+            each residual. See ``Residual.profile``.
+        dtype : str or numpy.dtype, optional
+            Floating point type of the calculations, e.g. "float32". Model
+            and data values are cast to *dtype* once, as they are taken from
+            the grids or the ensemble fields, and sums are still accumulated
+            in double precision. See ``Metric``. Values that are prepared
+            from the data grid, e.g. percentile edges, and the metric values
+            of a ``DataReference``, are calculated in the type of the data
+            fields. Residuals that count values in histogram bins or
+            categories, i.e. ``joint_density_misfit``,
+            ``discretized_misfit``, ``kstest``, and ``kstest_watershed``,
+            do not agree to a relative error of about 1e-6. A value within
+            the rounding error of float32 of a bin edge can move to the
+            neighboring bin, which changes each affected count by one. For
+            these residuals, expect an absolute difference of up to about
+            2 / number of core nodes, which can be a relative difference of
+            several percent on small grids.
 
         Examples
         --------
@@ -95,6 +201,26 @@ class Residual(object):
         ...     np.array([ -0.467,  -0.151,   3.313, -18.   ]),
         ...     decimal=3)
         """
+        self._reference = None
+        if isinstance(data, DataReference):
+            self._reference = data
+            data = self._reference._grid
+
+            if (
+                (residuals is not None)
+                or (flow_accumulator_kwds is not None)
+                or (chi_finder_kwds is not None)
+            ):
+                msg = (
+                    "umami: When a DataReference is provided, residuals and "
+                    "component keywords are taken from the DataReference."
+                )
+                raise ValueError(msg)
+
+            residuals = self._reference._residuals
+            flow_accumulator_kwds = self._reference._flow_accumulator_kwds
+            chi_finder_kwds = self._reference._chi_finder_kwds
+
         # assert that the model grids have the same x_of_node and y_of_node.
         assert_array_equal(data.x_of_node, model.x_of_node)
         assert_array_equal(data.y_of_node, model.y_of_node)
@@ -102,47 +228,59 @@ class Residual(object):
 
         self._data_grid = data
         self._model_grid = model
+        self._dtype = _validate_dtype(dtype)
+        self._scratch = _Scratch()
 
         # verify that apppropriate fields are present.
-        for field in self._required_fields:
-            if (field not in model.at_node) or (field not in data.at_node):
-                msg = "umami: Required field: {field} is missing.".format(
-                    field=field
-                )
-                raise ValueError(msg)
-
-        # run FlowAccumulator and ChiFinder
-        self._data_fa, self._data_cf = _create_landlab_components(
-            self._data_grid,
-            chi_finder_kwds=chi_finder_kwds,
-            flow_accumulator_kwds=flow_accumulator_kwds,
-        )
+        _validate_required_fields(self._required_fields, model, data)
 
-        self._model_fa, self._model_cf = _create_landlab_components(
-            self._model_grid,
-            chi_finder_kwds=chi_finder_kwds,
-            flow_accumulator_kwds=flow_accumulator_kwds,
-        )
+        self._profiler = _Profiler() if profile else None
+        data_profiler = model_profiler = None
+        if profile:
+            data_profiler = self._profiler.child("data")
+            model_profiler = self._profiler.child("model")
 
         # determine which residuals are desired.
         self._residuals = OrderedDict(residuals or {})
         self._validate_residuals(self._residuals)
-        self._distinguish_metric_from_resid()
-
-        self._category = None
 
-        # set up metric and residual objects
-        self._data_metric = Metric(
-            data,
+        # run FlowAccumulator and ChiFinder on each grid once the residuals
+        # need them. The data grid components are not needed if a
+        # DataReference was provided.
+        self._data_components = None
+        if self._reference is None:
+            self._data_components = _LandlabComponents(
+                self._data_grid,
+                flow_accumulator_kwds=flow_accumulator_kwds,
+                chi_finder_kwds=chi_finder_kwds,
+                profiler=data_profiler,
+            )
+        self._model_components = _LandlabComponents(
+            self._model_grid,
             flow_accumulator_kwds=flow_accumulator_kwds,
             chi_finder_kwds=chi_finder_kwds,
-            metrics=self._metrics,
+            profiler=model_profiler,
         )
-        self._model_metric = Metric(
-            model,
-            flow_accumulator_kwds=flow_accumulator_kwds,
-            chi_finder_kwds=chi_finder_kwds,
-            metrics=self._metrics,
+        self._require_components(self._residuals)
+        self._distinguish_metric_from_resid()
+
+        self._category = None
+
+        # prepared data-grid values for residual-only calculations. These
+        # depend only on the data grid and are calculated once.
+        if self._reference is None:
+            self._prepared = {}
+        else:
+            self._prepared = dict(self._reference._prepared)
+
+        # set up metric objects that share the components created above so
+        # that flow routing is done only once per grid.
+        if self._reference is None:
+            self._data_metric = Metric._from_components(
+                data, self._data_components, self._metrics, dtype=self._dtype
+            )
+        self._model_metric = Metric._from_components(
+            model, self._model_components, self._metrics, dtype=self._dtype
         )
 
     @property
@@ -150,8 +288,12 @@ class Residual(object):
         """Names of residuals in residual order."""
         self._names = []
         for key, info in self._residuals.items():
-            if info["_func"] != "discretized_misfit":
-                self._names.append(key)
+            if key in self._metrics:
+                self._names.extend(
+                    _metric_names(self._data_grid, key, self._metrics[key])
+                )
+            elif info["_func"] != "discretized_misfit":
+                self._names.extend(_metric_names(self._data_grid, key, info))
             else:
                 n_f1_levels = np.size(info["field_1_percentile_edges"]) - 1
                 n_f2_levels = np.size(info["field_2_percentile_edges"]) - 1
@@ -174,7 +316,10 @@ class Residual(object):
             The category labels used with ``discretized_misfit`` or ``None`` if
             this calculation is not used.
         """
-        return self._category
+        if self._category is None:
+            return None
+        # a copy, as the categories are prepared read only in a compact type.
+        return self._category.astype(int)
 
     def value(self, name):
         """Get a specific residual value.
@@ -216,8 +361,16 @@ class Residual(object):
             the creation of the residual. It will be convereted to an OrderedDict
             before residuals are added so as to preserve residual order.
         """
+        if self._reference is not None:
+            msg = (
+                "umami: Residuals cannot be added to a Residual created from "
+                "a DataReference."
+            )
+            raise ValueError(msg)
+
         new_residuals = OrderedDict(params)
         self._validate_residuals(new_residuals)
+        self._require_components(new_residuals)
         for key in new_residuals:
             self._residuals[key] = new_residuals[key]
         self._distinguish_metric_from_resid()
@@ -239,31 +392,239 @@ class Residual(object):
         self._values = OrderedDict()
 
         self._model_metric.calculate()
-        self._data_metric.calculate()
+        if self._reference is None:
+            self._data_metric.calculate()
+            data_values = self._data_metric._values
+        else:
+            data_values = self._reference._metric_values
+
+        core_nodes = self._model_grid.core_nodes
+        joint_density_keys = [
+            key
+            for key, info in self._residuals.items()
+            if info["_func"] == "joint_density_misfit"
+        ]
+        with _measure(self._profiler, joint_density_keys, "residual"):
+            joint_density = self._joint_density_values(
+                lambda field: _take(
+                    self._model_grid.at_node[field],
+                    core_nodes,
+                    self._scratch,
+                    ("joint_density", field),
+                    dtype=self._dtype,
+                    trusted=True,
+                )
+            )
+
+        for key in self._residuals.keys():
+            if key in joint_density:
+                resid = joint_density[key]
+            elif self._profiler is None:
+                resid = self._calculate_residual(key, data_values)
+            else:
+                with self._profiler.measure(key, "residual"):
+                    resid = self._calculate_residual(key, data_values)
+
+            _func = self._residuals[key]["_func"]
+
+            if _func == "discretized_misfit":
+                self._category = resid[0]
+                self._values.update(resid[1])
+            elif isinstance(resid, OrderedDict):
+                self._values.update(resid)
+            else:
+                self._values[key] = resid
+
+    def calculate_ensemble(self, fields):
+        """Calculate residual values for an ensemble of model realizations.
+
+        Each member of the ensemble is a set of at-node fields on a grid with
+        the geometry of the model grid. All members are evaluated against the
+        data at once with vectorized operations. The model grid itself is
+        not used, except for the *mask* of ``mask_aggregation``.
+
+        Because no flow routing is done for the members, only the
+        calculations ``aggregate``, ``count_equal``, ``mask_aggregation``,
+        ``discretized_misfit``, ``joint_density_misfit``, ``kstest``, and
+        ``kstest_watershed`` are supported. Watersheds used by
+        ``kstest_watershed`` are identified on the data grid.
+
+        Parameters
+        ----------
+        fields : dict
+            Keys are field names and values are arrays of shape
+            (number of members, number of nodes). All fields used by the
+            residuals must be provided.
+
+        Returns
+        -------
+        out : ndarray of shape (number of members, number of residuals)
+            Residual values with one row for each member, and columns in the
+            order of ``Residual.names``.
+
+        Examples
+        --------
+        >>> import numpy as np
+        >>> from landlab import RasterModelGrid
+        >>> from umami import Residual
+        >>> np.random.seed(42)
+        >>> model = RasterModelGrid((10, 10))
+        >>> z_model = model.add_zeros("node", "topographic__elevation")
+        >>> z_model += model.x_of_node + model.y_of_node
+        >>> data = RasterModelGrid((10, 10))
+        >>> z_data = data.add_zeros("node", "topographic__elevation")
+        >>> z_data +=  data.x_of_node + data.y_of_node
+        >>> z_data[data.core_nodes] += np.random.random(data.core_nodes.shape)
+        >>> residuals = {
+        ...     "me": {
+        ...         "_func": "aggregate",
+        ...         "method": "mean",
+        ...         "field": "topographic__elevation",
+        ...     },
+        ...     "ks": {
+        ...         "_func": "kstest",
+        ...         "field": "topographic__elevation",
+        ...     },
+        ... }
+        >>> residual = Residual(model, data, residuals=residuals)
+        >>> residual.calculate()
+        >>> np.round(residual.values, decimals=3)
+        array([-0.467,  0.125])
+
+        An ensemble of three members, the first of which is the model grid.
+
+        >>> z = np.vstack((z_model, z_model + 0.5, 1.1 * z_model))
+        >>> out = residual.calculate_ensemble({"topographic__elevation": z})
+        >>> out.shape
+        (3, 2)
+        >>> np.round(out, decimals=3)
+        array([[-0.467,  0.125],
+               [ 0.033,  0.078],
+               [ 0.433,  0.125]])
+        """
+        # the ensemble fields are cast once, rather than by each residual.
+        fields = {name: self._cast(vals) for name, vals in fields.items()}
+
+        shapes = set(vals.shape for vals in fields.values())
+        if (len(shapes) != 1) or (
+            shapes.pop()[1:] != (self._data_grid.number_of_nodes,)
+        ):
+            msg = (
+                "umami: All ensemble fields must have the shape (number of "
+                "members, number of nodes)."
+            )
+            raise ValueError(msg)
+
+        for key, info in self._residuals.items():
+            _validate_ensemble(key, info, fields)
+
+        if self._reference is None:
+            self._data_metric.calculate()
+            data_values = self._data_metric._values
+        else:
+            data_values = self._reference._metric_values
+
+        core_nodes = self._data_grid.core_nodes
+        values = self._joint_density_values(
+            lambda field: fields[field][:, core_nodes]
+        )
 
         for key in self._residuals.keys():
             info = deepcopy(self._residuals[key])
             _func = info.pop("_func")
 
-            if key in self._metrics:
+            if key in values:
+                continue
+            elif key in self._metrics:
+                field = info.pop("field")
+                if _func == "mask_aggregation":
+                    nodes = self._model_grid.at_node[info.pop("mask")]
+                else:
+                    nodes = self._data_grid.core_nodes
 
-                resid = (
-                    self._model_metric._values[key]
-                    - self._data_metric._values[key]
-                )
+                vals = fields[field][:, nodes]
+                # the ensemble is in memory, such that it is not chunked.
+                info.pop("chunk_size", None)
+                info.pop("bins", None)
+                info.pop("rank_error", None)
+                if _func == "count_equal":
+                    model_values = _count_equal(vals, **info)
+                else:
+                    model_values = _aggregate_ensemble(vals, **info)
+                values[key] = model_values - data_values[key]
             else:
+                prepare, _ = _PREPARED_FUNCS[_func]
 
-                function = residual_calcs.__dict__[_func]
+                if key not in self._prepared:
+                    self._prepared[key] = prepare(self._data_grid, **info)
 
-                resid = function(self._model_grid, self._data_grid, **info)
+                resid = _ENSEMBLE_FUNCS[_func](
+                    fields, self._data_grid, self._prepared[key], **info
+                )
 
-            if _func != "discretized_misfit":
-                self._values[key] = resid
-            else:
-                # if
-                self._category = resid[0]
-                for label, value in resid[1].items():
-                    self._values[label] = value
+                if _func == "discretized_misfit":
+                    self._category = resid[0]
+                    values.update(resid[1])
+                elif isinstance(resid, OrderedDict):
+                    values.update(resid)
+                else:
+                    values[key] = resid
+
+        return np.column_stack([values[name] for name in self.names])
+
+    def _calculate_residual(self, key, data_values):
+        info = deepcopy(self._residuals[key])
+        _func = info.pop("_func")
+
+        if key in self._metrics:
+            resid = OrderedDict()
+            for label in _metric_names(
+                self._data_grid, key, self._metrics[key]
+            ):
+                resid[label] = (
+                    self._model_metric._values[label] - data_values[label]
+                )
+        else:
+            prepare, function = _PREPARED_FUNCS[_func]
+
+            if key not in self._prepared:
+                self._prepared[key] = prepare(self._data_grid, **info)
+
+            if self._dtype is not None:
+                info["dtype"] = self._dtype
+            if _func in _SCRATCH_FUNCS:
+                info["scratch"] = self._scratch
+            resid = function(
+                self._model_grid, self._data_grid, self._prepared[key], **info
+            )
+        return resid
+
+    def _cast(self, vals):
+        vals = np.asarray(vals)
+        if self._dtype is None:
+            return vals
+        return vals.astype(self._dtype, copy=False)
+
+    def _joint_density_values(self, core_values):
+        # Calculate all joint_density_misfit residuals in one call, such that
+        # the model values of each field are taken and binned only once.
+        keys = []
+        infos = []
+        for key, info in self._residuals.items():
+            if info["_func"] == "joint_density_misfit":
+                info = deepcopy(info)
+                info.pop("_func")
+                if key not in self._prepared:
+                    self._prepared[key] = _prepare_joint_density_misfit(
+                        self._data_grid, dtype=self._dtype, **info
+                    )
+                keys.append(key)
+                infos.append(info)
+
+        prepared = [self._prepared[key] for key in keys]
+        return OrderedDict(
+            zip(keys, _joint_density_misfits(core_values, prepared, infos))
+        )
 
     def write_residuals_to_file(self, path, style, decimals=3):
         """Write residuals to a file.
@@ -357,6 +718,75 @@ class Residual(object):
 
         _write_output(path, stream)
 
+    @property
+    def profile(self):
+        """Profile of the component setup, the metrics, and each residual.
+
+        Profiling is enabled with ``profile=True`` when the ``Residual`` is
+        created. The records are those of ``Metric.profile``, with the steps
+        on the model and data grids prefixed by "model/" and "data/", and
+        one record of kind "residual" for each residual. The record of a
+        residual that is also a metric covers only the difference between
+        the model and data values. Joint density misfits are calculated
+        together and share their time equally.
+
+        Returns
+        -------
+        list of dict or None
+
+        Examples
+        --------
+        >>> from landlab import RasterModelGrid
+        >>> from umami import Residual
+        >>> model = RasterModelGrid((10, 10))
+        >>> z_model = model.add_zeros("node", "topographic__elevation")
+        >>> z_model += model.x_of_node + model.y_of_node
+        >>> data = RasterModelGrid((10, 10))
+        >>> z_data = data.add_zeros("node", "topographic__elevation")
+        >>> z_data += data.x_of_node + 2.0 * data.y_of_node
+        >>> residuals = {
+        ...     "me": {
+        ...         "_func": "aggregate",
+        ...         "method": "mean",
+        ...         "field": "topographic__elevation",
+        ...     },
+        ...     "ks": {
+        ...         "_func": "kstest",
+        ...         "field": "drainage_area",
+        ...     },
+        ... }
+        >>> residual = Residual(
+        ...     model, data, residuals=residuals, profile=True
+        ... )
+        >>> residual.calculate()
+        >>> for record in residual.profile:
+        ...     print(record["name"], record["kind"], record["calls"])
+        data/FlowAccumulator component 1
+        model/FlowAccumulator component 1
+        model/me metric 1
+        data/me metric 1
+        me residual 1
+        ks residual 1
+        """
+        if self._profiler is None:
+            return None
+        return self._profiler.report
+
+    def write_profile_to_file(self, path, style="yaml"):
+        """Write the profile to a file.
+
+        Parameters
+        ----------
+        path :
+        style : str
+            yaml, csv
+        """
+        if self._profiler is None:
+            msg = "umami: Profiling was not enabled for this Residual."
+            raise ValueError(msg)
+
+        _write_output(path, _format_profile(self.profile, style))
+
     @classmethod
     def from_dict(cls, params):
         """Create an umami ``Residual`` from a dictionary.
@@ -366,8 +796,10 @@ class Residual(object):
         params : dict or OrderedDict
             This dict must contain a key *grid*, the values of which will be
             passed to the `Landlab` function ``create_grid`` to create the
-            model grid. It will be convereted to an OrderedDict before residuals
-            are added so as to preserve residual order.
+            model grid. If the values contain a key *raster*, its values are
+            instead passed to ``umami.raster.open_raster``. It will be
+            convereted to an OrderedDict before residuals are added so as to
+            preserve residual order.
 
         Examples
         --------
@@ -452,8 +884,8 @@ class Residual(object):
         ...     np.array([  0.158,   0.67 ,   4.138, -20.   ]),
         ...     decimal=3)
         """
-        model = create_grid(params.pop("model"))
-        data = create_grid(params.pop("data"))
+        model = _create_grid(params.pop("model"))
+        data = _create_grid(params.pop("data"))
 
         return cls(model, data, **params)
 
@@ -535,17 +967,207 @@ class Residual(object):
         params = _read_input(file_like)
         return cls.from_dict(params)
 
+    def _require_components(self, residuals):
+        if self._data_components is not None:
+            self._data_components.require(residuals.values())
+        self._model_components.require(residuals.values())
+
     def _distinguish_metric_from_resid(self):
-        self._metrics = {}
-        for key, info in self._residuals.items():
-            func = info["_func"]
-            if func in metric_calcs.__dict__:
-                self._metrics[key] = info
+        self._metrics = _metrics_in(self._residuals, self._data_grid)
 
     def _validate_residuals(self, residuals):
         """"""
         for key in residuals:
             info = residuals[key]
             _validate_func(key, info, _VALID_FUNCS)
-            _validate_fields(self._data_grid, info)
-            _validate_fields(self._model_grid, info)
+            _validate_fields(self._data_grid, info, _PRODUCED_FIELDS)
+            _validate_fields(self._model_grid, info, _PRODUCED_FIELDS)
+            _validate_outlets(key, info)
+
+
+class DataReference(object):
+    """Create a ``DataReference`` class based on a data Landlab grid.
+
+    A ``DataReference`` calculates everything in a set of residuals that
+    depends only on the data grid: flow routing, the data values of each
+    metric, and the data-derived values (e.g. percentile edges and category
+    labels) used by residual-only calculations. It is calculated once and can
+    then be passed in place of the data grid to create a ``Residual`` for each
+    of many model grids, such that each ``Residual`` only calculates the model
+    side.
+
+    A ``DataReference`` does not hold any Landlab components and can be
+    pickled. The data grid should not be modified once the ``DataReference``
+    is created.
+    """
+
+    _required_fields = ["topographic__elevation"]
+
+    def __init__(
+        self,
+        data,
+        flow_accumulator_kwds=None,
+        chi_finder_kwds=None,
+        residuals=None,
+    ):
+        """
+        Parameters
+        ----------
+        data : Landlab model grid
+        flow_accumulator_kwds : dict
+            Parameters to pass to the Landlab ``FlowAccumulator`` to specify
+            flow direction and accumulation. These are also used for the model
+            grid of each ``Residual`` created from this ``DataReference``.
+        chi_finder_kwds : dict
+            Parameters to pass to the Landlab ``ChiFinder`` to specify optional
+            arguments. These are also used for the model grid of each
+            ``Residual`` created from this ``DataReference``.
+        residuals : dict
+            A dictionary of desired residuals to calculate. See examples for
+            required format.
+
+        Examples
+        --------
+        >>> import pickle
+        >>> import numpy as np
+        >>> from landlab import RasterModelGrid
+        >>> from umami import DataReference, Residual
+        >>> np.random.seed(42)
+        >>> data = RasterModelGrid((10, 10))
+        >>> z_data = data.add_zeros("node", "topographic__elevation")
+        >>> z_data +=  data.x_of_node + data.y_of_node
+        >>> z_data[data.core_nodes] += np.random.random(data.core_nodes.shape)
+        >>> residuals = {
+        ...     "me": {
+        ...         "_func": "aggregate",
+        ...         "method": "mean",
+        ...         "field": "topographic__elevation",
+        ...     },
+        ...     "ks": {
+        ...         "_func": "kstest",
+        ...         "field": "topographic__elevation",
+        ...     },
+        ... }
+        >>> reference = DataReference(data, residuals=residuals)
+
+        The ``DataReference`` can be written to disk and read back with
+        ``pickle``.
+
+        >>> reference = pickle.loads(pickle.dumps(reference))
+
+        Each ``Residual`` created from the ``DataReference`` only calculates
+        the model side.
+
+        >>> model = RasterModelGrid((10, 10))
+        >>> z_model = model.add_zeros("node", "topographic__elevation")
+        >>> z_model += model.x_of_node + model.y_of_node
+        >>> residual = Residual(model, reference)
+        >>> residual.names
+        ['me', 'ks']
+        >>> residual.calculate()
+        >>> np.round(residual.values, decimals=3)
+        array([-0.467,  0.125])
+        """
+        _validate_required_fields(self._required_fields, data)
+
+        self._grid = data
+        self._flow_accumulator_kwds = flow_accumulator_kwds
+        self._chi_finder_kwds = chi_finder_kwds
+
+        # determine which residuals are desired.
+        self._residuals = OrderedDict(residuals or {})
+        for key, info in self._residuals.items():
+            _validate_func(key, info, _VALID_FUNCS)
+            _validate_fields(self._grid, info, _PRODUCED_FIELDS)
+            _validate_outlets(key, info)
+
+        # run FlowAccumulator and ChiFinder if the residuals need them.
+        components = _LandlabComponents(
+            self._grid,
+            flow_accumulator_kwds=flow_accumulator_kwds,
+            chi_finder_kwds=chi_finder_kwds,
+        )
+        components.require(self._residuals.values())
+        metrics = _metrics_in(self._residuals, self._grid)
+
+        # calculate the data values of all metrics.
+        metric = Metric._from_components(self._grid, components, metrics)
+        metric.calculate()
+        self._metric_values = metric._values
+
+        # prepare the data values for all residual-only calculations.
+        self._prepared = {}
+        for key in self._residuals.keys():
+            if key not in metrics:
+                info = deepcopy(self._residuals[key])
+                _func = info.pop("_func")
+                prepare, _ = _PREPARED_FUNCS[_func]
+                self._prepared[key] = prepare(self._grid, **info)
+
+    @classmethod
+    def from_dict(cls, params):
+        """Create an umami ``DataReference`` from a dictionary.
+
+        Parameters
+        ----------
+        params : dict or OrderedDict
+            This dict must contain a key *data*, the values of which will be
+            passed to the `Landlab` function ``create_grid``, or, if they
+            contain a key *raster*, to ``umami.raster.open_raster``, to create
+            the data grid. A key *model*, if present, is ignored such that the
+            same parameters used by ``Residual.from_dict`` can be used.
+
+        Examples
+        --------
+        >>> from umami import DataReference
+        >>> params = {
+        ...     "data": {
+        ...         "RasterModelGrid": [
+        ...             [10, 10],
+        ...             {
+        ...                 "fields": {
+        ...                     "node": {
+        ...                         "topographic__elevation": {
+        ...                             "plane": [
+        ...                                 {"point": [0, 0, 0]},
+        ...                                 {"normal": [-1, -1, 1]},
+        ...                             ]
+        ...                         }
+        ...                     }
+        ...                 }
+        ...             },
+        ...         ]
+        ...     },
+        ...     "residuals": {
+        ...         "me": {
+        ...             "_func": "aggregate",
+        ...             "method": "mean",
+        ...             "field": "topographic__elevation",
+        ...         },
+        ...     },
+        ... }
+        >>> reference = DataReference.from_dict(params)
+        >>> reference._metric_values["me"]
+        9.0
+        """
+        params = OrderedDict(params)
+        params.pop("model", None)
+        data = _create_grid(params.pop("data"))
+        return cls(data, **params)
+
+    @classmethod
+    def from_file(cls, file_like):
+        """Create an umami ``DataReference`` from a file-like object.
+
+        Parameters
+        ----------
+        file_like : file path or StringIO
+            File will be parsed by ``yaml.safe_load`` and converted to an
+            ``OrderedDict``.
+
+        Returns
+        -------
+        umami.DataReference
+        """
+        params = _read_input(file_like)
+        return cls.from_dict(params)
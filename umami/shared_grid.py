@@ -0,0 +1,190 @@
+"""Share the node fields of a Landlab grid between processes."""
+import ctypes
+from collections import OrderedDict
+
+import numpy as np
+
+from landlab import RasterModelGrid
+
+try:
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:  # pragma: no cover
+    # multiprocessing.shared_memory is new in Python 3.8.
+    SharedMemory = None
+
+
+def _attach(name):
+    # Processes that only attach to a block should not remove it when they
+    # exit. Python 3.13 and later support this directly.
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        return SharedMemory(name=name)
+
+
+class _SharedArray(object):
+    # An array interface to a block of shared memory that keeps the block
+    # attached for as long as any array made from it exists.
+    def __init__(self, name, dtype, shape, readonly):
+        self._block = _attach(name)
+
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        self._buffer = (ctypes.c_char * max(nbytes, 1)).from_buffer(
+            self._block.buf
+        )
+        self.__array_interface__ = {
+            "shape": tuple(shape),
+            "typestr": dtype,
+            "data": (ctypes.addressof(self._buffer), readonly),
+            "version": 3,
+        }
+
+    def __del__(self):
+        self._buffer = None
+        self._block.close()
+
+
+class SharedGrid(object):
+    """Node fields of a ``RasterModelGrid`` in shared memory.
+
+    A ``SharedGrid`` copies the node fields and node status of a grid into
+    ``multiprocessing.shared_memory`` blocks once. When it is pickled, for
+    example to be sent to the workers of a process pool, only the names of
+    the blocks are pickled. Each process then gets a grid from
+    ``SharedGrid.grid`` whose node fields are read-only views of the shared
+    memory, such that the fields exist only once no matter how many
+    processes use them.
+
+    The grid can be used as the data grid of a ``Residual`` or
+    ``DataReference``, or with a ``Metric``. Because the shared fields are
+    read-only, fields that are written by flow routing (e.g.
+    *drainage_area*) should not be shared if a ``Metric`` or ``Residual``
+    will route flow on the grid. Use *fields* to share only some fields.
+
+    The process that creates the ``SharedGrid`` owns the shared memory and
+    must call ``SharedGrid.close`` (or use it as a context manager) once all
+    other processes are done with it.
+
+    Examples
+    --------
+    >>> import pickle
+    >>> import numpy as np
+    >>> from landlab import RasterModelGrid
+    >>> from umami import Metric
+    >>> from umami.shared_grid import SharedGrid
+    >>> grid = RasterModelGrid((10, 10))
+    >>> z = grid.add_zeros("node", "topographic__elevation")
+    >>> z += grid.x_of_node + grid.y_of_node
+    >>> metrics = {
+    ...     "me": {
+    ...         "_func": "aggregate",
+    ...         "method": "mean",
+    ...         "field": "topographic__elevation",
+    ...     },
+    ... }
+    >>> shared = SharedGrid(grid)
+
+    Pickling and unpickling the ``SharedGrid``, as is done when it is sent
+    to another process, attaches to the same shared memory.
+
+    >>> attached = pickle.loads(pickle.dumps(shared))
+    >>> view = attached.grid
+    >>> view.at_node["topographic__elevation"].flags.writeable
+    False
+    >>> metric = Metric(view, metrics=metrics)
+    >>> metric.calculate()
+    >>> metric.values
+    [9.0]
+    >>> attached.close()
+    >>> shared.close()
+    """
+
+    def __init__(self, grid, fields=None):
+        """
+        Parameters
+        ----------
+        grid : Landlab RasterModelGrid
+        fields : list of str, optional
+            Names of the node fields to share. Defaults to all node fields.
+        """
+        if SharedMemory is None:
+            msg = "umami: A SharedGrid requires Python 3.8 or later."
+            raise ImportError(msg)
+        if not isinstance(grid, RasterModelGrid):
+            msg = "umami: Only a RasterModelGrid can be shared."
+            raise ValueError(msg)
+
+        if fields is None:
+            fields = list(grid.at_node)
+
+        self._spec = {
+            "shape": tuple(grid.shape),
+            "xy_spacing": (grid.dx, grid.dy),
+            "xy_of_lower_left": tuple(grid.xy_of_lower_left),
+        }
+
+        arrays = [("status_at_node", grid.status_at_node)]
+        arrays.extend((name, grid.at_node[name]) for name in fields)
+
+        self._layout = []
+        self._blocks = OrderedDict()
+        for name, array in arrays:
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            view[...] = array
+            del view
+
+            self._blocks[name] = block
+            self._layout.append(
+                (name, block.name, array.dtype.str, array.shape)
+            )
+
+        self._grid = None
+
+    def __getstate__(self):
+        return {"spec": self._spec, "layout": self._layout}
+
+    def __setstate__(self, state):
+        self._spec = state["spec"]
+        self._layout = state["layout"]
+        self._blocks = OrderedDict()
+        self._grid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def grid(self):
+        """A grid with read-only views of the shared node fields."""
+        if self._grid is None:
+            grid = RasterModelGrid(
+                self._spec["shape"],
+                xy_spacing=self._spec["xy_spacing"],
+                xy_of_lower_left=self._spec["xy_of_lower_left"],
+            )
+            for name, block_name, dtype, shape in self._layout:
+                view = np.asarray(
+                    _SharedArray(block_name, dtype, shape, readonly=True)
+                )
+                if name == "status_at_node":
+                    grid.status_at_node = view.copy()
+                else:
+                    grid.add_field(name, view, at="node", copy=False)
+            self._grid = grid
+        return self._grid
+
+    def close(self):
+        """Release the shared memory.
+
+        If this process created the ``SharedGrid``, the shared memory is
+        released once all processes are done with the grids returned by
+        ``SharedGrid.grid``. No new grids can be created afterwards.
+        """
+        self._grid = None
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks = OrderedDict()
@@ -0,0 +1,237 @@
+"""Evaluate residuals for many model grids with a pool of processes."""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from os import cpu_count
+from sys import version_info
+
+from landlab import create_grid
+from umami.residual import DataReference, Residual
+
+# The DataReference used by each worker process. It is set once per process
+# by _initialize_worker such that it is not pickled with every job. If the
+# data grid is shared, the SharedGrid is kept with it.
+_WORKER_REFERENCE = None
+_WORKER_SHARED_GRID = None
+
+# ProcessPoolExecutor takes an initializer from Python 3.7 on. On older
+# versions the DataReference is instead pickled with every job.
+_HAS_INITIALIZER = version_info >= (3, 7)
+
+
+def _initialize_worker(reference, shared=None):
+    global _WORKER_REFERENCE, _WORKER_SHARED_GRID
+    if shared is not None:
+        reference._grid = shared.grid
+    _WORKER_REFERENCE = reference
+    _WORKER_SHARED_GRID = shared
+
+
+def _evaluate(job, model_function, worker_args=None):
+    if worker_args is not None:
+        _initialize_worker(*worker_args)
+
+    model = job if model_function is None else model_function(job)
+    if isinstance(model, dict):
+        model = create_grid(model)
+
+    residual = Residual(model, _WORKER_REFERENCE)
+    residual.calculate()
+    return residual.values
+
+
+def evaluate_many(
+    models,
+    data,
+    flow_accumulator_kwds=None,
+    chi_finder_kwds=None,
+    residuals=None,
+    model_function=None,
+    max_workers=None,
+    progress=None,
+    errors="raise",
+    share_data=False,
+):
+    """Calculate residuals for many model grids in parallel.
+
+    Each model grid is evaluated against the same data in a separate process
+    of a ``concurrent.futures.ProcessPoolExecutor``. Everything that depends
+    only on the data is calculated once, as an ``umami.DataReference``, and
+    sent to each worker process once when it starts (with each job on Python
+    3.6).
+
+    Results are yielded in the order of *models* as they become available.
+    At most twice *max_workers* jobs are submitted ahead of the result that
+    is yielded next, such that *models* may be a long or lazy iterable.
+
+    Parameters
+    ----------
+    models : iterable
+        Jobs to evaluate. If *model_function* is not provided, each job is a
+        Landlab model grid or a dictionary that is passed to the `Landlab`
+        function ``create_grid``.
+    data : Landlab model grid or umami.DataReference
+        If a ``DataReference`` is provided, *flow_accumulator_kwds*,
+        *chi_finder_kwds*, and *residuals* must not be provided.
+    flow_accumulator_kwds : dict
+        Parameters to pass to the Landlab ``FlowAccumulator`` to specify
+        flow direction and accumulation.
+    chi_finder_kwds : dict
+        Parameters to pass to the Landlab ``ChiFinder`` to specify optional
+        arguments.
+    residuals : dict
+        A dictionary of desired residuals to calculate. See ``Residual`` for
+        the required format.
+    model_function : callable, optional
+        A function that is called in the worker process with each job and
+        returns the model grid (or a dictionary for ``create_grid``), for
+        example to run a model for each point of a parameter sweep. It must
+        be defined at the top level of a module so that it can be pickled.
+    max_workers : int, optional
+        The number of worker processes. Defaults to the number of CPUs.
+    progress : callable, optional
+        Called as ``progress(n_done)`` each time a job is done, in the order
+        in which jobs finish. It is called from the thread of the process
+        pool that collects results, not from the thread that iterates over
+        ``evaluate_many``, so it should return quickly and must be safe to
+        call from another thread.
+    errors : str
+        If "raise", an error in any job is raised once its result is reached
+        and no further jobs are started. If "return", the exception is
+        yielded in place of the residual values of the job and the other jobs
+        are not affected.
+    share_data : bool
+        If True, the node fields of the data grid are placed in shared memory
+        with ``umami.shared_grid.SharedGrid`` instead of being copied to each
+        worker process. Requires Python 3.8 or later.
+
+    Yields
+    ------
+    values : list
+        Residual values of each job in the order of ``Residual.names``.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from landlab import RasterModelGrid
+    >>> from umami import evaluate_many
+    >>> np.random.seed(42)
+    >>> data = RasterModelGrid((10, 10))
+    >>> z_data = data.add_zeros("node", "topographic__elevation")
+    >>> z_data +=  data.x_of_node + data.y_of_node
+    >>> z_data[data.core_nodes] += np.random.random(data.core_nodes.shape)
+    >>> residuals = {
+    ...     "me": {
+    ...         "_func": "aggregate",
+    ...         "method": "mean",
+    ...         "field": "topographic__elevation",
+    ...     },
+    ... }
+    >>> models = []
+    >>> for offset in [0.0, 1.0, 2.0]:
+    ...     model = RasterModelGrid((10, 10))
+    ...     z_model = model.add_zeros("node", "topographic__elevation")
+    ...     z_model += model.x_of_node + model.y_of_node + offset
+    ...     models.append(model)
+    >>> for values in evaluate_many(
+    ...     models, data, residuals=residuals, max_workers=2
+    ... ):
+    ...     print(np.round(values, decimals=3))
+    [-0.467]
+    [ 0.533]
+    [ 1.533]
+    """
+    if errors not in ("raise", "return"):
+        msg = "umami: errors must be one of raise or return."
+        raise ValueError(msg)
+
+    if isinstance(data, DataReference):
+        if (
+            (residuals is not None)
+            or (flow_accumulator_kwds is not None)
+            or (chi_finder_kwds is not None)
+        ):
+            msg = (
+                "umami: When a DataReference is provided, residuals and "
+                "component keywords are taken from the DataReference."
+            )
+            raise ValueError(msg)
+        reference = data
+    else:
+        reference = DataReference(
+            data,
+            flow_accumulator_kwds=flow_accumulator_kwds,
+            chi_finder_kwds=chi_finder_kwds,
+            residuals=residuals,
+        )
+
+    max_workers = max_workers or cpu_count() or 1
+    jobs = iter(models)
+    done = []
+
+    def _done(future):
+        if future.cancelled():
+            return
+        done.append(future)
+        if progress is not None:
+            progress(len(done))
+
+    shared = None
+    if share_data:
+        from umami.shared_grid import SharedGrid
+
+        shared = SharedGrid(reference._grid)
+        reference = copy(reference)
+        reference._grid = None
+
+    try:
+        yield from _evaluate_in_pool(
+            jobs, reference, shared, model_function, max_workers, errors, _done
+        )
+    finally:
+        if shared is not None:
+            shared.close()
+
+
+def _evaluate_in_pool(
+    jobs, reference, shared, model_function, max_workers, errors, done
+):
+    if _HAS_INITIALIZER:
+        pool_kwds = {
+            "initializer": _initialize_worker,
+            "initargs": (reference, shared),
+        }
+        worker_args = None
+    else:
+        pool_kwds = {}
+        worker_args = (reference, shared)
+
+    with ProcessPoolExecutor(max_workers=max_workers, **pool_kwds) as executor:
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < 2 * max_workers:
+                    try:
+                        job = next(jobs)
+                    except StopIteration:
+                        break
+                    future = executor.submit(
+                        _evaluate, job, model_function, worker_args
+                    )
+                    future.add_done_callback(done)
+                    pending.append(future)
+
+                if not pending:
+                    break
+
+                future = pending.popleft()
+                error = future.exception()
+                if error is None:
+                    yield future.result()
+                elif errors == "return":
+                    yield error
+                else:
+                    raise error
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,255 @@
+from collections import namedtuple
+
+import numpy as np
+
+from umami.utils.sketch import _QuantileSketch
+
+# Number of bins of the histogram from which percentiles are estimated.
+_DEFAULT_BINS = 65536
+
+# Number of nodes per chunk of approximate percentiles if no chunk size is
+# given.
+_DEFAULT_CHUNK_SIZE = 2 ** 20
+
+# The options of a chunked aggregation: the number of nodes per chunk, the
+# number of histogram bins, and the rank error of approximate percentiles.
+_Chunks = namedtuple("_Chunks", ["size", "bins", "rank_error"])
+
+_CHUNKED_METHODS = (
+    "amax",
+    "amin",
+    "count",
+    "max",
+    "mean",
+    "median",
+    "min",
+    "percentile",
+    "std",
+    "sum",
+    "var",
+)
+
+# Keyword arguments of the methods that chunked aggregation supports.
+_CHUNKED_KWDS = {"percentile": ("q",), "std": ("ddof",), "var": ("ddof",)}
+
+
+def _validate_chunked(method, kwds):
+    """Check that chunked aggregation supports a method and its arguments.
+
+    Examples
+    --------
+    >>> from umami.utils.chunked import _validate_chunked
+    >>> _validate_chunked("percentile", {"q": 10})
+    >>> _validate_chunked("percentile", {"q": 10, "interpolation": "lower"})
+    Traceback (most recent call last):
+    ...
+    ValueError: umami: interpolation is not supported by chunked aggregation.
+    """
+    if method not in _CHUNKED_METHODS:
+        msg = (
+            "umami: {method} is not supported by chunked aggregation. "
+            "Supported methods are {methods}."
+        ).format(method=method, methods=", ".join(_CHUNKED_METHODS))
+        raise ValueError(msg)
+
+    if (method == "percentile") and ("q" not in kwds):
+        raise ValueError("umami: percentile requires q.")
+
+    for kwd in kwds:
+        if kwd not in _CHUNKED_KWDS.get(method, ()):
+            msg = (
+                "umami: {kwd} is not supported by chunked aggregation."
+            ).format(kwd=kwd)
+            raise ValueError(msg)
+
+
+def _core_chunks(grid, field, chunk_size):
+    """Iterate over the values of a field at the core nodes in chunks.
+
+    Nodes are read in blocks of *chunk_size*, in order, such that a field
+    that is mapped from a file is only read one block at a time.
+
+    Examples
+    --------
+    >>> from landlab import RasterModelGrid
+    >>> from umami.utils.chunked import _core_chunks
+    >>> grid = RasterModelGrid((4, 5))
+    >>> z = grid.add_field("node", "z", grid.x_of_node)
+    >>> [list(vals) for vals in _core_chunks(grid, "z", 8)]
+    [[1.0, 2.0], [3.0, 1.0, 2.0, 3.0], []]
+    """
+    if chunk_size < 1:
+        msg = "umami: chunk_size must be a positive integer."
+        raise ValueError(msg)
+
+    values = grid.at_node[field]
+    status = grid.status_at_node
+    for start in range(0, grid.number_of_nodes, chunk_size):
+        stop = start + chunk_size
+        core = status[start:stop] == grid.BC_NODE_IS_CORE
+        yield values[start:stop][core]
+
+
+class _ChunkedStatistics(object):
+    """Statistics of the core-node values of a field, calculated in chunks.
+
+    The count, sum, minimum, maximum, mean and sum of squared deviations of
+    each chunk are merged with those of the previous chunks, the latter two
+    with the parallel algorithm of Chan et al., such that the variance is
+    accurate even if the mean is large. Percentiles are interpolated in a
+    histogram of *bins* bins between the minimum and maximum, which is
+    counted in a second pass over the chunks once it is first needed. Their
+    error is less than the width of a bin. If *rank_error* is provided,
+    percentiles are instead estimated from a quantile sketch that is built
+    in the first pass, with a rank error of about *rank_error*.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from landlab import RasterModelGrid
+    >>> from umami.utils.chunked import _ChunkedStatistics
+    >>> grid = RasterModelGrid((10, 10))
+    >>> z = grid.add_field("node", "z", grid.x_of_node + grid.y_of_node)
+    >>> stats = _ChunkedStatistics(grid, "z", 7)
+    >>> stats.aggregate("mean")
+    9.0
+    >>> stats.aggregate("count")
+    64
+    >>> np.round(stats.aggregate("std"), 6) == np.round(
+    ...     np.std(z[grid.core_nodes]), 6
+    ... )
+    True
+    >>> np.round(stats.aggregate("percentile", q=10), 3)
+    5.0
+    >>> stats = _ChunkedStatistics(grid, "z", 7, rank_error=0.001)
+    >>> stats.aggregate("percentile", q=10)
+    5.0
+    """
+
+    def __init__(
+        self, grid, field, chunk_size, bins=_DEFAULT_BINS, rank_error=None
+    ):
+        self._grid = grid
+        self._field = field
+        self._chunk_size = int(chunk_size)
+        self._bins = int(bins)
+        self._histogram = None
+        if rank_error is None:
+            self.sketch = None
+        else:
+            self.sketch = _QuantileSketch(rank_error)
+
+        self.count = 0
+        self.sum = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        for vals in _core_chunks(grid, field, self._chunk_size):
+            self._merge(vals)
+
+    def _merge(self, vals):
+        n = vals.size
+        if n == 0:
+            return
+
+        mean = vals.mean(dtype=np.float64)
+        deviation = vals - mean
+        m2 = np.dot(deviation, deviation)
+
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+        self.sum += vals.sum(dtype=np.float64)
+        # np.minimum and np.maximum propagate nan, as np.min and np.max do.
+        self.min = np.minimum(self.min, vals.min())
+        self.max = np.maximum(self.max, vals.max())
+
+        if self.sketch is not None:
+            self.sketch.update(vals)
+
+    def aggregate(self, method, **kwds):
+        """Get the aggregate value calculated by a numpy method."""
+        _validate_chunked(method, kwds)
+
+        if method == "count":
+            return self.count
+        if self.count == 0:
+            msg = "umami: There are no core node values to aggregate."
+            raise ValueError(msg)
+
+        if method == "sum":
+            return float(self.sum)
+        elif method == "mean":
+            return float(self.mean)
+        elif method in ("min", "amin"):
+            return float(self.min)
+        elif method in ("max", "amax"):
+            return float(self.max)
+        elif method in ("std", "var"):
+            var = self.m2 / (self.count - kwds.get("ddof", 0))
+            return float(np.sqrt(var) if method == "std" else var)
+        elif method == "median":
+            return self.percentile(50)
+        else:
+            return self.percentile(kwds["q"])
+
+    def percentile(self, q):
+        """Estimate a percentile from the histogram of the values.
+
+        As with ``np.percentile``, the percentile is linearly interpolated
+        between the values of the two closest ranks.
+        """
+        if not np.isscalar(q):
+            msg = "umami: Aggregation did not yield a scalar."
+            raise ValueError(msg)
+        if not 0 <= q <= 100:
+            msg = "umami: Percentiles must be in the range [0, 100]."
+            raise ValueError(msg)
+        if np.isnan(self.min) or np.isnan(self.max):
+            return np.nan
+        if self.sketch is not None:
+            return float(self.sketch.percentiles(q))
+
+        rank = (self.count - 1) * q / 100.0
+        below = int(np.floor(rank))
+        above = min(below + 1, self.count - 1)
+        lower = self._value_at_rank(below)
+        upper = self._value_at_rank(above)
+        return float(lower + (rank - below) * (upper - lower))
+
+    def _value_at_rank(self, rank):
+        # the values of a bin are assumed to be evenly spread within it.
+        if (rank == 0) or (self.min == self.max):
+            return self.min
+        elif rank == self.count - 1:
+            return self.max
+
+        counts = self._count_histogram()
+        cumulative = np.cumsum(counts)
+        index = int(np.searchsorted(cumulative, rank, side="right"))
+        before = cumulative[index] - counts[index]
+        width = (self.max - self.min) / self._bins
+        fraction = (rank - before + 0.5) / counts[index]
+        return self.min + width * (index + fraction)
+
+    def _count_histogram(self):
+        if self._histogram is None:
+            counts = np.zeros(self._bins, dtype=np.int64)
+            scale = self._bins / (self.max - self.min)
+            for vals in _core_chunks(
+                self._grid, self._field, self._chunk_size
+            ):
+                index = ((vals - self.min) * scale).astype(np.intp)
+                np.clip(index, 0, self._bins - 1, out=index)
+                counts += np.bincount(index, minlength=self._bins)
+            self._histogram = counts
+        return self._histogram
+
+
+def _chunked_aggregate(stats, method, **kwds):
+    # aggregate the statistics of a field calculated in chunks.
+    return stats.aggregate(method, **kwds)
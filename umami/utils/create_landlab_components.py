@@ -1,21 +1,220 @@
-from landlab.components import ChiFinder, FlowAccumulator
+from collections import OrderedDict
+
+from landlab.components import (
+    ChiFinder,
+    DepressionFinderAndRouter,
+    FlowAccumulator,
+    FlowDirectorD8,
+    FlowDirectorDINF,
+    FlowDirectorMFD,
+    FlowDirectorSteepest,
+)
 from landlab.utils.flow__distance import calculate_flow__distance
+from umami.utils.fingerprint import _Versions
+from umami.utils.profile import _measure
+from umami.utils.validate import _validate_fields
+
+# Fields written by each component step, in the order in which the steps
+# are run. Flow routing may use any flow director and depression finder.
+_COMPONENT_FIELDS = OrderedDict(
+    [
+        (
+            "FlowAccumulator",
+            frozenset(
+                FlowAccumulator.output_var_names
+                + FlowDirectorSteepest.output_var_names
+                + FlowDirectorD8.output_var_names
+                + FlowDirectorMFD.output_var_names
+                + FlowDirectorDINF.output_var_names
+                + DepressionFinderAndRouter.output_var_names
+                + ("water__unit_flux_in",)
+            ),
+        ),
+        ("ChiFinder", frozenset(ChiFinder.output_var_names)),
+        ("flow__distance", frozenset(["flow__distance"])),
+    ]
+)
+_PRODUCED_FIELDS = frozenset().union(*_COMPONENT_FIELDS.values())
+
+# Calculations that use a component directly rather than through a field.
+_COMPONENT_FUNCS = {
+    "chi_gradient": "ChiFinder",
+    "chi_intercept": "ChiFinder",
+    "hypsometric_integral": "FlowAccumulator",
+    "kstest_watershed": "FlowAccumulator",
+    "watershed_aggregation": "FlowAccumulator",
+}
+
+_field_locs = ["field", "field_1", "field_2", "misfit_field", "mask"]
+
+
+def _required_components(infos):
+    """Get the component steps needed by a set of calculations.
+
+    Chi and flow distance are calculated from the flow routing, such that
+    flow is routed if any step is needed.
+    """
+    steps = set()
+    for info in infos:
+        if info["_func"] in _COMPONENT_FUNCS:
+            steps.add(_COMPONENT_FUNCS[info["_func"]])
+        for fl in _field_locs:
+            for step, fields in _COMPONENT_FIELDS.items():
+                if info.get(fl) in fields:
+                    steps.add(step)
+
+    if steps:
+        steps.add("FlowAccumulator")
+    return steps
+
+
+class _LandlabComponents(object):
+    """The Landlab components of a grid, run only once they are needed.
+
+    If *flow_accumulator* and *chi_finder* are provided, they are assumed to
+    have been run already. Each time flow is routed, ``version`` is
+    incremented. ``versions`` tracks changes to the fields of the grid, such
+    as *topographic__elevation*, by exact comparison.
+    """
+
+    def __init__(
+        self,
+        grid,
+        flow_accumulator_kwds=None,
+        chi_finder_kwds=None,
+        flow_accumulator=None,
+        chi_finder=None,
+        profiler=None,
+    ):
+        self._grid = grid
+        self._flow_accumulator_kwds = flow_accumulator_kwds or {}
+        self._chi_finder_kwds = chi_finder_kwds or {}
+        self.profiler = profiler
+
+        self.flow_accumulator = flow_accumulator
+        self.chi_finder = chi_finder
+        self.version = 0
+        self.versions = _Versions()
+        self._done = set()
+        self._elevation = None
+        if (flow_accumulator is not None) or (chi_finder is not None):
+            _validate_components(grid, flow_accumulator, chi_finder)
+            self._done.update(["FlowAccumulator", "ChiFinder"])
+            self._elevation = self._elevation_version()
+
+    def require(self, infos):
+        """Run the components needed by calculations that were not run yet.
+
+        Fields used by the calculations are validated again once the
+        components have run.
+        """
+        infos = list(infos)
+        self.run(_required_components(infos))
+
+        for info in infos:
+            _validate_fields(self._grid, info)
+
+    def run(self, steps):
+        """Run component steps, in order, unless they were run already."""
+        for step in _COMPONENT_FIELDS:
+            if (step in steps) and (step not in self._done):
+                self._run(step)
+                self._done.add(step)
+
+    def update(self, elevation=None, force=False):
+        """Run all steps that were run before again if the elevation changed.
+
+        Parameters
+        ----------
+        elevation : int, optional
+            The version of *topographic__elevation* in ``versions``, if it
+            is known.
+        force : bool, optional
+            If True, run the steps again even if the elevation is unchanged.
+
+        Returns
+        -------
+        bool
+            True if the steps were run again.
+        """
+        if not self._done:
+            return False
+        if not force:
+            if elevation is None:
+                elevation = self._elevation_version()
+            if elevation == self._elevation:
+                return False
+
+        for step in _COMPONENT_FIELDS:
+            if step in self._done:
+                self._run(step)
+        return True
+
+    def _elevation_version(self):
+        return self.versions.version(
+            "topographic__elevation",
+            self._grid.at_node["topographic__elevation"],
+        )
+
+    def _run(self, step):
+        with _measure(self.profiler, step, "component"):
+            self._run_step(step)
+
+        if step == "FlowAccumulator":
+            self.version += 1
+            self._elevation = self._elevation_version()
+
+    def _run_step(self, step):
+        # components are created once and then run again in place.
+        if step == "FlowAccumulator":
+            if self.flow_accumulator is None:
+                self.flow_accumulator = FlowAccumulator(
+                    self._grid, **self._flow_accumulator_kwds
+                )
+            self.flow_accumulator.run_one_step()
+        elif step == "ChiFinder":
+            if self.chi_finder is None:
+                self.chi_finder = ChiFinder(
+                    self._grid, clobber=True, **self._chi_finder_kwds
+                )
+            self.chi_finder.calculate_chi()
+        else:
+            distance = calculate_flow__distance(self._grid)
+            at_node = self._grid.at_node
+            if ("flow__distance" in at_node) and (
+                at_node["flow__distance"].flags.writeable
+            ):
+                at_node["flow__distance"][:] = distance
+            else:
+                self._grid.add_field(
+                    "flow__distance", distance, at="node", clobber=True
+                )
 
 
 def _create_landlab_components(
-    grid, chi_finder_kwds=None, flow_accumulator_kwds=None
+    grid, chi_finder_kwds=None, flow_accumulator_kwds=None, profiler=None
 ):
-    # run FlowAccumulator
-    kwds = flow_accumulator_kwds or {}
-    fa = FlowAccumulator(grid, **kwds)
-    fa.run_one_step()
+    # run FlowAccumulator, ChiFinder, and distance upstream.
+    components = _LandlabComponents(
+        grid,
+        flow_accumulator_kwds=flow_accumulator_kwds,
+        chi_finder_kwds=chi_finder_kwds,
+        profiler=profiler,
+    )
+    components.run(_COMPONENT_FIELDS)
+    return components.flow_accumulator, components.chi_finder
+
 
-    # Run ChiFinder
-    kwds = chi_finder_kwds or {}
-    cf = ChiFinder(grid, clobber=True, **kwds)
-    cf.calculate_chi()
+def _validate_components(grid, flow_accumulator, chi_finder):
+    if not isinstance(flow_accumulator, FlowAccumulator):
+        msg = "umami: A valid instance of a FlowAccumulator is required."
+        raise ValueError(msg)
 
-    # run distance upstream.
-    _ = calculate_flow__distance(grid, add_to_grid=True, clobber=True)
+    if not isinstance(chi_finder, ChiFinder):
+        msg = "umami: A valid instance of a ChiFinder is required."
+        raise ValueError(msg)
 
-    return fa, cf
+    for component in (flow_accumulator, chi_finder):
+        if component.grid is not grid:
+            msg = "umami: Components must be created on the same grid."
+            raise ValueError(msg)
@@ -1,6 +1,8 @@
 from collections import OrderedDict
+from contextlib import contextmanager
 from io import StringIO
 
+import numpy as np
 import yaml
 
 
@@ -20,3 +22,104 @@ def _write_output(out, stream):
     else:
         with open(out, "w") as f:
             f.write(stream)
+
+
+@contextmanager
+def _open_output(out):
+    # a file-like object is written to as is, a path is opened for writing.
+    if hasattr(out, "write"):
+        yield out
+    else:
+        with open(out, "w") as f:
+            yield f
+
+
+def _import_xarray():
+    try:
+        import xarray
+    except ImportError:  # pragma: no cover
+        msg = "umami: xarray is required to read time slices from NetCDF."
+        raise ImportError(msg)
+    return xarray
+
+
+def _time_slices(source, fields, time_dim=None):
+    """Iterate over the time slices of a dataset or of NetCDF files.
+
+    Parameters
+    ----------
+    source : xarray.Dataset, str, or list of str
+        A dataset, or the path or paths of NetCDF files that are opened one
+        at a time.
+    fields : list of str
+        Names of the variables to read.
+    time_dim : str, optional
+        Name of the time dimension. By default "time" or "nt", as written by
+        Landlab, or else the first dimension of three-dimensional variables.
+        Variables without a time dimension are a single slice.
+
+    Yields
+    ------
+    time, values
+        The time of the slice, or its index if the dataset has no time
+        variable, and a dictionary of the flattened values of each field.
+        Only one slice is read into memory at a time.
+    """
+    if isinstance(source, str):
+        source = [source]
+
+    if isinstance(source, (list, tuple)):
+        xarray = _import_xarray()
+        index = 0
+        for path in source:
+            with xarray.open_dataset(path) as dataset:
+                for time, values in _dataset_slices(
+                    dataset, fields, time_dim, index
+                ):
+                    yield time, values
+                    index += 1
+    else:
+        for time, values in _dataset_slices(source, fields, time_dim, 0):
+            yield time, values
+
+
+def _dataset_slices(dataset, fields, time_dim, index):
+    for field in fields:
+        if field not in dataset.variables:
+            msg = "umami: The field {field} is not in the dataset.".format(
+                field=field
+            )
+            raise ValueError(msg)
+
+    dims = dataset[fields[0]].dims
+    if time_dim is None:
+        if "time" in dims:
+            time_dim = "time"
+        elif "nt" in dims:
+            time_dim = "nt"
+        elif len(dims) == 3:
+            time_dim = dims[0]
+
+    if time_dim is None:
+        values = {
+            field: np.asarray(dataset[field].values).reshape(-1)
+            for field in fields
+        }
+        yield index, values
+        return
+
+    times = None
+    for name in (time_dim, "time", "t"):
+        if (name in dataset.variables) and (dataset[name].dims == (time_dim,)):
+            times = dataset[name].values
+            break
+
+    for i in range(dataset.sizes[time_dim]):
+        values = {}
+        for field in fields:
+            var = dataset[field]
+            if time_dim in var.dims:
+                var = var.isel({time_dim: i})
+            values[field] = np.asarray(var.values).reshape(-1)
+        time = index + i if times is None else times[i].item()
+        yield time, values
@@ -0,0 +1,101 @@
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+from time import perf_counter
+
+import yaml
+
+_PROFILE_COLUMNS = ["name", "kind", "calls", "time", "peak_memory"]
+
+
+class _Profiler(object):
+    """Record wall time, call count, and peak allocation of named steps.
+
+    Profilers created with ``child`` share their records with the parent and
+    prefix the names of their steps, e.g. "model/FlowAccumulator".
+    """
+
+    def __init__(self, records=None, prefix=""):
+        self._records = OrderedDict() if records is None else records
+        self._prefix = prefix
+
+    def child(self, prefix):
+        return _Profiler(self._records, self._prefix + prefix + "/")
+
+    @contextmanager
+    def measure(self, names, kind):
+        # names may be a list of steps calculated together, in which case
+        # the time is split evenly between them.
+        if isinstance(names, str):
+            names = [names]
+
+        # peak allocation is measured with tracemalloc, which is only
+        # tracing while a step is measured unless it was started elsewhere.
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        elif hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            if started:
+                tracemalloc.stop()
+
+            for name in names:
+                self._add(name, kind, elapsed / len(names), peak)
+
+    def _add(self, name, kind, elapsed, peak):
+        name = self._prefix + name
+        if name not in self._records:
+            self._records[name] = {
+                "kind": kind,
+                "calls": 0,
+                "time": 0.0,
+                "peak_memory": 0,
+            }
+        record = self._records[name]
+        record["calls"] += 1
+        record["time"] += elapsed
+        record["peak_memory"] = max(record["peak_memory"], int(peak))
+
+    @property
+    def report(self):
+        return [
+            OrderedDict(
+                [("name", name)]
+                + [(key, record[key]) for key in _PROFILE_COLUMNS[1:]]
+            )
+            for name, record in self._records.items()
+        ]
+
+
+@contextmanager
+def _measure(profiler, names, kind):
+    # measure a step if profiling is enabled.
+    if profiler is None:
+        yield
+    else:
+        with profiler.measure(names, kind):
+            yield
+
+
+def _format_profile(report, style):
+    if style == "yaml":
+        return yaml.safe_dump(
+            [dict(record) for record in report], sort_keys=False
+        )
+    elif style == "csv":
+        lines = [",".join(_PROFILE_COLUMNS)]
+        for record in report:
+            lines.append(
+                ",".join(str(record[key]) for key in _PROFILE_COLUMNS)
+            )
+        return "\n".join(lines)
+    else:
+        msg = "umami: The profile style must be one of yaml or csv."
+        raise ValueError(msg)
@@ -0,0 +1,94 @@
+import numpy as np
+
+
+class _Scratch(object):
+    """Buffers that are reused each time a calculation is done.
+
+    A buffer is identified by a name and a type. It is only allocated again
+    if a larger buffer is needed, such that calculations that are repeated
+    on a grid allocate no arrays proportional to the size of the grid.
+
+    Examples
+    --------
+    >>> from umami.utils.scratch import _Scratch
+    >>> scratch = _Scratch()
+    >>> a = scratch.empty("difference", 10, float)
+    >>> b = scratch.empty("difference", 5, float)
+    >>> a.shape, b.shape
+    ((10,), (5,))
+    >>> b.base is a.base
+    True
+    >>> scratch.nbytes
+    80
+    """
+
+    def __init__(self):
+        self._buffers = {}
+
+    @property
+    def nbytes(self):
+        """Number of bytes held by the buffers."""
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def empty(self, name, size, dtype):
+        """Get an uninitialized one-dimensional buffer of *size* values."""
+        key = (name, np.dtype(dtype))
+        buffer = self._buffers.get(key)
+        if (buffer is None) or (buffer.size < size):
+            buffer = self._buffers[key] = np.empty(size, dtype=dtype)
+        return buffer[:size]
+
+
+def _empty(scratch, name, size, dtype):
+    # a buffer of scratch, or a new array if there is no scratch.
+    if scratch is None:
+        return np.empty(size, dtype=dtype)
+    return scratch.empty(name, size, dtype)
+
+
+def _take(values, nodes, scratch, name, dtype=None, trusted=False):
+    """Get values at nodes, given by index or boolean mask, into a buffer.
+
+    Values are cast to *dtype* as they are copied, without a temporary copy
+    in their own type unless they are cast to another kind of type. If
+    *trusted* is True, *nodes* are node ids that umami identified itself,
+    e.g. core nodes, and they are taken without a temporary copy. Otherwise
+    they are indexed as ``values[nodes]`` would be.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from umami.utils.scratch import _Scratch, _take
+    >>> values = np.arange(5.0)
+    >>> _take(values, np.array([1, 3]), _Scratch(), "vals", trusted=True)
+    array([ 1.,  3.])
+    >>> _take(values, values > 2, None, "vals", dtype=np.float32)
+    array([ 3.,  4.], dtype=float32)
+    >>> _take(values, np.array([-1, 2]), None, "vals")
+    array([ 4.,  2.])
+    """
+    dtype = values.dtype if dtype is None else np.dtype(dtype)
+    if nodes.dtype == bool:
+        out = _empty(scratch, name, np.count_nonzero(nodes), dtype)
+    else:
+        out = _empty(scratch, name, nodes.size, dtype)
+
+    if values.dtype.kind != dtype.kind:
+        # e.g. integer values into a floating point buffer.
+        out[:] = values[nodes]
+    elif nodes.dtype == bool:
+        np.compress(nodes, values, out=out)
+    elif not trusted:
+        # negative ids wrap and ids out of range raise, as with indexing.
+        np.take(values, nodes, out=out)
+    else:
+        if (scratch is not None) and (not nodes.flags.writeable):
+            # np.take copies indices that are read only, such as the core
+            # nodes of a grid, unless they are copied to a buffer first.
+            index = scratch.empty((name, "nodes"), nodes.size, nodes.dtype)
+            index[:] = nodes
+            nodes = index
+        # with mode="clip" the values are not buffered in a temporary copy,
+        # which is only safe for ids that are known to be in range.
+        np.take(values, nodes, out=out, mode="clip")
+    return out
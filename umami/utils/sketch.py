@@ -0,0 +1,167 @@
+import numpy as np
+
+# Ratio of the capacities of successive levels of the sketch.
+_DECAY = 2.0 / 3.0
+_MIN_CAPACITY = 8
+
+
+def _sketch_size(rank_error):
+    """Get the capacity of the top level of a sketch for a rank error.
+
+    The normalized rank error of a single quantile of a KLL sketch is about
+    1.67 / k ** 0.97 with 99 percent confidence (Karnin, Lang and Liberty,
+    2016, and the Apache DataSketches implementation).
+
+    Examples
+    --------
+    >>> from umami.utils.sketch import _sketch_size
+    >>> _sketch_size(0.01)
+    193
+    """
+    if not 0 < rank_error < 1:
+        msg = "umami: rank_error must be between 0 and 1."
+        raise ValueError(msg)
+    k = int(np.ceil((1.668 / rank_error) ** (1.0 / 0.9723)))
+    return max(k, _MIN_CAPACITY)
+
+
+class _QuantileSketch(object):
+    """A KLL sketch of the quantiles of a stream of values.
+
+    Values are added in arrays with ``update``. Each level of the sketch
+    holds values that stand for 2 ** level of the values added. Once a level
+    is full, its values are sorted and every other value, starting at a
+    random first or second value, moves up a level. The sketch holds about
+    3 * k values, where k is set by *rank_error*, independently of the
+    number of values added. Sketches of parts of the values, e.g. of chunks
+    or of grids in other processes, are combined with ``merge``.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from umami.utils.sketch import _QuantileSketch
+    >>> values = np.random.RandomState(0).random_sample(100000)
+    >>> sketch = _QuantileSketch(rank_error=0.01)
+    >>> for chunk in np.array_split(values, 10):
+    ...     sketch.update(chunk)
+    >>> sketch.count
+    100000
+    >>> sketch.size < 1000
+    True
+    >>> estimates = sketch.percentiles([10, 50, 90])
+    >>> bool(np.all(np.abs(estimates - [0.1, 0.5, 0.9]) < 0.01))
+    True
+    """
+
+    def __init__(self, rank_error=0.001, seed=0):
+        self.rank_error = rank_error
+        self.k = _sketch_size(rank_error)
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._levels = [np.empty(0)]
+        self._random = np.random.RandomState(seed)
+        self._sorted = None
+
+    @property
+    def size(self):
+        """Number of values held by the sketch."""
+        return sum(items.size for items in self._levels)
+
+    def update(self, vals):
+        """Add an array of values to the sketch."""
+        vals = np.asarray(vals, dtype=np.float64).reshape(-1)
+        if vals.size == 0:
+            return
+        self.count += vals.size
+        self.min = np.minimum(self.min, vals.min())
+        self.max = np.maximum(self.max, vals.max())
+        self._levels[0] = np.concatenate((self._levels[0], vals))
+        self._compress()
+
+    def merge(self, other):
+        """Add the values of another sketch to this sketch."""
+        if other.k != self.k:
+            msg = "umami: Only sketches with the same rank_error are merged."
+            raise ValueError(msg)
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for level, items in enumerate(other._levels):
+            self._levels[level] = np.concatenate((self._levels[level], items))
+        self.count += other.count
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self._compress()
+        return self
+
+    def _capacity(self, level):
+        depth = len(self._levels) - level - 1
+        return max(int(np.ceil(self.k * _DECAY ** depth)), _MIN_CAPACITY)
+
+    def _compress(self):
+        self._sorted = None
+        while self.size > sum(
+            self._capacity(level) for level in range(len(self._levels))
+        ):
+            for level, items in enumerate(self._levels):
+                if items.size >= self._capacity(level):
+                    break
+
+            # values that move up to an empty level are still in order, such
+            # that a large update is sorted only once as it moves up.
+            items = np.sort(items)
+            while True:
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+
+                # an odd value out stays at its level.
+                n_pairs = items.size // 2
+                start = self._random.randint(2)
+                self._levels[level] = items[2 * n_pairs :]
+                items = items[start : 2 * n_pairs : 2]
+                level += 1
+                if (self._levels[level].size > 0) or (
+                    items.size < self._capacity(level)
+                ):
+                    break
+            self._levels[level] = np.concatenate((self._levels[level], items))
+
+    def _ranks(self):
+        # the values of the sketch in order and the rank of their middle.
+        if self._sorted is None:
+            items = np.concatenate(self._levels)
+            weights = np.concatenate(
+                [
+                    np.full(values.size, 2.0 ** level)
+                    for level, values in enumerate(self._levels)
+                ]
+            )
+            order = np.argsort(items, kind="mergesort")
+            items = items[order]
+            weights = weights[order]
+            ranks = np.cumsum(weights) - 0.5 * weights
+            self._sorted = (
+                np.concatenate(([self.min], items, [self.max])),
+                np.concatenate(([0.5], ranks, [self.count - 0.5])),
+            )
+        return self._sorted
+
+    def percentiles(self, q):
+        """Estimate the percentiles *q* of the values.
+
+        As with ``np.percentile``, values are linearly interpolated between
+        ranks, such that percentiles are exact as long as no values were
+        compacted.
+        """
+        if self.count == 0:
+            msg = "umami: There are no values in the sketch."
+            raise ValueError(msg)
+        q = np.asarray(q, dtype=np.float64)
+        if np.any((q < 0) | (q > 100)):
+            msg = "umami: Percentiles must be in the range [0, 100]."
+            raise ValueError(msg)
+        if np.isnan(self.min) or np.isnan(self.max):
+            return np.full(q.shape, np.nan)
+
+        items, ranks = self._ranks()
+        return np.interp(q / 100.0 * (self.count - 1) + 0.5, ranks, items)
@@ -1,4 +1,26 @@
+import numpy as np
+
+from umami.utils.chunked import _validate_chunked
+from umami.utils.watershed import _is_multiple_outlets
+
 _field_locs = ["field_1", "field_2", "field"]
+_ensemble_field_locs = ["field_1", "field_2", "field", "misfit_field"]
+_ensemble_funcs = [
+    "aggregate",
+    "count_equal",
+    "mask_aggregation",
+    "discretized_misfit",
+    "joint_density_misfit",
+    "kstest",
+    "kstest_watershed",
+]
+_chunk_info = ["_func", "field", "method", "chunk_size", "bins", "rank_error"]
+_multiple_outlet_funcs = [
+    "kstest_watershed",
+    "watershed_aggregation",
+    "chi_gradient",
+    "chi_intercept",
+]
 
 
 def _validate_func(key, info, valid):
@@ -17,9 +39,88 @@ def _validate_func(key, info, valid):
         raise ValueError(msg)
 
 
-def _validate_fields(grid, info):
+def _validate_dtype(dtype):
+    # the floating point type in which calculations are done, or None to use
+    # the type of the fields.
+    if dtype is None:
+        return None
+    try:
+        dtype = np.dtype(dtype)
+    except TypeError:
+        dtype = None
+    if (dtype is None) or (dtype.kind != "f"):
+        msg = "umami: dtype must be a floating point type, e.g. float32."
+        raise ValueError(msg)
+    return dtype
+
+
+def _validate_fields(grid, info, produced=()):
+    # fields in produced are written by the Landlab components once needed.
     for fl in _field_locs:
         if fl in info:
-            if info[fl] not in grid.at_node:
-                msg = ""
+            if (info[fl] not in grid.at_node) and (info[fl] not in produced):
+                msg = "umami: The field {field} is not on the grid.".format(
+                    field=info[fl]
+                )
                 raise ValueError(msg)
+
+
+def _validate_outlets(key, info):
+    if not _is_multiple_outlets(info.get("outlet_id", 0)):
+        return
+
+    # Is calculation for more than one outlet supported?
+    if info["_func"] not in _multiple_outlet_funcs:
+        msg = (
+            "umami: More than one outlet_id is not supported by {func}."
+        ).format(func=info["_func"])
+        raise ValueError(msg)
+
+    # Is a name provided?
+    if "name" not in info:
+        msg = (
+            "umami: The attribute name is required when more than one "
+            "outlet_id is used. It is missing for {key}."
+        ).format(key=key)
+        raise ValueError(msg)
+
+
+def _validate_chunks(key, info):
+    chunked = (info["_func"] == "aggregate") and (
+        (info.get("chunk_size") is not None)
+        or (info.get("rank_error") is not None)
+    )
+
+    # Are histogram bins only given to a chunked aggregation?
+    if (info.get("bins") is not None) and (not chunked):
+        msg = (
+            "umami: bins is only used by chunked aggregation. It is used "
+            "without chunk_size or rank_error by {key}."
+        ).format(key=key)
+        raise ValueError(msg)
+
+    # Are the method and its arguments supported by chunked aggregation?
+    if chunked:
+        kwds = {
+            kwd: value for kwd, value in info.items() if kwd not in _chunk_info
+        }
+        _validate_chunked(info.get("method"), kwds)
+
+
+def _validate_ensemble(key, info, fields):
+    # Can the calculation be done without model flow routing?
+    if info["_func"] not in _ensemble_funcs:
+        msg = (
+            "umami: {func} uses flow routing on the model grid and is not "
+            "supported for an ensemble. It is used by {key}."
+        ).format(func=info["_func"], key=key)
+        raise ValueError(msg)
+
+    # Are all fields provided?
+    for fl in _ensemble_field_locs:
+        if (fl in info) and (info[fl] not in fields):
+            msg = (
+                "umami: The field {field} used by {key} was not provided for "
+                "the ensemble."
+            ).format(field=info[fl], key=key)
+            raise ValueError(msg)
@@ -0,0 +1,192 @@
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from landlab.utils import get_watershed_mask
+from umami.utils.fingerprint import _array_equal
+
+# Watershed information for each grid. The receivers used to calculate the
+# information are stored with it so that it is discarded once the
+# flow__receiver_node field changes.
+_WATERSHED_CACHE = WeakKeyDictionary()
+
+
+def _get_watershed_cache(grid):
+    receivers = grid.at_node["flow__receiver_node"]
+    if receivers.ndim != 1:
+        msg = (
+            "umami: Watersheds can only be identified from single flow "
+            "direction routing, e.g. D8 or D4. flow__receiver_node has "
+            "more than one receiver at each node."
+        )
+        raise ValueError(msg)
+
+    cached = _WATERSHED_CACHE.get(grid)
+    if (cached is None) or (not _array_equal(cached[0], receivers)):
+        cached = (receivers.copy(), {})
+        _WATERSHED_CACHE[grid] = cached
+
+    return cached[1]
+
+
+def _is_multiple_outlets(outlet_id):
+    return isinstance(outlet_id, str) or (np.ndim(outlet_id) > 0)
+
+
+def _get_watershed_mask(grid, outlet_id):
+    """Get the watershed of an outlet, reusing previously identified masks.
+
+    This wraps the Landlab function ``get_watershed_mask``. Masks are cached
+    for each grid and outlet id until the *flow__receiver_node* field of the
+    grid changes. The returned mask is read only.
+    """
+    cache = _get_watershed_cache(grid)
+
+    outlet_id = int(outlet_id)
+    if outlet_id not in cache:
+        mask = get_watershed_mask(grid, outlet_id)
+        mask.flags.writeable = False
+        cache[outlet_id] = mask
+
+    return cache[outlet_id]
+
+
+def _get_watershed_node_ids(grid, outlet_id):
+    """Get the nodes of the watershed of an outlet, in order.
+
+    The nodes are cached with the mask of the watershed, such that values in
+    the watershed can be taken without a temporary array. The returned array
+    is read only.
+    """
+    cache = _get_watershed_cache(grid)
+
+    key = ("watershed_node_ids", int(outlet_id))
+    if key not in cache:
+        nodes = np.flatnonzero(_get_watershed_mask(grid, outlet_id))
+        nodes.flags.writeable = False
+        cache[key] = nodes
+
+    return cache[key]
+
+
+def _follow_receivers(target):
+    # Pointer jumping: each pass doubles the distance followed downstream,
+    # until every node points at a node that is its own receiver.
+    while True:
+        next_target = target[target]
+        if np.array_equal(next_target, target):
+            return target
+        target = next_target
+
+
+def _get_outlet_ids(grid, outlet_id):
+    """Get an array of outlet ids from a list or the string "all_outlets".
+
+    The outlets identified by "all_outlets" are all nodes at which flow from
+    one or more core nodes terminates.
+    """
+    if isinstance(outlet_id, str):
+        if outlet_id != "all_outlets":
+            msg = (
+                "umami: The only string value supported for outlet_id is "
+                "all_outlets."
+            )
+            raise ValueError(msg)
+
+        cache = _get_watershed_cache(grid)
+        if "all_outlets" not in cache:
+            terminal = _follow_receivers(
+                grid.at_node["flow__receiver_node"].copy()
+            )
+            outlet_ids = np.unique(terminal[grid.core_nodes])
+            outlet_ids.flags.writeable = False
+            cache["all_outlets"] = outlet_ids
+        return cache["all_outlets"]
+
+    outlet_ids = np.asarray(outlet_id, dtype=int)
+    if np.unique(outlet_ids).size != outlet_ids.size:
+        msg = "umami: Each outlet_id may only be provided once."
+        raise ValueError(msg)
+    return outlet_ids
+
+
+def _get_watershed_nodes(grid, outlet_ids):
+    """Identify the watersheds of many outlets at once.
+
+    All nodes are labeled with the first outlet downstream of them in one
+    vectorized pass. Outlets may be nested, in which case the watershed of an
+    outlet includes the watersheds of the outlets upstream of it.
+
+    Returns
+    -------
+    nodes : ndarray
+        Nodes sorted such that the watershed of each outlet is contiguous.
+    start, stop : ndarray
+        The watershed of ``outlet_ids[i]`` is ``nodes[start[i]:stop[i]]``.
+    nested : bool
+        True if any outlet is upstream of another.
+    """
+    outlet_ids = np.asarray(outlet_ids, dtype=int)
+
+    cache = _get_watershed_cache(grid)
+    key = ("watershed_nodes", tuple(outlet_ids))
+    if key in cache:
+        return cache[key]
+
+    receivers = grid.at_node["flow__receiver_node"]
+    n_outlets = outlet_ids.size
+
+    # label each node with the first outlet downstream of it.
+    target = receivers.copy()
+    target[outlet_ids] = outlet_ids
+    target = _follow_receivers(target)
+
+    outlet_index = np.full(grid.number_of_nodes, -1, dtype=int)
+    outlet_index[outlet_ids] = np.arange(n_outlets)
+    label = outlet_index[target]
+
+    # outlets form a tree, in which the parent of each outlet is the first
+    # outlet downstream of it.
+    parent = label[receivers[outlet_ids]]
+    parent[parent == np.arange(n_outlets)] = -1
+
+    children = [[] for _ in range(n_outlets)]
+    roots = []
+    for outlet, p in enumerate(parent):
+        if p < 0:
+            roots.append(outlet)
+        else:
+            children[p].append(outlet)
+
+    # rank outlets in depth-first preorder so that the outlets upstream of
+    # each outlet have consecutive ranks.
+    rank = np.empty(n_outlets, dtype=int)
+    preorder = []
+    stack = roots[::-1]
+    while stack:
+        outlet = stack.pop()
+        rank[outlet] = len(preorder)
+        preorder.append(outlet)
+        stack.extend(children[outlet][::-1])
+
+    size = np.ones(n_outlets, dtype=int)
+    for outlet in preorder[::-1]:
+        if parent[outlet] >= 0:
+            size[parent[outlet]] += size[outlet]
+
+    # sort the labeled nodes by the rank of their outlet.
+    labeled = np.flatnonzero(label >= 0)
+    node_rank = rank[label[labeled]]
+    nodes = labeled[np.argsort(node_rank, kind="stable")]
+
+    bounds = np.zeros(n_outlets + 1, dtype=int)
+    np.cumsum(np.bincount(node_rank, minlength=n_outlets), out=bounds[1:])
+    start = bounds[rank]
+    stop = bounds[rank + size]
+    nested = bool(np.any(size > 1))
+
+    for array in (nodes, start, stop):
+        array.flags.writeable = False
+    cache[key] = (nodes, start, stop, nested)
+
+    return cache[key]